@@ -90,4 +90,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Login/Logout URLs
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/accounts/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+# Rota
+# Hour (local time) at which one rota day hands over to the next
+ROTA_HANDOVER_HOUR = env.int('ROTA_HANDOVER_HOUR', default=9)
+# Keys accepted as "Authorization: Bearer <key>" by the machine-readable rota API
+ROTA_API_KEYS = env.list('ROTA_API_KEYS', default=[])
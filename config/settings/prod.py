@@ -28,6 +28,14 @@ DATABASES = {
     }
 }
 
+# Cache
+# Must be shared by all worker processes: the rota version, cached feeds and
+# the recent entity lists live here. The default database cache table is
+# created by "manage.py createcachetable"; Redis or Memcached URLs also work.
+CACHES = {
+    "default": env.cache("CACHE_URL", default="dbcache://records_cache?MAX_ENTRIES=10000")
+}
+
 # Security settings for production
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -1,14 +1,22 @@
 """Admin configurations"""
 
+import io
 from datetime import date
 
+from django import forms
 from django.contrib import admin
 from django.contrib import messages
+from django.contrib.admin.helpers import ActionForm
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.db.models import F
 from django.utils.html import format_html
 
 from .models import (
     Assignment,
     BankHoliday,
+    ClaimRule,
     DayType,
     Donor,
     LabTask,
@@ -16,17 +24,113 @@ from .models import (
     MonthlySignOff,
     OnCallStaff,
     Recipient,
+    RotaChange,
     RotaEntry,
+    RotaPattern,
+    RotaPatternSlot,
     RotaShift,
     TaskType,
     TimeBlock,
     TimeEntry,
     WorkMode,
 )
+from .utils.rota_bulk import copy_rota_month, shift_staff_rota
+from .utils.rota_import import import_rota_csv
+from .utils.rota_patterns import generate_rota_from_patterns
+from .utils.rota_events import rota_event
+from .utils.rota_history import log_rota_changes, rota_change, shift_type_change
+from .utils.rota_version import rota_changed
+
+
+class RotaChangeAdminMixin:
+    """Invalidate cached rota data and refresh open calendars on admin writes"""
+
+    # Field holding the id of the RotaEntry a change touches, so the day's
+    # version moves on and stale calendar edits are rejected
+    rota_entry_field = None
+
+    def bump_rota_versions(self, entry_ids):
+        if self.rota_entry_field:
+            RotaEntry.objects.filter(id__in=entry_ids).update(version=F("version") + 1)
+
+    # The admin calls save_related after save_model for every add/change
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if self.rota_entry_field:
+            self.bump_rota_versions([getattr(form.instance, self.rota_entry_field)])
+        rota_changed([rota_event("refresh")])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        if self.rota_entry_field:
+            self.bump_rota_versions([getattr(obj, self.rota_entry_field)])
+        rota_changed([rota_event("refresh")])
+
+    def delete_queryset(self, request, queryset):
+        entry_ids = (
+            list(queryset.values_list(self.rota_entry_field, flat=True))
+            if self.rota_entry_field
+            else []
+        )
+        super().delete_queryset(request, queryset)
+        self.bump_rota_versions(entry_ids)
+        rota_changed([rota_event("refresh")])
+
+
+class RotaCopyActionForm(ActionForm):
+    """Action bar field naming the month to copy selected rota days to"""
+
+    target_month = forms.DateField(
+        required=False,
+        input_formats=["%Y-%m"],
+        widget=forms.TextInput(attrs={"placeholder": "YYYY-MM", "size": 8}),
+        label="Target month",
+    )
+
+
+class RotaShiftActionForm(ActionForm):
+    """Action bar fields for moving selected staff members' shifts"""
+
+    days = forms.IntegerField(required=False, label="Days")
+    start_date = forms.DateField(
+        required=False,
+        widget=forms.TextInput(attrs={"placeholder": "YYYY-MM-DD", "size": 10}),
+        label="From",
+    )
+
+
+class RotaImportForm(forms.Form):
+    """Upload form for importing rota shifts from a spreadsheet"""
+
+    csv_file = forms.FileField(
+        label="CSV file",
+        help_text="Columns: date (YYYY-MM-DD), assignment_id, seniority, shift_type (optional)",
+    )
+    dry_run = forms.BooleanField(required=False, label="Validate only")
+
+
+def _action_form_data(model_admin, request):
+    """Cleaned action bar fields, or None if they do not validate"""
+    form = model_admin.action_form(request.POST)
+    form.fields["action"].choices = model_admin.get_action_choices(request)
+    return form.cleaned_data if form.is_valid() else None
+
+
+def _bulk_result_message(request, result, success_message):
+    if result["success"]:
+        messages.success(request, success_message)
+        return
+    conflicts = ", ".join(
+        f"{conflict['staff_id']} on {conflict['date']}"
+        for conflict in result.get("conflicts", [])
+    )
+    messages.error(
+        request, f"{result['error']}: {conflicts}" if conflicts else result["error"]
+    )
 
 
 @admin.register(OnCallStaff)
-class OnCallStaffAdmin(admin.ModelAdmin):
+class OnCallStaffAdmin(RotaChangeAdminMixin, admin.ModelAdmin):
     """
     Admin interface for On-call Staff model.
     """
@@ -46,6 +150,8 @@ class OnCallStaffAdmin(admin.ModelAdmin):
     )
     list_filter = ("seniority_level",)
     fields = ("assignment_id", "user", "color", "seniority_level")
+    actions = ["reset_calendar_tokens", "shift_rota"]
+    action_form = RotaShiftActionForm
 
     @admin.display(description="Full Name")
     def get_full_name(self, obj):
@@ -63,6 +169,35 @@ class OnCallStaffAdmin(admin.ModelAdmin):
             obj.color,
         )
 
+    def reset_calendar_tokens(self, request, queryset):
+        """Admin action to revoke calendar feed links, e.g. after a leak"""
+        count = 0
+        for staff in queryset:
+            staff.reset_calendar_token()
+            count += 1
+        messages.success(request, f"Reset calendar links for {count} staff member(s).")
+
+    reset_calendar_tokens.short_description = "Reset calendar feed links"
+
+    def shift_rota(self, request, queryset):
+        """Admin action to move each selected staff member's shifts by N days"""
+        data = _action_form_data(self, request)
+        if not data or not data["days"]:
+            messages.error(request, "Enter the number of days to move shifts by.")
+            return
+        days = data["days"]
+        start_date = data["start_date"] or date.today()
+        for staff in queryset:
+            result = shift_staff_rota(staff, days, start_date, actor=request.user)
+            _bulk_result_message(
+                request,
+                result,
+                f"Moved {result.get('shifts_moved', 0)} shift(s) for {staff.assignment_id} "
+                f"by {days} day(s).",
+            )
+
+    shift_rota.short_description = "Move shifts from a date by N days"
+
 
 @admin.register(WorkMode)
 class WorkModeAdmin(admin.ModelAdmin):
@@ -82,6 +217,18 @@ class DayTypeAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 
+@admin.register(ClaimRule)
+class ClaimRuleAdmin(admin.ModelAdmin):
+    list_display = (
+        "day_type",
+        "oncall_type",
+        "minimum_callout_minutes",
+        "rounding_minutes",
+        "multiplier",
+    )
+    list_filter = ("day_type", "oncall_type")
+
+
 @admin.register(LabTask)
 class LabTaskAdmin(admin.ModelAdmin):
     list_display = ("name", "created")
@@ -174,6 +321,15 @@ class AssignmentAdmin(admin.ModelAdmin):
     date_hierarchy = "timeblock__date"
     fields = ("timeblock", "entity_type", "entity_id", "notes", "color", "icon")
 
+    def get_queryset(self, request):
+        # Blocks and entities are joined in the changelist query
+        return (
+            super()
+            .get_queryset(request)
+            .with_entities()
+            .select_related("timeblock__staff", "timeblock__day_type")
+        )
+
     @admin.display(description="Entity Name")
     def get_entity_name(self, obj):
         entity = obj.get_entity_object()
@@ -250,8 +406,9 @@ class RotaShiftInline(admin.TabularInline):
 
 
 @admin.register(RotaEntry)
-class RotaEntryAdmin(admin.ModelAdmin):
+class RotaEntryAdmin(RotaChangeAdminMixin, admin.ModelAdmin):
     list_display = ("formatted_date", "shift_type", "day_type", "get_staff_list")
+    rota_entry_field = "pk"
     list_filter = ("date", "shift_type", "shifts__seniority_level")
     search_fields = (
         "date",
@@ -268,6 +425,135 @@ class RotaEntryAdmin(admin.ModelAdmin):
     formatted_date.admin_order_field = "date"
     ordering = ["-date"]
     inlines = [RotaShiftInline]
+    actions = ["copy_month", "copy_month_replace"]
+    action_form = RotaCopyActionForm
+    change_list_template = "admin/records/rotaentry/change_list.html"
+
+    def get_urls(self):
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_rota_view),
+                name="records_rotaentry_import",
+            ),
+        ] + super().get_urls()
+
+    def import_rota_view(self, request):
+        """Upload a CSV rota; every row is checked before anything is written"""
+        if not self.has_add_permission(request):
+            return redirect("admin:records_rotaentry_changelist")
+
+        result = None
+        form = RotaImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            csv_text = io.TextIOWrapper(
+                form.cleaned_data["csv_file"], encoding="utf-8-sig", newline=""
+            )
+            try:
+                result = import_rota_csv(
+                    csv_text, actor=request.user, dry_run=form.cleaned_data["dry_run"]
+                )
+            except UnicodeDecodeError:
+                form.add_error("csv_file", "The file must be UTF-8 encoded CSV.")
+            if result and result["success"] and not form.cleaned_data["dry_run"]:
+                messages.success(
+                    request,
+                    f"Imported {result['shifts_created']} shifts "
+                    f"(entries created: {result['entries_created']}).",
+                )
+                return redirect("admin:records_rotaentry_changelist")
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import rota from CSV",
+            "form": form,
+            "result": result,
+        }
+        return TemplateResponse(request, "admin/records/rotaentry/import_rota.html", context)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            log_rota_changes(request.user, [rota_change(obj.date, RotaChange.CREATE_ENTRY)])
+        elif "shift_type" in form.changed_data:
+            log_rota_changes(request.user, [shift_type_change(obj.date, obj.shift_type)])
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        day = form.instance.date
+        changes = [
+            rota_change(day, RotaChange.ADD_STAFF, shift.staff_id)
+            for shift in formset.new_objects
+        ]
+        changes += [
+            rota_change(day, RotaChange.REMOVE_STAFF, shift.staff_id)
+            for shift in formset.deleted_objects
+        ]
+        initial_staff = {
+            shift_form.instance.pk: shift_form.initial.get("staff")
+            for shift_form in formset.initial_forms
+        }
+        for shift, changed_fields in formset.changed_objects:
+            if "staff" in changed_fields:
+                changes.append(
+                    rota_change(day, RotaChange.REMOVE_STAFF, initial_staff[shift.pk])
+                )
+                changes.append(rota_change(day, RotaChange.ADD_STAFF, shift.staff_id))
+        log_rota_changes(request.user, changes)
+
+    def delete_model(self, request, obj):
+        self.log_removed_shifts(request, RotaShift.objects.filter(rota_entry=obj))
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        self.log_removed_shifts(request, RotaShift.objects.filter(rota_entry__in=queryset))
+        super().delete_queryset(request, queryset)
+
+    def log_removed_shifts(self, request, shifts):
+        log_rota_changes(
+            request.user,
+            [
+                rota_change(day, RotaChange.REMOVE_STAFF, staff_id)
+                for day, staff_id in shifts.values_list("rota_entry__date", "staff_id")
+            ],
+        )
+
+    def _copy_month(self, request, queryset, replace):
+        data = _action_form_data(self, request)
+        if not data or not data["target_month"]:
+            messages.error(request, "Enter the target month as YYYY-MM.")
+            return
+        source_months = set(queryset.dates("date", "month"))
+        if len(source_months) != 1:
+            messages.error(request, "Select rota days from a single month to copy.")
+            return
+        result = copy_rota_month(
+            source_months.pop(),
+            data["target_month"],
+            replace=replace,
+            actor=request.user,
+        )
+        _bulk_result_message(
+            request,
+            result,
+            f"Copied {result.get('shifts_copied', 0)} shift(s) from "
+            f"{result.get('source_month')} to {result.get('target_month')} "
+            f"(entries created: {result.get('entries_created', 0)}, "
+            f"shifts replaced: {result.get('shifts_replaced', 0)}).",
+        )
+
+    def copy_month(self, request, queryset):
+        """Admin action to copy the selected days' month onto another month"""
+        self._copy_month(request, queryset, replace=False)
+
+    copy_month.short_description = "Copy month of selected days to target month (aligned by weekday)"
+
+    def copy_month_replace(self, request, queryset):
+        """Admin action to copy a month, replacing the target month's rota"""
+        self._copy_month(request, queryset, replace=True)
+
+    copy_month_replace.short_description = "Copy month of selected days to target month (replace existing)"
 
     @admin.display(description="On call staff")
     def get_staff_list(self, obj):
@@ -285,7 +571,7 @@ class RotaEntryAdmin(admin.ModelAdmin):
 
 
 @admin.register(RotaShift)
-class RotaShiftAdmin(admin.ModelAdmin):
+class RotaShiftAdmin(RotaChangeAdminMixin, admin.ModelAdmin):
     list_display = (
         "rota_entry",
         "staff",
@@ -308,16 +594,108 @@ class RotaShiftAdmin(admin.ModelAdmin):
     date_hierarchy = "rota_entry__date"
     ordering = ["-rota_entry__date", "seniority_level", "staff__assignment_id"]
     autocomplete_fields = ["staff"]
+    rota_entry_field = "rota_entry_id"
 
     @admin.display(description="Shift Type")
     def get_shift_type(self, obj):
         return obj.rota_entry.get_shift_type_display()
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        moved = change and {"rota_entry", "staff"} & set(form.changed_data)
+        changes = []
+        if moved:
+            old_entry = RotaEntry.objects.get(pk=form.initial["rota_entry"])
+            changes.append(
+                rota_change(old_entry.date, RotaChange.REMOVE_STAFF, form.initial["staff"])
+            )
+        if moved or not change:
+            changes.append(
+                rota_change(obj.rota_entry.date, RotaChange.ADD_STAFF, obj.staff_id)
+            )
+        log_rota_changes(request.user, changes)
+
+    def delete_model(self, request, obj):
+        log_rota_changes(
+            request.user,
+            [rota_change(obj.rota_entry.date, RotaChange.REMOVE_STAFF, obj.staff_id)],
+        )
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        log_rota_changes(
+            request.user,
+            [
+                rota_change(day, RotaChange.REMOVE_STAFF, staff_id)
+                for day, staff_id in queryset.values_list("rota_entry__date", "staff_id")
+            ],
+        )
+        super().delete_queryset(request, queryset)
+
     @admin.display(description="Day Type")
     def get_day_type(self, obj):
         return obj.rota_entry.day_type
 
 
+class RotaPatternSlotInline(admin.TabularInline):
+    model = RotaPatternSlot
+    extra = 0
+    fields = ("position", "staff", "bank_holiday")
+    autocomplete_fields = ["staff"]
+
+
+@admin.register(RotaPattern)
+class RotaPatternAdmin(admin.ModelAdmin):
+    """Admin interface for repeating rota patterns with rota generation actions"""
+
+    list_display = (
+        "name",
+        "seniority_level",
+        "cycle_weeks",
+        "start_date",
+        "end_date",
+        "bank_holiday_policy",
+        "is_active",
+    )
+    list_filter = ("seniority_level", "bank_holiday_policy", "is_active")
+    search_fields = ("name",)
+    inlines = [RotaPatternSlotInline]
+
+    actions = ["generate_rota", "generate_rota_replace"]
+
+    def _generate(self, request, queryset, replace):
+        result = generate_rota_from_patterns(
+            queryset, replace=replace, actor=request.user
+        )
+
+        if result["success"]:
+            message = (
+                f"Generated rota from {result['start_date']} to {result['end_date']}. "
+            )
+            message += (
+                f"Entries created: {result['entries_created']}, "
+                f"Shifts created: {result['shifts_created']}, "
+                f"Shifts replaced: {result['shifts_replaced']}, "
+                f"Days skipped (already filled): {result['days_skipped']}, "
+                f"Conflicts: {result['conflicts']}"
+            )
+            messages.success(request, message)
+        else:
+            messages.error(request, f"Failed to generate rota: {result['error']}")
+
+    def generate_rota(self, request, queryset):
+        """Admin action to fill empty rota days from the selected patterns"""
+        self._generate(request, queryset, replace=False)
+
+    generate_rota.short_description = "Generate rota from selected patterns (fill empty days)"
+
+    def generate_rota_replace(self, request, queryset):
+        """Admin action to regenerate the rota, replacing existing shifts"""
+        self._generate(request, queryset, replace=True)
+
+    generate_rota_replace.short_description = "Regenerate rota from selected patterns (replace existing)"
+
+
 @admin.register(MonthlyReportSignOff)
 class MonthlyReportSignOffAdmin(admin.ModelAdmin):
     """
@@ -339,7 +717,7 @@ class MonthlyReportSignOffAdmin(admin.ModelAdmin):
 
 
 @admin.register(BankHoliday)
-class BankHolidayAdmin(admin.ModelAdmin):
+class BankHolidayAdmin(RotaChangeAdminMixin, admin.ModelAdmin):
     """Admin interface for Bank Holidays with sync functionality"""
 
     list_display = ("formatted_date", "title", "notes")
@@ -421,3 +799,27 @@ class BankHolidayAdmin(admin.ModelAdmin):
         }
 
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(RotaChange)
+class RotaChangeAdmin(admin.ModelAdmin):
+    """Read-only view of the rota audit log"""
+
+    list_display = ("get_date", "op", "staff", "actor", "at")
+    list_filter = ("op",)
+    list_select_related = ("staff", "actor")
+    search_fields = ("staff__assignment_id", "actor__username")
+    ordering = ["-id"]
+
+    @admin.display(description="Date", ordering="day")
+    def get_date(self, obj):
+        return obj.date.strftime("%Y-%m-%d")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,18 +1,17 @@
+import json
+
 from django import forms
 from django.utils import timezone
 from govuk_bank_holidays.bank_holidays import BankHolidays
 from .models import (
     TimeBlock,
     TimeEntry,
-    Donor,
-    Recipient,
-    LabTask,
-    Assignment,
     DayType,
     TaskType,
     WorkMode,
-    ASSIGNMENT_TYPE_CONFIG,
 )
+from .utils.assignment_sync import sync_assignments
+from .utils.entity_search import get_recent_entities
 
 
 class TimeBlockForm(forms.ModelForm):
@@ -36,6 +35,8 @@ class TimeBlockForm(forms.ModelForm):
                 "class": "form-control",
                 "id": "entity_id",
                 "placeholder": "Enter ID or select from shortcuts",
+                "list": "entity-suggestions",
+                "autocomplete": "off",
             }
         ),
     )
@@ -63,10 +64,11 @@ class TimeBlockForm(forms.ModelForm):
         today = timezone.now().date().isoformat()
         self.fields["date"].widget.attrs["max"] = today
 
-        # Store recent entities for template access
-        self.recent_donors = list(Donor.objects.order_by("-created")[:5])
-        self.recent_recipients = list(Recipient.objects.order_by("-created")[:5])
-        self.recent_lab_tasks = list(LabTask.objects.order_by("-created")[:5])
+        # Store recent entities for template access (cached)
+        recent = get_recent_entities()
+        self.recent_donors = recent["donor"][:5]
+        self.recent_recipients = recent["recipient"][:5]
+        self.recent_lab_tasks = recent["lab_task"][:5]
 
     def clean_date(self):
         date = self.cleaned_data.get("date")
@@ -140,66 +142,14 @@ class TimeBlockForm(forms.ModelForm):
             assignments_data = self.cleaned_data.get("assignments_data", "")
 
             if assignments_data:
-                import json
-
                 try:
-                    assignments = json.loads(assignments_data)
-
-                    for assignment_data in assignments:
-                        assignment_type = assignment_data.get("type")
-                        entity_id = assignment_data.get("entity_id")
-                        notes = assignment_data.get("notes", "")
-
-                        if assignment_type and entity_id:
-                            # Create or get the entity
-                            entity = self._get_or_create_entity(
-                                assignment_type, entity_id
-                            )
-
-                            if entity:
-                                # Get default styling from AssignmentType if available
-                                color, icon = self._get_default_styling(assignment_type)
-
-                                # Create assignment
-                                Assignment.objects.get_or_create(
-                                    timeblock=instance,
-                                    entity_type=assignment_type,
-                                    entity_id=entity_id,
-                                    defaults={
-                                        "notes": notes,
-                                        "color": color,
-                                        "icon": icon,
-                                    },
-                                )
-                except (json.JSONDecodeError, KeyError) as e:
+                    sync_assignments(instance, json.loads(assignments_data))
+                except json.JSONDecodeError:
                     # Log error but don't fail the form save
                     pass
 
         return instance
 
-    def _get_or_create_entity(self, entity_type, entity_id):
-        """Create or get entity based on type and ID"""
-        try:
-            if entity_type == "donor":
-                entity, created = Donor.objects.get_or_create(donor_id=entity_id)
-                return entity
-            elif entity_type == "recipient":
-                entity, created = Recipient.objects.get_or_create(
-                    recipient_id=entity_id
-                )
-                return entity
-            elif entity_type == "lab_task":
-                entity, created = LabTask.objects.get_or_create(name=entity_id)
-                return entity
-        except Exception:
-            pass
-        return None
-
-    def _get_default_styling(self, entity_type):
-        """Get default color and icon from configuration"""
-        config = ASSIGNMENT_TYPE_CONFIG.get(entity_type, {})
-        return config.get("color", "primary"), config.get("icon", "bi-person-fill")
-
     class Meta:
         model = TimeBlock
         fields = ["date", "oncall_type"]
@@ -232,6 +182,8 @@ class TimeBlockEditForm(forms.ModelForm):
                 "class": "form-control",
                 "id": "entity_id",
                 "placeholder": "Enter ID or select from shortcuts",
+                "list": "entity-suggestions",
+                "autocomplete": "off",
             }
         ),
     )
@@ -256,10 +208,16 @@ class TimeBlockEditForm(forms.ModelForm):
         today = timezone.now().date().isoformat()
         self.fields["date"].widget.attrs["max"] = today
 
-        # Store recent entities for template access
-        self.recent_donors = list(Donor.objects.order_by("-created")[:10])
-        self.recent_recipients = list(Recipient.objects.order_by("-created")[:10])
-        self.recent_lab_tasks = list(LabTask.objects.order_by("-created")[:10])
+        # Store recent entities for template access (cached)
+        recent = get_recent_entities()
+        self.recent_donors = recent["donor"]
+        self.recent_recipients = recent["recipient"]
+        self.recent_lab_tasks = recent["lab_task"]
+
+        # Claims covered by a claim rule are calculated, not typed in
+        self.claim_rule = self.instance.get_claim_rule() if self.instance.pk else None
+        if self.claim_rule:
+            self.fields["claim"].disabled = True
 
     def clean_date(self):
         date = self.cleaned_data.get("date")
@@ -329,71 +287,18 @@ class TimeBlockEditForm(forms.ModelForm):
         if commit:
             instance.save()
 
-            # Handle assignment updates
+            # Handle assignment updates: only added, changed and removed
+            # assignments are written
             assignments_data = self.cleaned_data.get("assignments_data", "")
             if assignments_data:
-                import json
-
                 try:
-                    # First, remove existing assignments for this block
-                    instance.assignments.all().delete()
-
-                    # Then create new assignments from JSON data
-                    assignments = json.loads(assignments_data)
-
-                    for assignment_data in assignments:
-                        assignment_type = assignment_data.get("type")
-                        entity_id = assignment_data.get("entity_id")
-                        notes = assignment_data.get("notes", "")
-
-                        if assignment_type and entity_id:
-                            # Create or get the entity
-                            entity = self._get_or_create_entity(
-                                assignment_type, entity_id
-                            )
-
-                            if entity:
-                                # Get default styling from configuration
-                                color, icon = self._get_default_styling(assignment_type)
-
-                                # Create assignment
-                                Assignment.objects.create(
-                                    timeblock=instance,
-                                    entity_type=assignment_type,
-                                    entity_id=entity_id,
-                                    notes=notes,
-                                    color=color,
-                                    icon=icon,
-                                )
-                except (json.JSONDecodeError, KeyError) as e:
+                    sync_assignments(instance, json.loads(assignments_data))
+                except json.JSONDecodeError:
                     # Log error but don't fail the form save
                     pass
 
         return instance
 
-    def _get_or_create_entity(self, entity_type, entity_id):
-        """Create or get entity based on type and ID"""
-        try:
-            if entity_type == "donor":
-                entity, created = Donor.objects.get_or_create(donor_id=entity_id)
-                return entity
-            elif entity_type == "recipient":
-                entity, created = Recipient.objects.get_or_create(
-                    recipient_id=entity_id
-                )
-                return entity
-            elif entity_type == "lab_task":
-                entity, created = LabTask.objects.get_or_create(name=entity_id)
-                return entity
-        except Exception:
-            pass
-        return None
-
-    def _get_default_styling(self, entity_type):
-        """Get default color and icon from configuration"""
-        config = ASSIGNMENT_TYPE_CONFIG.get(entity_type, {})
-        return config.get("color", "primary"), config.get("icon", "bi-person-fill")
-
     class Meta:
         model = TimeBlock
         fields = ["date", "oncall_type", "claim"]
@@ -0,0 +1,82 @@
+"""
+Django management command to generate the rota from repeating rota patterns
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.models import RotaPattern
+from records.utils.rota_patterns import generate_rota_from_patterns
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Generate rota shifts from repeating rota patterns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pattern',
+            action='append',
+            dest='patterns',
+            help='Name of a pattern to generate (repeatable). Defaults to all active patterns',
+        )
+        parser.add_argument(
+            '--start',
+            type=parse_date,
+            help='First date to generate (YYYY-MM-DD). Defaults to each pattern start date',
+        )
+        parser.add_argument(
+            '--end',
+            type=parse_date,
+            help='Last date to generate (YYYY-MM-DD). Defaults to each pattern end date',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Replace existing shifts for the patterns\' seniority levels in the range',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Suppress output except for errors',
+        )
+
+    def handle(self, *args, **options):
+        if options['patterns']:
+            patterns = RotaPattern.objects.filter(name__in=options['patterns'])
+            missing = set(options['patterns']) - set(patterns.values_list('name', flat=True))
+            if missing:
+                raise CommandError(f'Unknown rota pattern(s): {", ".join(sorted(missing))}')
+        else:
+            patterns = RotaPattern.objects.filter(is_active=True)
+
+        start = datetime.now()
+        result = generate_rota_from_patterns(
+            patterns,
+            start_date=options['start'],
+            end_date=options['end'],
+            replace=options['replace'],
+        )
+        elapsed = (datetime.now() - start).total_seconds()
+
+        if not result['success']:
+            raise CommandError(f"Failed to generate rota: {result['error']}")
+
+        if not options['quiet']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Generated rota {result['start_date']} to {result['end_date']} in {elapsed:.2f}s. "
+                    f"Entries created: {result['entries_created']}, "
+                    f"Shifts created: {result['shifts_created']}, "
+                    f"Shifts replaced: {result['shifts_replaced']}, "
+                    f"Days skipped (already filled): {result['days_skipped']}, "
+                    f"Conflicts: {result['conflicts']}"
+                )
+            )
@@ -0,0 +1,54 @@
+"""
+Django management command to import rota shifts from a CSV spreadsheet export
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.utils.rota_import import import_rota_csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Import rota shifts from a CSV file with date, assignment_id, seniority '
+        'and optional shift_type columns'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file to import')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without writing anything',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Suppress output except for errors',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], newline='', encoding='utf-8-sig') as csv_file:
+                result = import_rota_csv(csv_file, dry_run=options['dry_run'])
+        except OSError as e:
+            raise CommandError(f'Could not read file: {e}')
+
+        if not result['success']:
+            for error in result['errors']:
+                self.stderr.write(f"Row {error['row']}: {error['error']}")
+            if result['error_count'] > len(result['errors']):
+                self.stderr.write(f"... and {result['error_count'] - len(result['errors'])} more")
+            raise CommandError(f"{result['error_count']} row(s) failed validation, nothing imported")
+
+        if options['quiet']:
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{result['rows']} row(s) are valid"))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Imported {result['shifts_created']} shifts "
+                    f"(entries created: {result['entries_created']})"
+                )
+            )
@@ -0,0 +1,88 @@
+"""
+Django management command to prune (and optionally archive) the rota audit log
+"""
+
+import csv
+import gzip
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from records.models import RotaChange
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Delete rota change history for rota days before a date, optionally archiving it to CSV first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            type=parse_date,
+            required=True,
+            help='Prune history for rota days before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--archive',
+            metavar='FILE',
+            help='Write the pruned rows to this CSV file first (gzipped if it ends in .gz)',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Suppress output except for errors',
+        )
+
+    def handle(self, *args, **options):
+        changes = RotaChange.objects.filter(day__lt=options['before'].toordinal())
+        op_labels = dict(RotaChange.OP_CHOICES)
+
+        with transaction.atomic():
+            if options['archive']:
+                archived = self.write_archive(options['archive'], changes, op_labels)
+            deleted, _ = changes.delete()
+
+        if options['quiet']:
+            return
+
+        if options['archive']:
+            self.stdout.write(f"Archived {archived} rota changes to {options['archive']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Pruned {deleted} rota changes for days before {options['before']:%Y-%m-%d}"
+            )
+        )
+
+    def write_archive(self, path, changes, op_labels):
+        opener = gzip.open if path.endswith('.gz') else open
+        rows = changes.order_by('id').values_list(
+            'day', 'op', 'staff_id', 'staff__assignment_id', 'actor_id', 'actor__username', 'at'
+        )
+        count = 0
+        try:
+            with opener(path, 'wt', newline='') as archive:
+                writer = csv.writer(archive)
+                writer.writerow(['date', 'change', 'staff_id', 'staff', 'actor_id', 'actor', 'at'])
+                for day, op, staff_id, assignment_id, actor_id, username, at in rows.iterator(
+                    chunk_size=2000
+                ):
+                    writer.writerow([
+                        date.fromordinal(day).isoformat(),
+                        op_labels.get(op, op),
+                        staff_id or '',
+                        assignment_id or '',
+                        actor_id or '',
+                        username or '',
+                        at.isoformat(),
+                    ])
+                    count += 1
+        except OSError as e:
+            raise CommandError(f'Could not write archive: {e}')
+        return count
@@ -0,0 +1,60 @@
+"""
+Django management command to recompute a month's block claims from the claim rules
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.utils.claim_recompute import recompute_month_claims
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid month "{value}", expected YYYY-MM')
+
+
+class Command(BaseCommand):
+    help = (
+        'Show how block claims for a month differ from the claim rules, '
+        'and optionally write the recalculated claims'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            type=parse_month,
+            required=True,
+            help='Month to recompute (YYYY-MM)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Write the recalculated claims (default: only show the differences)',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Suppress output except for errors',
+        )
+
+    def handle(self, *args, **options):
+        month = options['month']
+        result = recompute_month_claims(month.year, month.month, apply=options['apply'])
+        if options['quiet']:
+            return
+
+        for change in result['changes']:
+            self.stdout.write(
+                f"{change['date']:%Y-%m-%d} {change['staff']}: "
+                f"{change['old'] if change['old'] is not None else '-'} -> {change['new']}"
+            )
+        verb = 'Updated' if options['apply'] else 'Would update'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(result['changes'])} of {result['blocks_checked']} block claim(s) "
+                f'for {month:%B %Y}'
+            )
+        )
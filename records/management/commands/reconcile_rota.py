@@ -0,0 +1,74 @@
+"""
+Django management command to reconcile the rota against recorded time blocks
+"""
+
+import gzip
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from records.utils.rota_reconciliation import reconcile_rota, write_reconciliation_csv
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = (
+        "Export rota'd staff with no time block, and time blocks with no rota shift, "
+        'for a period as CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=parse_date,
+            required=True,
+            help='First date to reconcile (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--end',
+            type=parse_date,
+            help='Last date to reconcile (YYYY-MM-DD, default: today)',
+        )
+        parser.add_argument(
+            '--output',
+            metavar='FILE',
+            help='Write the CSV to this file (gzipped if it ends in .gz) instead of stdout',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Suppress output except for errors',
+        )
+
+    def handle(self, *args, **options):
+        start_date = options['start']
+        end_date = options['end'] or timezone.now().date()
+        if end_date < start_date:
+            raise CommandError('End date must be on or after start date')
+
+        mismatches = reconcile_rota(start_date, end_date)
+        path = options['output']
+        if not path:
+            write_reconciliation_csv(self.stdout, mismatches)
+            return
+
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'wt', newline='') as output:
+                count = write_reconciliation_csv(output, mismatches)
+        except OSError as e:
+            raise CommandError(f'Could not write output: {e}')
+
+        if not options['quiet']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Wrote {count} mismatches for {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d} to {path}'
+                )
+            )
@@ -0,0 +1,101 @@
+"""
+Django management command to fill the rota automatically with the fairness solver
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.utils.rota_solver import solve_rota
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Fill empty rota days, balancing weekend and bank holiday duty across staff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=parse_date,
+            required=True,
+            help='First date to fill (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--end',
+            type=parse_date,
+            required=True,
+            help='Last date to fill (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Write the solution to the rota (default is a dry run)',
+        )
+        parser.add_argument(
+            '--max-per-week',
+            type=int,
+            default=2,
+            help='Maximum shifts per staff member in any 7-day window (default: 2)',
+        )
+        parser.add_argument(
+            '--min-rest-days',
+            type=int,
+            default=1,
+            help='Minimum free days between two shifts for the same staff member (default: 1)',
+        )
+        parser.add_argument(
+            '--time-limit',
+            type=float,
+            default=5.0,
+            help='Seconds allowed for improving the initial solution (default: 5)',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Suppress output except for errors',
+        )
+
+    def handle(self, *args, **options):
+        result = solve_rota(
+            options['start'],
+            options['end'],
+            apply=options['apply'],
+            max_shifts_per_week=options['max_per_week'],
+            min_rest_days=options['min_rest_days'],
+            time_limit=options['time_limit'],
+        )
+
+        if not result['success']:
+            raise CommandError(f"Failed to solve rota: {result['error']}")
+
+        if options['quiet']:
+            return
+
+        self.stdout.write(
+            f"Solved {result['slots']} slots in {result['solve_time']:.2f}s "
+            f"({result['passes']} improvement passes). "
+            f"Objective: {result['initial_objective']} -> {result['objective']}"
+        )
+        for day, level in result['unfilled']:
+            self.stdout.write(self.style.WARNING(f'  Unfilled: {day} {level}'))
+
+        if options['apply']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rota updated. Entries created: {result['entries_created']}, "
+                    f"Shifts created: {result['shifts_created']}"
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Dry run: {len(result['assignments'])} shifts proposed. "
+                    f"Use --apply to write them."
+                )
+            )
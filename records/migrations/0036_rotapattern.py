@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0035_remove_bankholiday_unnecessary_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RotaPattern',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('seniority_level', models.CharField(choices=[('trainee', 'Trainee'), ('oncall', 'On-Call'), ('senior', 'Senior')], max_length=10)),
+                ('cycle_weeks', models.PositiveSmallIntegerField(default=1, help_text='Length of the repeating cycle in weeks')),
+                ('anchor_date', models.DateField(help_text='Date treated as day 0 of the cycle (normally a Monday)')),
+                ('start_date', models.DateField(help_text='First date to generate')),
+                ('end_date', models.DateField(help_text='Last date to generate')),
+                ('bank_holiday_policy', models.CharField(choices=[('include', 'Follow the cycle'), ('skip', 'Leave empty'), ('override', 'Use bank holiday slots')], default='include', help_text='How bank holidays are filled', max_length=10)),
+                ('is_active', models.BooleanField(default=True, help_text='Include this pattern when generating all patterns')),
+                ('notes', models.TextField(blank=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Rota Pattern',
+                'verbose_name_plural': 'Rota Patterns',
+                'ordering': ['seniority_level', 'name'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='rotaentry',
+            options={'ordering': ['date'], 'verbose_name': 'Rota Date', 'verbose_name_plural': 'Rota Dates'},
+        ),
+        migrations.AlterModelOptions(
+            name='rotashift',
+            options={'ordering': ['seniority_level', 'staff__assignment_id'], 'verbose_name': 'Rota Staff', 'verbose_name_plural': 'Rota Staff'},
+        ),
+        migrations.CreateModel(
+            name='RotaPatternSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(help_text='Day within the cycle (0 = anchor date), or the turn in the bank holiday rotation for bank holiday slots')),
+                ('bank_holiday', models.BooleanField(default=False, help_text='Used on bank holidays when the pattern overrides them')),
+                ('pattern', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='records.rotapattern')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='records.oncallstaff')),
+            ],
+            options={
+                'verbose_name': 'Rota Pattern Slot',
+                'verbose_name_plural': 'Rota Pattern Slots',
+                'ordering': ['bank_holiday', 'position', 'staff__assignment_id'],
+                'unique_together': {('pattern', 'bank_holiday', 'position', 'staff')},
+            },
+        ),
+    ]
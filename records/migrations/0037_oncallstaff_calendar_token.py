@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0036_rotapattern'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oncallstaff',
+            name='calendar_token',
+            field=models.CharField(blank=True, editable=False, help_text="Secret token for this staff member's calendar feed URLs", max_length=64, null=True, unique=True),
+        ),
+    ]
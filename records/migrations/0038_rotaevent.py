@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0037_oncallstaff_calendar_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RotaEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('payload', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'Rota Event',
+                'verbose_name_plural': 'Rota Events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
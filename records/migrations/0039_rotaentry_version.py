@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0038_rotaevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rotaentry',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incremented on every change to the day, for optimistic concurrency'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0039_rotaentry_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RotaChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.PositiveIntegerField(help_text='Rota date as date.toordinal()')),
+                ('op', models.PositiveSmallIntegerField(choices=[(1, 'Added'), (2, 'Removed'), (3, 'Set to normal'), (4, 'Set to NHSP'), (5, 'Day created')])),
+                ('at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('staff', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='records.oncallstaff')),
+            ],
+            options={
+                'verbose_name': 'Rota Change',
+                'verbose_name_plural': 'Rota Changes',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['day', 'id'], name='records_rot_day_1e4197_idx')],
+            },
+        ),
+    ]
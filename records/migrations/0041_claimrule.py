@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0040_rotachange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('oncall_type', models.CharField(choices=[('normal', 'Normal'), ('nhsp', 'NHSP')], default='normal', max_length=20)),
+                ('minimum_callout_minutes', models.PositiveIntegerField(default=0, help_text='Each time entry is claimed for at least this long')),
+                ('rounding_minutes', models.PositiveIntegerField(default=0, help_text='Round each time entry up to a multiple of this (0 for no rounding)')),
+                ('multiplier', models.DecimalField(decimal_places=2, default=1, help_text='Hours claimed per hour worked', max_digits=4)),
+                ('day_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claim_rules', to='records.daytype')),
+            ],
+            options={
+                'verbose_name': 'Claim Rule',
+                'verbose_name_plural': 'Claim Rules',
+                'ordering': ['day_type__name', 'oncall_type'],
+                'unique_together': {('day_type', 'oncall_type')},
+            },
+        ),
+    ]
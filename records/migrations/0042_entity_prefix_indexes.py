@@ -0,0 +1,43 @@
+# Case-insensitive prefix indexes for the entity autocomplete
+
+from django.db import migrations
+
+# (index name, table, column)
+PREFIX_INDEXES = [
+    ('records_donor_id_prefix', 'records_donor', 'donor_id'),
+    ('records_recipient_id_prefix', 'records_recipient', 'recipient_id'),
+    ('records_labtask_name_prefix', 'records_labtask', 'name'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # istartswith is UPPER(col::text) LIKE UPPER(...) on PostgreSQL and a
+    # case-insensitive LIKE on SQLite, which can use a NOCASE index
+    vendor = schema_editor.connection.vendor
+    for name, table, column in PREFIX_INDEXES:
+        if vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+                f'(UPPER({column}::text) text_pattern_ops)'
+            )
+        elif vendor == 'sqlite':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column} COLLATE NOCASE)'
+            )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        for name, _, _ in PREFIX_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0041_claimrule'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
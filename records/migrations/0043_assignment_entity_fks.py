@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0042_entity_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='donor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='records.donor'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='lab_task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='records.labtask'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='recipient',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='records.recipient'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['entity_type', 'donor'], name='assignment_type_donor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['entity_type', 'recipient'], name='assignment_type_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['entity_type', 'lab_task'], name='assignment_type_lab_task_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='assignment',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('donor__isnull', True), ('entity_type', 'donor'), _connector='OR'), models.Q(('recipient__isnull', True), ('entity_type', 'recipient'), _connector='OR'), models.Q(('lab_task__isnull', True), ('entity_type', 'lab_task'), _connector='OR')), name='assignment_entity_fk_matches_type'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Point existing assignments at their donor, recipient or lab task
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# entity type -> (model name, identifying field); the foreign key is named after the type
+ENTITY_LOOKUPS = {
+    'donor': ('Donor', 'donor_id'),
+    'recipient': ('Recipient', 'recipient_id'),
+    'lab_task': ('LabTask', 'name'),
+}
+
+
+def link_assignment_entities(apps, schema_editor):
+    Assignment = apps.get_model('records', 'Assignment')
+    last_id = 0
+    while True:
+        batch = list(
+            Assignment.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'entity_type', 'entity_id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        for entity_type, (model_name, id_field) in ENTITY_LOOKUPS.items():
+            assignments = [a for a in batch if a.entity_type == entity_type]
+            if not assignments:
+                continue
+            pks = dict(
+                apps.get_model('records', model_name)
+                .objects.filter(**{f'{id_field}__in': {a.entity_id for a in assignments}})
+                .values_list(id_field, 'pk')
+            )
+            linked = []
+            for assignment in assignments:
+                if assignment.entity_id in pks:
+                    setattr(assignment, f'{entity_type}_id', pks[assignment.entity_id])
+                    linked.append(assignment)
+            if linked:
+                Assignment.objects.bulk_update(linked, [entity_type])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0043_assignment_entity_fks'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_assignment_entities, migrations.RunPython.noop),
+    ]
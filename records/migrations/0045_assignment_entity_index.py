@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0044_link_assignment_entities'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['entity_type', 'entity_id'], name='assignment_type_entity_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Copy each block's date onto its assignments
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_block_dates(apps, schema_editor):
+    Assignment = apps.get_model('records', 'Assignment')
+    TimeBlock = apps.get_model('records', 'TimeBlock')
+    Assignment.objects.update(
+        date=Subquery(TimeBlock.objects.filter(pk=OuterRef('timeblock_id')).values('date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0045_assignment_entity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_block_dates, migrations.RunPython.noop),
+    ]
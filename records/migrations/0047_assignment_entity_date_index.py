@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0046_assignment_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assignment',
+            name='date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.RemoveIndex(
+            model_name='assignment',
+            name='assignment_type_entity_idx',
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(
+                fields=['entity_type', 'entity_id', 'date', 'timeblock'],
+                name='assignment_entity_date_idx',
+            ),
+        ),
+    ]
@@ -15,11 +15,21 @@ from .entities import Donor, Recipient, LabTask
 # Time tracking models
 from .timetracking import TimeBlock, Assignment, TimeEntry
 
+# Claim rules
+from .claims import ClaimRule
+
 # Sign-off models
 from .signoff import MonthlySignOff, MonthlyReportSignOff
 
 # Rota models
-from .rota import RotaEntry, RotaShift
+from .rota import (
+    RotaEntry,
+    RotaShift,
+    RotaPattern,
+    RotaPatternSlot,
+    RotaEvent,
+    RotaChange,
+)
 
 # Holiday models
 from .holidays import BankHoliday
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""Claim rule models"""
+
+from django.db import models
+
+from .config import DayType
+from .timetracking import TimeBlock
+from ..utils.claim_rules import calculate_claim
+
+
+class ClaimRule(models.Model):
+    """How a block's claim is calculated from its time entries"""
+
+    day_type = models.ForeignKey(
+        DayType, on_delete=models.CASCADE, related_name="claim_rules"
+    )
+    oncall_type = models.CharField(
+        max_length=20, choices=TimeBlock.ONCALL_TYPE_CHOICES, default="normal"
+    )
+    minimum_callout_minutes = models.PositiveIntegerField(
+        default=0, help_text="Each time entry is claimed for at least this long"
+    )
+    rounding_minutes = models.PositiveIntegerField(
+        default=0,
+        help_text="Round each time entry up to a multiple of this (0 for no rounding)",
+    )
+    multiplier = models.DecimalField(
+        max_digits=4,
+        decimal_places=2,
+        default=1,
+        help_text="Hours claimed per hour worked",
+    )
+
+    class Meta:
+        unique_together = ["day_type", "oncall_type"]
+        ordering = ["day_type__name", "oncall_type"]
+        verbose_name = "Claim Rule"
+        verbose_name_plural = "Claim Rules"
+
+    def __str__(self):
+        return f"{self.day_type} ({self.get_oncall_type_display()})"
+
+    def calculate(self, entry_times):
+        """Claim for a block from its entries' (time_started, time_ended) pairs"""
+        return calculate_claim(
+            entry_times,
+            self.rounding_minutes,
+            self.minimum_callout_minutes,
+            self.multiplier,
+        )
@@ -1,11 +1,66 @@
 """Entity models (Donors, Recipients, Lab Tasks)"""
 
 from django.db import models
+from django.urls import reverse
 from django.utils import timezone
 
 
-class Donor(models.Model):
+def _invalidate_recent_entities():
+    from ..utils.entity_search import invalidate_recent_entities
+
+    invalidate_recent_entities()
+
+
+class EntityQuerySet(models.QuerySet):
+    def delete(self):
+        result = super().delete()
+        _invalidate_recent_entities()
+        return result
+
+
+class EntityModel(models.Model):
+    """
+    Base for assignable entities. The cached recent lists are refreshed when
+    an entity is created or deleted, or one of its RECENT_FIELDS changes.
+    """
+
+    # Fields shown in the recent lists
+    RECENT_FIELDS = ()
+
+    objects = EntityQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_recent_values = instance._recent_values()
+        return instance
+
+    def _recent_values(self):
+        # Read from __dict__ so deferred fields are not loaded
+        return tuple(self.__dict__.get(field) for field in self.RECENT_FIELDS)
+
+    def save(self, *args, **kwargs):
+        changed = self._state.adding or self._recent_values() != getattr(
+            self, "_loaded_recent_values", None
+        )
+        super().save(*args, **kwargs)
+        if changed:
+            self._loaded_recent_values = self._recent_values()
+            _invalidate_recent_entities()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        _invalidate_recent_entities()
+        return result
+
+
+class Donor(EntityModel):
     """ Donor model """
+    RECENT_FIELDS = ("donor_id", "name")
+
     donor_id = models.CharField(
         max_length=50,
         unique=True,
@@ -18,9 +73,14 @@ class Donor(models.Model):
     def __str__(self):
         return f"Donor {self.donor_id}" + (f" ({self.name})" if self.name else "")
 
+    def get_absolute_url(self):
+        return reverse("entity_activity", args=["donor", self.donor_id])
 
-class Recipient(models.Model):
+
+class Recipient(EntityModel):
     """ Recipient model """
+    RECENT_FIELDS = ("recipient_id", "name")
+
     recipient_id = models.CharField(
         max_length=50, unique=True, help_text="Unique recipient identifier"
     )
@@ -37,15 +97,23 @@ class Recipient(models.Model):
             f" ({self.name})" if self.name else ""
         )
 
+    def get_absolute_url(self):
+        return reverse("entity_activity", args=["recipient", self.recipient_id])
+
 
-class LabTask(models.Model):
+class LabTask(EntityModel):
     """
     Model representing a task other than donor or recipient assignments.
     """
 
+    RECENT_FIELDS = ("name", "description")
+
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse("entity_activity", args=["lab_task", self.name])
@@ -28,6 +28,15 @@ class BankHoliday(models.Model):
         """Get all bank holidays within a date range"""
         return cls.objects.filter(date__gte=start_date, date__lte=end_date)
 
+    @classmethod
+    def get_holiday_dates(cls, start_date, end_date):
+        """Get the set of bank holiday dates within a date range (single query)"""
+        return set(
+            cls.get_bank_holidays_in_range(start_date, end_date).values_list(
+                "date", flat=True
+            )
+        )
+
     @classmethod
     def sync_bank_holidays(cls, source="auto", region="england-and-wales"):
         """
@@ -51,6 +60,7 @@ class BankHoliday(models.Model):
         import requests
         from datetime import datetime
         from django.conf import settings
+        from ..utils.rota_version import rota_changed
 
         def process_holidays_data(data, data_source):
             """Process holidays data from either source"""
@@ -79,6 +89,9 @@ class BankHoliday(models.Model):
                     created_count += 1
                 else:
                     updated_count += 1
+
+            # Holiday flags are part of cached rota data
+            rota_changed()
             
             return {
                 "success": True,
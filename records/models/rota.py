@@ -1,5 +1,9 @@
 """Rota scheduling models"""
 
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
@@ -18,6 +22,11 @@ class RotaEntry(models.Model):
     )
     created = models.DateTimeField(default=timezone.now)
     last_modified = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Incremented on every change to the day, for optimistic concurrency",
+    )
 
     class Meta:
         verbose_name = "Rota Date"
@@ -79,4 +88,176 @@ class RotaShift(models.Model):
         unique_together = ["rota_entry", "staff"]
 
     def __str__(self):
-        return f"{self.staff.assignment_id} - {self.rota_entry.date} ({self.get_seniority_level_display()})"
\ No newline at end of file
+        return f"{self.staff.assignment_id} - {self.rota_entry.date} ({self.get_seniority_level_display()})"
+
+
+class RotaPattern(models.Model):
+    """Repeating rota cycle for one seniority level, used to bulk-generate the rota"""
+
+    SENIORITY_CHOICES = RotaShift.SENIORITY_CHOICES
+
+    BANK_HOLIDAY_POLICY_CHOICES = [
+        ("include", "Follow the cycle"),
+        ("skip", "Leave empty"),
+        ("override", "Use bank holiday slots"),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    seniority_level = models.CharField(max_length=10, choices=SENIORITY_CHOICES)
+    cycle_weeks = models.PositiveSmallIntegerField(
+        default=1, help_text="Length of the repeating cycle in weeks"
+    )
+    anchor_date = models.DateField(
+        help_text="Date treated as day 0 of the cycle (normally a Monday)"
+    )
+    start_date = models.DateField(help_text="First date to generate")
+    end_date = models.DateField(help_text="Last date to generate")
+    bank_holiday_policy = models.CharField(
+        max_length=10,
+        choices=BANK_HOLIDAY_POLICY_CHOICES,
+        default="include",
+        help_text="How bank holidays are filled",
+    )
+    is_active = models.BooleanField(
+        default=True, help_text="Include this pattern when generating all patterns"
+    )
+    notes = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Rota Pattern"
+        verbose_name_plural = "Rota Patterns"
+        ordering = ["seniority_level", "name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_seniority_level_display()}, {self.cycle_weeks}w)"
+
+    @property
+    def cycle_length(self):
+        """Number of days in one cycle"""
+        return self.cycle_weeks * 7
+
+    def clean(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError("End date cannot be before start date.")
+        if self.cycle_weeks == 0:
+            raise ValidationError("Cycle must be at least one week long.")
+
+
+class RotaPatternSlot(models.Model):
+    """Staff member on call at one position of a rota pattern"""
+
+    pattern = models.ForeignKey(
+        RotaPattern, on_delete=models.CASCADE, related_name="slots"
+    )
+    position = models.PositiveSmallIntegerField(
+        help_text="Day within the cycle (0 = anchor date), or the turn in the "
+        "bank holiday rotation for bank holiday slots"
+    )
+    staff = models.ForeignKey(OnCallStaff, on_delete=models.CASCADE)
+    bank_holiday = models.BooleanField(
+        default=False,
+        help_text="Used on bank holidays when the pattern overrides them",
+    )
+
+    class Meta:
+        verbose_name = "Rota Pattern Slot"
+        verbose_name_plural = "Rota Pattern Slots"
+        ordering = ["bank_holiday", "position", "staff__assignment_id"]
+        unique_together = ["pattern", "bank_holiday", "position", "staff"]
+
+    def __str__(self):
+        kind = "BH turn" if self.bank_holiday else "Day"
+        return f"{self.pattern.name}: {kind} {self.position} - {self.staff.assignment_id}"
+
+    def clean(self):
+        if (
+            not self.bank_holiday
+            and self.pattern_id
+            and self.position >= self.pattern.cycle_length
+        ):
+            raise ValidationError(
+                f"Position must be less than the cycle length ({self.pattern.cycle_length} days)."
+            )
+
+
+class RotaEvent(models.Model):
+    """
+    Recent rota change, streamed to open rota calendars.
+
+    Rows are only kept for a short time; they let calendar pages served by
+    other worker processes (or reconnecting after a drop) catch up.
+    """
+
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+    payload = models.JSONField()
+
+    class Meta:
+        verbose_name = "Rota Event"
+        verbose_name_plural = "Rota Events"
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.payload.get('op')} {self.payload.get('date', '')} ({self.created:%Y-%m-%d %H:%M:%S})"
+
+
+class RotaChange(models.Model):
+    """
+    Append-only audit log of rota edits.
+
+    One small row per change: the day as a date ordinal, the staff member,
+    an op code, who made the change and when. Staff and actor ids are kept
+    without foreign key constraints so the history outlives deletions.
+    """
+
+    ADD_STAFF = 1
+    REMOVE_STAFF = 2
+    SET_NORMAL = 3
+    SET_NHSP = 4
+    CREATE_ENTRY = 5
+
+    OP_CHOICES = [
+        (ADD_STAFF, "Added"),
+        (REMOVE_STAFF, "Removed"),
+        (SET_NORMAL, "Set to normal"),
+        (SET_NHSP, "Set to NHSP"),
+        (CREATE_ENTRY, "Day created"),
+    ]
+
+    day = models.PositiveIntegerField(help_text="Rota date as date.toordinal()")
+    staff = models.ForeignKey(
+        OnCallStaff,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    op = models.PositiveSmallIntegerField(choices=OP_CHOICES)
+    actor = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Rota Change"
+        verbose_name_plural = "Rota Changes"
+        ordering = ["id"]
+        indexes = [models.Index(fields=["day", "id"])]
+
+    def __str__(self):
+        return f"{self.date} {self.get_op_display()} ({self.at:%Y-%m-%d %H:%M:%S})"
+
+    @property
+    def date(self):
+        return date.fromordinal(self.day)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Rota changes are append-only")
+        super().save(*args, **kwargs)
@@ -1,14 +1,33 @@
 """Staff-related models"""
 
+import secrets
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+
+def _rota_changed():
+    from ..utils.rota_events import rota_event
+    from ..utils.rota_version import rota_changed
+
+    rota_changed([rota_event("refresh")])
 
 
 class OnCallStaff(models.Model):
     """
     Model representing an on-call staff member.
+
+    Rota feeds and calendars show each shift's assignment id and staff name
+    and are cached by rota version, so the version moves on when ROTA_FIELDS
+    or the user's name change.
     """
 
+    # Fields shown with each shift in rota feeds and calendars
+    ROTA_FIELDS = ("assignment_id", "user_id")
+
     SENIORITY_CHOICES = [
         ("trainee", "Trainee"),
         ("oncall", "On-Call"),
@@ -28,10 +47,75 @@ class OnCallStaff(models.Model):
         default="trainee",
         help_text="Seniority level of this staff member",
     )
+    calendar_token = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Secret token for this staff member's calendar feed URLs",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rota_values = instance._rota_values()
+        return instance
+
+    def _rota_values(self):
+        # Read from __dict__ so deferred fields are not loaded
+        return tuple(self.__dict__.get(field) for field in self.ROTA_FIELDS)
+
+    def save(self, *args, **kwargs):
+        # New staff have no shifts yet, so nothing cached shows them
+        changed = not self._state.adding and self._rota_values() != getattr(
+            self, "_loaded_rota_values", None
+        )
+        super().save(*args, **kwargs)
+        self._loaded_rota_values = self._rota_values()
+        if changed:
+            _rota_changed()
+
+    def get_calendar_token(self):
+        """Return the calendar feed token, creating one on first use"""
+        if not self.calendar_token:
+            self.calendar_token = secrets.token_urlsafe(32)
+            self.save(update_fields=["calendar_token"])
+        return self.calendar_token
+
+    def reset_calendar_token(self):
+        """Issue a new calendar feed token, revoking existing subscriptions"""
+        from ..utils.calendar_feed import calendar_token_cache_key
+
+        old_token = self.calendar_token
+        self.calendar_token = secrets.token_urlsafe(32)
+        self.save(update_fields=["calendar_token"])
+        # Feeds themselves are keyed by staff, so only the old token's lookup goes
+        if old_token:
+            cache.delete(calendar_token_cache_key(old_token))
+        return self.calendar_token
 
     def __str__(self):
         return f"{self.assignment_id} - {self.user.get_full_name()} ({self.get_seniority_level_display()})"
 
     class Meta:
         verbose_name = "On-call Staff"
-        verbose_name_plural = "On-call Staff"
\ No newline at end of file
+        verbose_name_plural = "On-call Staff"
+
+
+def _user_names(user):
+    return user.__dict__.get("first_name"), user.__dict__.get("last_name")
+
+
+@receiver(post_init, sender=User)
+def _remember_user_names(sender, instance, **kwargs):
+    instance._loaded_names = _user_names(instance)
+
+
+@receiver(post_save, sender=User)
+def _user_names_changed(sender, instance, created, **kwargs):
+    """Staff names are shown in cached rota feeds and calendars"""
+    changed = not created and _user_names(instance) != instance._loaded_names
+    instance._loaded_names = _user_names(instance)
+    if changed and OnCallStaff.objects.filter(user=instance).exists():
+        _rota_changed()
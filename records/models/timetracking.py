@@ -10,6 +10,7 @@ from .config import DayType, TaskType, WorkMode
 from .constants import ASSIGNMENT_TYPE_CONFIG
 from .entities import Donor, LabTask, Recipient
 from .staff import OnCallStaff
+from ..utils.time_overlap import find_overlaps, minute_interval
 
 
 class TimeBlock(models.Model):
@@ -51,12 +52,59 @@ class TimeBlock(models.Model):
                 self.day_type = DayType.objects.get_or_create(
                     name="Weekday", defaults={"color": "success"}
                 )[0]
+        # New blocks have no entries yet; they are claimed as entries are added
+        existing = self.pk is not None
+        update_fields = kwargs.get("update_fields")
+        if existing and self.refresh_claim():
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "claim"}
         super().save(*args, **kwargs)
+        if existing and (update_fields is None or "date" in update_fields):
+            # Keep the assignments' copy of the date in step
+            self.assignments.exclude(date=self.date).update(date=self.date)
+
+    def get_claim_rule(self):
+        """The ClaimRule for this block's day type and on-call type, if any"""
+        if not self.day_type_id:
+            return None
+        return (
+            self.day_type.claim_rules.filter(oncall_type=self.oncall_type)
+            .order_by("pk")
+            .first()
+        )
+
+    def refresh_claim(self, entry_times=None):
+        """
+        Recalculate the claim from the matching claim rule.
+
+        Blocks without a rule keep their typed-in claim. Pass the entries'
+        (time_started, time_ended) pairs to avoid reading them back.
+
+        Returns:
+            bool: Whether a rule applied and the claim was recalculated
+        """
+        rule = self.get_claim_rule()
+        if rule is None:
+            return False
+        if entry_times is None:
+            entry_times = (
+                self.time_entries.values_list("time_started", "time_ended")
+                if self.pk
+                else []
+            )
+        self.claim = rule.calculate(entry_times)
+        return True
 
     def __str__(self):
         return f"{self.staff.assignment_id} - {self.date} ({self.day_type})"
 
 
+class AssignmentQuerySet(models.QuerySet):
+    def with_entities(self):
+        """Join each assignment's donor, recipient or lab task in the same query"""
+        return self.select_related(*Assignment.ENTITY_LOOKUPS)
+
+
 class Assignment(models.Model):
     """Links TimeBlock to entities"""
 
@@ -81,23 +129,77 @@ class Assignment(models.Model):
         max_length=50, default="bi-person-fill", help_text="Bootstrap icon class"
     )
     created = models.DateTimeField(default=timezone.now)
+    # Copy of the block's date, so an entity's blocks can be paged in date
+    # order straight from the (entity_type, entity_id, date) index
+    date = models.DateField(editable=False)
+
+    # Only the foreign key matching entity_type is set, and only when the
+    # entity exists; entity_id keeps the identifier as entered
+    donor = models.ForeignKey(
+        Donor, null=True, blank=True, on_delete=models.SET_NULL, related_name="assignments"
+    )
+    recipient = models.ForeignKey(
+        Recipient, null=True, blank=True, on_delete=models.SET_NULL, related_name="assignments"
+    )
+    lab_task = models.ForeignKey(
+        LabTask, null=True, blank=True, on_delete=models.SET_NULL, related_name="assignments"
+    )
+
+    # Entity model and identifying field for each entity type (the foreign
+    # key is named after the type)
+    ENTITY_LOOKUPS = {
+        "donor": (Donor, "donor_id"),
+        "recipient": (Recipient, "recipient_id"),
+        "lab_task": (LabTask, "name"),
+    }
+
+    objects = AssignmentQuerySet.as_manager()
 
     class Meta:
         unique_together = ["timeblock", "entity_type", "entity_id"]
         verbose_name = "Assignment"
         verbose_name_plural = "Assignments"
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    (models.Q(donor__isnull=True) | models.Q(entity_type="donor"))
+                    & (models.Q(recipient__isnull=True) | models.Q(entity_type="recipient"))
+                    & (models.Q(lab_task__isnull=True) | models.Q(entity_type="lab_task"))
+                ),
+                name="assignment_entity_fk_matches_type",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["entity_type", "donor"], name="assignment_type_donor_idx"),
+            models.Index(fields=["entity_type", "recipient"], name="assignment_type_recipient_idx"),
+            models.Index(fields=["entity_type", "lab_task"], name="assignment_type_lab_task_idx"),
+            models.Index(
+                fields=["entity_type", "entity_id", "date", "timeblock"],
+                name="assignment_entity_date_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is None:
+            self.date = self.timeblock.date
+            self.link_entity()
+        super().save(*args, **kwargs)
+
+    def link_entity(self):
+        """Point the foreign key for entity_type at the entity named by entity_id"""
+        for entity_type, (model, id_field) in self.ENTITY_LOOKUPS.items():
+            if entity_type != self.entity_type:
+                setattr(self, entity_type, None)
+                continue
+            field = self._meta.get_field(entity_type)
+            if field.is_cached(self) and getattr(getattr(self, entity_type), id_field, None) == self.entity_id:
+                continue
+            setattr(self, entity_type, model.objects.filter(**{id_field: self.entity_id}).first())
 
     def get_entity_object(self):
         """Get the actual entity object based on type and ID"""
-        try:
-            if self.entity_type == "donor":
-                return Donor.objects.get(donor_id=self.entity_id)
-            elif self.entity_type == "recipient":
-                return Recipient.objects.get(recipient_id=self.entity_id)
-            elif self.entity_type == "lab_task":
-                return LabTask.objects.get(name=self.entity_id)
-        except (Donor.DoesNotExist, Recipient.DoesNotExist, LabTask.DoesNotExist):
-            return None
+        if self.entity_type in self.ENTITY_LOOKUPS:
+            return getattr(self, self.entity_type)
         return None
 
     def get_assignment_type_config(self):
@@ -158,6 +260,48 @@ class TimeEntry(models.Model):
         # Basic validation - end time should be different from start time
         if self.time_started == self.time_ended:
             raise ValidationError("Start time and end time cannot be the same.")
+        if self.timeblock_id and self.time_started and self.time_ended:
+            self.check_overlaps()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.update_block_claim()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.update_block_claim()
+        return result
+
+    def update_block_claim(self):
+        """Write the block's recalculated claim, if a claim rule applies to it"""
+        block = self.timeblock
+        if block.refresh_claim():
+            TimeBlock.objects.filter(pk=block.pk).update(
+                claim=block.claim, last_modified=timezone.now()
+            )
+
+    def check_overlaps(self):
+        """Reject an entry that overlaps another entry in the same block"""
+        others = {
+            entry_id: (started, ended)
+            for entry_id, started, ended in TimeEntry.objects.filter(
+                timeblock_id=self.timeblock_id
+            )
+            .exclude(pk=self.pk)
+            .values_list("id", "time_started", "time_ended")
+        }
+        # Saved entries have positive ids, so key 0 stands for this one
+        intervals = [(0, *minute_interval(self.time_started, self.time_ended))]
+        intervals += [
+            (entry_id, *minute_interval(started, ended))
+            for entry_id, (started, ended) in others.items()
+        ]
+        clashes = [others[other] for key, other in find_overlaps(intervals) if key == 0]
+        if clashes:
+            started, ended = min(clashes)
+            raise ValidationError(
+                f"This entry overlaps the {started:%H:%M}-{ended:%H:%M} entry in this block."
+            )
 
     def __str__(self):
         return f"{self.timeblock.staff.assignment_id} - {self.timeblock.date} - {self.task.name} ({self.hours}h)"
\ No newline at end of file
@@ -1,3 +1,1949 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .forms import TimeBlockEditForm, TimeBlockForm
+from .models import (
+    Assignment,
+    BankHoliday,
+    ClaimRule,
+    DayType,
+    Donor,
+    MonthlySignOff,
+    OnCallStaff,
+    Recipient,
+    RotaChange,
+    RotaEntry,
+    RotaEvent,
+    RotaPattern,
+    RotaPatternSlot,
+    RotaShift,
+    TaskType,
+    TimeBlock,
+    TimeEntry,
+    WorkMode,
+)
+from .utils.assignment_sync import sync_assignments
+from .utils.claim_recompute import recompute_month_claims
+from .utils.entity_search import AUTOCOMPLETE_LIMIT, invalidate_recent_entities
+from .utils.overlap_scan import scan_month_overlaps
+from .utils.rota_bulk import aligned_offset, copy_rota_month, shift_staff_rota
+from .utils.rota_coverage import scan_coverage
+from .utils.rota_import import import_rota_csv
+from .utils.rota_index import RotaIndex, rota_index
+from .utils.rota_patterns import generate_rota_from_patterns
+from .utils.rota_reconciliation import NO_ROTA_SHIFT, NO_TIMEBLOCK, reconcile_rota
+from .utils.rota_solver import RotaSolver, apply_rota_assignments, solve_rota
+from .utils.rota_version import (
+    ROTA_VERSION_CACHE_KEY,
+    bump_rota_version,
+    get_rota_version,
+    rota_changed,
+)
+
+# Session, user and OnCallStaff lookups done by @require_oncall_staff
+AUTH_QUERIES = 3
+
+# RotaChange audit rows, written with one INSERT per rota edit
+AUDIT_QUERIES = 1
+
+
+class RotaEndpointQueryBudgetTests(TestCase):
+    """Lock in the number of statements each rota AJAX click costs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("coordinator", first_name="Ann", last_name="Lee")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.other_staff = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+        cls.day = date(2025, 3, 3)
+
+    def setUp(self):
+        self.client.force_login(self.staff.user)
+
+    def post_json(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def create_day(self, *staff_levels, shift_type="normal"):
+        entry = RotaEntry.objects.create(date=self.day, shift_type=shift_type)
+        shifts = [
+            RotaShift.objects.create(rota_entry=entry, staff=staff, seniority_level=level)
+            for staff, level in staff_levels
+        ]
+        return entry, shifts
+
+    def test_add_staff_to_existing_day(self):
+        entry, _ = self.create_day((self.other_staff, "senior"))
+
+        # staff, version bump, entry, insert (+ transaction and savepoint statements)
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 8):
+            response = self.post_json(
+                "/rota/add-staff/",
+                {"date": "2025-03-03", "staff_id": self.staff.id, "seniority_level": "oncall"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rota_entry_id"], entry.id)
+        self.assertEqual(entry.shifts.count(), 2)
+
+    def test_add_staff_twice_is_rejected_by_unique_constraint(self):
+        self.create_day((self.staff, "oncall"))
+
+        with self.assertNumQueries(AUTH_QUERIES + 10):
+            response = self.post_json(
+                "/rota/add-staff/",
+                {"date": "2025-03-03", "staff_id": self.staff.id, "seniority_level": "senior"},
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RotaShift.objects.count(), 1)
+        # The version bump is rolled back with the rejected insert
+        self.assertEqual(RotaEntry.objects.get().version, 1)
+
+    def test_versioned_add_staff_reports_the_shift_type(self):
+        entry, _ = self.create_day((self.other_staff, "senior"), shift_type="nhsp")
+
+        # staff, conditional version bump, entry, insert
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 8):
+            response = self.post_json(
+                "/rota/add-staff/",
+                {
+                    "date": "2025-03-03",
+                    "staff_id": self.staff.id,
+                    "seniority_level": "oncall",
+                    "version": 1,
+                    "rota_entry_id": entry.id,
+                },
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+        self.assertEqual(response.json()["shift_type"], "nhsp")
+        entry.refresh_from_db()
+        self.assertEqual(entry.version, 2)
+
+    def test_stale_version_is_rejected_with_current_state(self):
+        entry, shifts = self.create_day((self.other_staff, "senior"))
+        RotaEntry.objects.filter(id=entry.id).update(version=3)
+
+        response = self.post_json(
+            "/rota/add-staff/",
+            {
+                "date": "2025-03-03",
+                "staff_id": self.staff.id,
+                "seniority_level": "oncall",
+                "version": 2,
+                "rota_entry_id": entry.id,
+            },
+        )
+
+        self.assertEqual(response.status_code, 409)
+        current = response.json()["current"]
+        self.assertEqual(current["version"], 3)
+        self.assertEqual([shift["id"] for shift in current["shifts"]], [shifts[0].id])
+        self.assertEqual(RotaShift.objects.count(), 1)
+
+    def test_add_to_day_created_elsewhere_conflicts(self):
+        self.create_day((self.other_staff, "senior"))
+
+        response = self.post_json(
+            "/rota/add-staff/",
+            {"date": "2025-03-03", "staff_id": self.staff.id, "seniority_level": "oncall", "version": 0},
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(RotaShift.objects.count(), 1)
+
+    def test_add_staff_unknown_staff(self):
+        with self.assertNumQueries(AUTH_QUERIES + 1):
+            response = self.post_json(
+                "/rota/add-staff/",
+                {"date": "2025-03-03", "staff_id": 999, "seniority_level": "oncall"},
+            )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(RotaEntry.objects.exists())
+
+    def test_toggle_shift_type(self):
+        entry, _ = self.create_day((self.staff, "oncall"))
+
+        # update, read back
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 4):
+            response = self.post_json("/rota/toggle-shift-type/", {"date": "2025-03-03"})
+
+        self.assertEqual(response.json()["shift_type"], "nhsp")
+        entry.refresh_from_db()
+        self.assertEqual(entry.shift_type, "nhsp")
+
+    def test_versioned_toggle_is_a_single_update(self):
+        entry, _ = self.create_day((self.staff, "oncall"))
+
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 3):
+            response = self.post_json(
+                "/rota/toggle-shift-type/",
+                {"date": "2025-03-03", "version": 1, "rota_entry_id": entry.id, "shift_type": "normal"},
+            )
+
+        self.assertEqual(response.json()["shift_type"], "nhsp")
+        self.assertEqual(response.json()["version"], 2)
+        entry.refresh_from_db()
+        self.assertEqual((entry.shift_type, entry.version), ("nhsp", 2))
+
+    def test_toggle_shift_type_on_empty_day_creates_entry(self):
+        # update (no rows), insert
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 4):
+            response = self.post_json("/rota/toggle-shift-type/", {"date": "2025-03-03"})
+
+        self.assertEqual(response.json()["shift_type"], "nhsp")
+        self.assertEqual(RotaEntry.objects.get(date=self.day).shift_type, "nhsp")
+
+    def test_remove_staff_keeps_entry_with_remaining_shifts(self):
+        entry, shifts = self.create_day((self.staff, "oncall"), (self.other_staff, "senior"))
+
+        # version bump, select of the day's shifts, delete
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 5):
+            response = self.post_json("/rota/remove-staff/", {"shift_id": shifts[0].id})
+
+        self.assertEqual(response.json()["remaining_shifts"], 1)
+        self.assertFalse(response.json()["rota_entry_deleted"])
+        self.assertEqual(list(entry.shifts.all()), [shifts[1]])
+
+    def test_remove_last_staff_deletes_entry(self):
+        _, shifts = self.create_day((self.staff, "oncall"))
+
+        # version bump, select, delete shifts by entry, delete entry
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 6):
+            response = self.post_json("/rota/remove-staff/", {"shift_id": shifts[0].id})
+
+        self.assertTrue(response.json()["rota_entry_deleted"])
+        self.assertFalse(RotaEntry.objects.exists())
+
+    def test_remove_unknown_shift(self):
+        with self.assertNumQueries(AUTH_QUERIES + 3):
+            response = self.post_json("/rota/remove-staff/", {"shift_id": 999})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_clear_day_single_level(self):
+        entry, _ = self.create_day((self.staff, "oncall"), (self.other_staff, "senior"))
+
+        # version bump, select of entry and shifts, delete
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 5):
+            response = self.post_json(
+                "/rota/clear-day/", {"date": "2025-03-03", "seniority_level": "senior"}
+            )
+
+        self.assertEqual(response.json()["deleted_count"], 1)
+        self.assertEqual(response.json()["rota_entry_id"], entry.id)
+        self.assertEqual(entry.shifts.get().staff, self.staff)
+
+    def test_clear_day_all_levels(self):
+        self.create_day((self.staff, "oncall"), (self.other_staff, "senior"))
+
+        # version bump, select, delete shifts by entry, delete entry
+        with self.assertNumQueries(AUTH_QUERIES + AUDIT_QUERIES + 6):
+            response = self.post_json("/rota/clear-day/", {"date": "2025-03-03"})
+
+        self.assertEqual(response.json()["deleted_count"], 2)
+        self.assertIsNone(response.json()["rota_entry_id"])
+        self.assertFalse(RotaEntry.objects.exists())
+        self.assertFalse(RotaShift.objects.exists())
+
+    def test_clear_day_without_entry(self):
+        with self.assertNumQueries(AUTH_QUERIES + 3):
+            response = self.post_json("/rota/clear-day/", {"date": "2025-03-03"})
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROTA_API_KEYS=["switchboard-key"], ROTA_HANDOVER_HOUR=9)
+class OnCallNowApiTests(TestCase):
+    """The on-call lookup is served from memory once its month is loaded"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("oncall", first_name="Ann", last_name="Lee")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.other_staff = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+        entry = RotaEntry.objects.create(date=date(2025, 3, 3))
+        RotaShift.objects.create(rota_entry=entry, staff=cls.staff, seniority_level="oncall")
+
+    def setUp(self):
+        # Rows created by the test case never commit, so start from a fresh index
+        bump_rota_version()
+
+    def get_now(self, at, **headers):
+        headers.setdefault("HTTP_AUTHORIZATION", "Bearer switchboard-key")
+        return self.client.get("/rota/api/now", {"at": at}, **headers)
+
+    def test_lookup_by_timestamp(self):
+        response = self.get_now("2025-03-03T10:00:00+00:00")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["rota_date"], "2025-03-03")
+        self.assertEqual(
+            data["oncall"]["oncall"], [{"staff_id": "AL1", "name": "Ann Lee", "notes": ""}]
+        )
+        self.assertEqual(data["oncall"]["senior"], [])
+
+    def test_before_handover_belongs_to_previous_day(self):
+        response = self.get_now("2025-03-04T08:59:00Z")
+
+        self.assertEqual(response.json()["rota_date"], "2025-03-03")
+
+    def test_warm_lookup_does_not_query(self):
+        self.get_now("2025-03-03T10:00:00Z")
+
+        with self.assertNumQueries(0):
+            response = self.get_now("2025-03-20T10:00:00Z")
+
+        self.assertEqual(response.json()["shift_type"], None)
+
+    def test_rota_write_invalidates_index(self):
+        self.get_now("2025-03-03T10:00:00Z")
+        self.client.force_login(self.staff.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/rota/add-staff/",
+                json.dumps(
+                    {"date": "2025-03-03", "staff_id": self.other_staff.id, "seniority_level": "senior"}
+                ),
+                content_type="application/json",
+            )
+
+        response = self.get_now("2025-03-03T10:00:00Z")
+        self.assertEqual([s["staff_id"] for s in response.json()["oncall"]["senior"]], ["BK2"])
+
+    def test_rejects_unknown_key_and_bad_timestamp(self):
+        self.assertEqual(
+            self.get_now("2025-03-03T10:00:00Z", HTTP_AUTHORIZATION="Bearer nope").status_code,
+            401,
+        )
+        self.assertEqual(self.get_now("yesterday").status_code, 400)
+
+
+class CalendarFeedTests(TestCase):
+    """Calendar polls are answered from the cache until the rota changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("feed", first_name="Ann", last_name="Lee")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.token = cls.staff.get_calendar_token()
+        entry = RotaEntry.objects.create(date=date.today())
+        RotaShift.objects.create(rota_entry=entry, staff=cls.staff, seniority_level="senior")
+
+    def setUp(self):
+        bump_rota_version()
+
+    def test_personal_feed(self):
+        response = self.client.get(f"/rota/calendar/{self.token}/personal.ics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.content.decode()
+        self.assertIn("SUMMARY:On call (Senior)", body)
+        self.assertIn(f"UID:rota-{date.today().isoformat()}-AL1@oncall-records", body)
+
+    def test_conditional_poll_is_not_modified_without_queries(self):
+        etag = self.client.get(f"/rota/calendar/{self.token}/team.ics")["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                f"/rota/calendar/{self.token}/team.ics", HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_unknown_token(self):
+        response = self.client.get("/rota/calendar/not-a-token/personal.ics")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_reset_token_revokes_only_that_token(self):
+        self.client.get(f"/rota/calendar/{self.token}/personal.ics")
+        version = get_rota_version()
+
+        new_token = OnCallStaff.objects.get(id=self.staff.id).reset_calendar_token()
+
+        self.assertEqual(get_rota_version(), version)
+        response = self.client.get(f"/rota/calendar/{self.token}/personal.ics")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f"/rota/calendar/{new_token}/personal.ics")
+        self.assertEqual(response.status_code, 200)
+
+    def test_team_feed_follows_staff_renames(self):
+        self.client.get(f"/rota/calendar/{self.token}/team.ics")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(id=self.staff.user_id)
+            user.last_name = "Smith"
+            user.save()
+            staff = OnCallStaff.objects.get(id=self.staff.id)
+            staff.assignment_id = "AS1"
+            staff.save()
+
+        body = self.client.get(f"/rota/calendar/{self.token}/team.ics").content.decode()
+        self.assertIn("SUMMARY:Senior: Ann Smith", body)
+        self.assertIn(f"UID:rota-{date.today().isoformat()}-AS1@oncall-records", body)
+
+    def test_saves_that_leave_names_alone_keep_the_version(self):
+        version = get_rota_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(id=self.staff.user_id)
+            user.set_password("changed")
+            user.save()
+            staff = OnCallStaff.objects.get(id=self.staff.id)
+            staff.color = "#000000"
+            staff.save()
+
+        self.assertEqual(get_rota_version(), version)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "records_test_cache",
+        }
+    }
+)
+class SharedRotaVersionTests(TestCase):
+    """The rota version works on the database cache production uses"""
+
+    def setUp(self):
+        call_command("createcachetable", verbosity=0)
+
+    def test_bump_is_seen_through_another_connection(self):
+        # Each worker process has its own connection to the cache table
+        other_worker = caches.create_connection("default")
+        version = get_rota_version()
+        self.assertEqual(other_worker.get(ROTA_VERSION_CACHE_KEY), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rota_changed()
+
+        self.assertNotEqual(other_worker.get(ROTA_VERSION_CACHE_KEY), version)
+        self.assertEqual(other_worker.get(ROTA_VERSION_CACHE_KEY), get_rota_version())
+
+
+class RotaEventTests(TestCase):
+    """Committed rota edits are recorded for the live calendar stream"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("live", first_name="Ann", last_name="Lee")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+
+    def setUp(self):
+        self.client.force_login(self.staff.user)
+
+    def test_batch_records_one_event_per_operation(self):
+        operations = [
+            {"op": "add_staff", "date": "2025-03-03", "staff_id": self.staff.id, "seniority_level": "oncall"},
+            {"op": "toggle_shift_type", "date": "2025-03-03"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/rota/batch/", json.dumps({"operations": operations}), content_type="application/json"
+            )
+
+        add_event, toggle_event = RotaEvent.objects.values_list("payload", flat=True)
+        shift = RotaShift.objects.get()
+        self.assertEqual(add_event["op"], "add_staff")
+        self.assertEqual(add_event["date"], "2025-03-03")
+        self.assertEqual(add_event["shift"]["id"], shift.id)
+        self.assertEqual(
+            toggle_event,
+            {"op": "toggle_shift_type", "date": "2025-03-03", "shift_type": "nhsp", "version": 1},
+        )
+
+    def test_stale_batch_is_rejected_as_conflict(self):
+        entry = RotaEntry.objects.create(date=date(2025, 3, 3), version=2)
+        operations = [
+            {"op": "toggle_shift_type", "date": "2025-03-03", "version": 1, "rota_entry_id": entry.id},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/rota/batch/", json.dumps({"operations": operations}), content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 409)
+        result = response.json()["results"][0]
+        self.assertTrue(result["conflict"])
+        self.assertEqual(result["current"]["version"], 2)
+        entry.refresh_from_db()
+        self.assertEqual((entry.shift_type, entry.version), ("normal", 2))
+        self.assertFalse(RotaEvent.objects.exists())
+
+    def test_failed_batch_records_nothing(self):
+        operations = [{"op": "remove_staff", "shift_id": 999}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/rota/batch/", json.dumps({"operations": operations}), content_type="application/json"
+            )
+
+        self.assertFalse(RotaEvent.objects.exists())
+
+    def test_stream_is_not_served_under_wsgi(self):
+        response = self.client.get("/rota/events/")
+
+        self.assertEqual(response.status_code, 204)
+
+
+class RotaBatchTests(TestCase):
+    """A batch is replayed in order and written all or nothing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = OnCallStaff.objects.create(
+            assignment_id="AL1", user=User.objects.create_user("batch")
+        )
+        cls.other = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff.user)
+        self.entry = RotaEntry.objects.create(date=date(2025, 3, 3))
+        self.shift = RotaShift.objects.create(
+            rota_entry=self.entry, staff=self.staff, seniority_level="oncall"
+        )
+        RotaShift.objects.create(rota_entry=self.entry, staff=self.other, seniority_level="senior")
+
+    def post(self, operations):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/rota/batch/", json.dumps({"operations": operations}), content_type="application/json"
+            )
+
+    def test_remove_then_add_same_staff_on_one_day(self):
+        response = self.post(
+            [
+                {"op": "remove_staff", "shift_id": self.shift.id},
+                {"op": "add_staff", "date": "2025-03-03", "staff_id": self.staff.id, "seniority_level": "trainee"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        shift = RotaShift.objects.get(rota_entry=self.entry, staff=self.staff)
+        self.assertEqual(shift.seniority_level, "trainee")
+        self.assertEqual(response.json()["results"][1]["shift"]["id"], shift.id)
+        self.assertEqual(
+            list(RotaChange.objects.order_by("id").values_list("op", "staff_id")),
+            [(RotaChange.REMOVE_STAFF, self.staff.id), (RotaChange.ADD_STAFF, self.staff.id)],
+        )
+
+    def test_clear_one_level_then_the_rest_of_the_day(self):
+        response = self.post([{"op": "clear_day", "date": "2025-03-03", "seniority_level": "senior"}])
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()["results"][0]
+        self.assertEqual((result["deleted_count"], result["rota_entry_id"]), (1, self.entry.id))
+        self.assertEqual(list(RotaShift.objects.values_list("staff_id", flat=True)), [self.staff.id])
+
+        response = self.post([{"op": "clear_day", "date": "2025-03-03"}])
+
+        self.assertEqual(response.json()["results"][0]["rota_entry_id"], None)
+        self.assertFalse(RotaEntry.objects.exists())
+        self.assertFalse(RotaShift.objects.exists())
+
+    def test_failing_operation_rolls_back_the_whole_batch(self):
+        response = self.post(
+            [
+                {"op": "remove_staff", "shift_id": self.shift.id},
+                {"op": "toggle_shift_type", "date": "2025-03-03"},
+                {"op": "add_staff", "date": "2025-03-04", "staff_id": self.other.id, "seniority_level": "oncall"},
+                {"op": "add_staff", "date": "2025-03-03", "staff_id": self.other.id, "seniority_level": "oncall"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual(results[3]["error"], "Staff already assigned on this date")
+        self.assertEqual({result["error"] for result in results[:3]}, {"Batch was not applied"})
+        self.entry.refresh_from_db()
+        self.assertEqual((self.entry.shift_type, self.entry.version), ("normal", 1))
+        self.assertEqual(RotaShift.objects.count(), 2)
+        self.assertTrue(RotaShift.objects.filter(id=self.shift.id).exists())
+        self.assertFalse(RotaEntry.objects.filter(date=date(2025, 3, 4)).exists())
+        self.assertFalse(RotaEvent.objects.exists())
+        self.assertFalse(RotaChange.objects.exists())
+
+
+class RotaHistoryTests(TestCase):
+    """Rota edits leave a compact audit trail in the same transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("history", first_name="Ann", last_name="Lee")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+
+    def setUp(self):
+        self.client.force_login(self.staff.user)
+
+    def post_batch(self, operations):
+        return self.client.post(
+            "/rota/batch/", json.dumps({"operations": operations}), content_type="application/json"
+        )
+
+    def test_batch_logs_each_change_with_actor(self):
+        self.post_batch(
+            [
+                {"op": "add_staff", "date": "2025-03-03", "staff_id": self.staff.id, "seniority_level": "oncall"},
+                {"op": "toggle_shift_type", "date": "2025-03-03"},
+                {"op": "clear_day", "date": "2025-03-03"},
+            ]
+        )
+
+        changes = list(RotaChange.objects.values_list("day", "op", "staff_id", "actor_id"))
+        day = date(2025, 3, 3).toordinal()
+        user_id = self.staff.user_id
+        self.assertEqual(
+            changes,
+            [
+                (day, RotaChange.ADD_STAFF, self.staff.id, user_id),
+                (day, RotaChange.SET_NHSP, None, user_id),
+                (day, RotaChange.REMOVE_STAFF, self.staff.id, user_id),
+            ],
+        )
+
+    def test_failed_batch_logs_nothing(self):
+        self.post_batch([{"op": "remove_staff", "shift_id": 999}])
+
+        self.assertFalse(RotaChange.objects.exists())
+
+    def test_month_history_is_one_query(self):
+        for day in (date(2025, 3, 3), date(2025, 3, 4), date(2025, 4, 1)):
+            RotaChange.objects.create(day=day.toordinal(), op=RotaChange.ADD_STAFF, staff=self.staff)
+
+        # changes with staff and actor, rota years for the month selector
+        with self.assertNumQueries(AUTH_QUERIES + 2):
+            response = self.client.get("/rota/history/", {"month": 3, "year": 2025})
+
+        self.assertEqual(len(response.context["changes"]), 2)
+        self.assertContains(response, "Ann Lee")
+
+    def test_prune_command(self):
+        RotaChange.objects.create(day=date(2024, 12, 31).toordinal(), op=RotaChange.SET_NHSP)
+        kept = RotaChange.objects.create(day=date(2025, 1, 1).toordinal(), op=RotaChange.SET_NHSP)
+
+        call_command("prune_rota_history", "--before", "2025-01-01", "--quiet")
+
+        self.assertEqual(list(RotaChange.objects.all()), [kept])
+
+
+class RotaIndexTests(TestCase):
+    """The array index counts like the ORM and keeps up with rota writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("index", first_name="Ann", last_name="Lee", is_staff=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.other_staff = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+        BankHoliday.objects.create(date=date(2025, 4, 21), title="Easter Monday")
+        # Friday, Saturday, Sunday and a bank holiday Monday
+        for day, staff, level, shift_type in (
+            (date(2025, 4, 18), cls.staff, "oncall", "normal"),
+            (date(2025, 4, 19), cls.staff, "senior", "nhsp"),
+            (date(2025, 4, 19), cls.other_staff, "trainee", "nhsp"),
+            (date(2025, 4, 20), cls.other_staff, "oncall", "normal"),
+            (date(2025, 4, 21), cls.staff, "oncall", "normal"),
+        ):
+            entry, _ = RotaEntry.objects.get_or_create(date=day, defaults={"shift_type": shift_type})
+            RotaShift.objects.create(rota_entry=entry, staff=staff, seniority_level=level)
+
+    def setUp(self):
+        bump_rota_version()
+
+    def test_vectorised_counts(self):
+        shifts = RotaIndex().shifts(date(2025, 4, 1), date(2025, 4, 30))
+
+        self.assertEqual(len(shifts), 5)
+        self.assertEqual(shifts.days_covered(), 4)
+        self.assertEqual(
+            shifts.count_by("day_type"),
+            {"Weekday": 1, "Saturday": 2, "Sunday": 1, "BankHoliday": 1},
+        )
+        self.assertEqual(
+            shifts.count_by_staff("level")[self.staff.id],
+            {"trainee": 0, "oncall": 2, "senior": 1},
+        )
+        self.assertEqual(
+            shifts.filter(shift_types=["nhsp"]).count_by_staff(),
+            {self.staff.id: 1, self.other_staff.id: 1},
+        )
+
+    def test_rota_writes_are_patched_in_from_the_event_log(self):
+        index = RotaIndex()
+        index.shifts()
+        self.client.force_login(self.staff.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/rota/batch/",
+                json.dumps(
+                    {
+                        "operations": [
+                            {"op": "add_staff", "date": "2025-04-18", "staff_id": self.other_staff.id, "seniority_level": "senior"},
+                            {"op": "toggle_shift_type", "date": "2025-04-21"},
+                        ]
+                    }
+                ),
+                content_type="application/json",
+            )
+
+        # new events, then a re-read of the two days they name
+        with self.assertNumQueries(2):
+            patched = index.shifts()
+
+        rebuilt = RotaIndex().shifts()
+        for field, values in rebuilt.arrays.items():
+            self.assertEqual(patched.arrays[field].tolist(), values.tolist(), field)
+        self.assertEqual(patched.count_by("shift_type"), {"normal": 3, "nhsp": 3})
+
+    def test_unexplained_change_rebuilds(self):
+        index = RotaIndex()
+        index.shifts()
+        RotaShift.objects.filter(rota_entry__date=date(2025, 4, 20)).delete()
+        bump_rota_version()
+
+        self.assertEqual(len(index.shifts()), 4)
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "records_test_cache",
+            }
+        }
+    )
+    def test_separate_indexes_stay_in_step(self):
+        call_command("createcachetable", verbosity=0)
+        bump_rota_version()
+        # One index per worker process, both following the shared version
+        workers = [RotaIndex(), RotaIndex()]
+        for index in workers:
+            index.shifts()
+        self.client.force_login(self.staff.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/rota/batch/",
+                json.dumps(
+                    {"operations": [{"op": "clear_day", "date": "2025-04-19"}]}
+                ),
+                content_type="application/json",
+            )
+        self.assertEqual([len(index.shifts()) for index in workers], [3, 3])
+
+        RotaShift.objects.filter(rota_entry__date=date(2025, 4, 20)).delete()
+        bump_rota_version()
+        self.assertEqual([len(index.shifts()) for index in workers], [2, 2])
+
+    def test_statistics_view(self):
+        self.client.force_login(self.staff.user)
+
+        response = self.client.get("/rota/statistics/", {"period": "monthly", "year": 2025, "month": 4})
+
+        overall = response.context["overall_stats"]
+        self.assertEqual(overall["total_shifts"], 5)
+        self.assertEqual(overall["bank_holiday_shifts"], 1)
+        self.assertEqual(overall["nhsp_shifts"], 2)
+        first = response.context["staff_statistics"][0]
+        self.assertEqual((first["staff"], first["total_shifts"], first["saturday_shifts"]), (self.staff, 3, 1))
+
+
+class RotaReconciliationTests(TestCase):
+    """Rota shifts and time blocks are diffed on (date, staff)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("finance", first_name="Ann", last_name="Lee", is_staff=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.other_staff = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+        for day, staff_list in (
+            (date(2025, 3, 3), [cls.staff, cls.other_staff]),
+            (date(2025, 3, 4), [cls.staff]),
+        ):
+            entry = RotaEntry.objects.create(date=day)
+            for staff in staff_list:
+                RotaShift.objects.create(rota_entry=entry, staff=staff, seniority_level="oncall")
+        # Matched twice over, missing from the rota, matched
+        for day, staff in (
+            (date(2025, 3, 3), cls.staff),
+            (date(2025, 3, 3), cls.staff),
+            (date(2025, 3, 4), cls.other_staff),
+            (date(2025, 3, 4), cls.staff),
+        ):
+            TimeBlock.objects.create(staff=staff, date=day)
+
+    def test_merge_join_is_two_queries(self):
+        with self.assertNumQueries(2):
+            mismatches = [
+                (day, staff_id, mismatch)
+                for day, staff_id, _, _, mismatch in reconcile_rota(date(2025, 3, 1), date(2025, 3, 31))
+            ]
+
+        self.assertEqual(
+            mismatches,
+            [
+                (date(2025, 3, 3), self.other_staff.id, NO_TIMEBLOCK),
+                (date(2025, 3, 4), self.other_staff.id, NO_ROTA_SHIFT),
+            ],
+        )
+
+    def test_report_and_export(self):
+        self.client.force_login(self.staff.user)
+
+        response = self.client.get("/report/reconciliation/", {"month": 3, "year": 2025})
+        self.assertEqual(
+            (response.context["no_timeblock_count"], response.context["no_rota_shift_count"]), (1, 1)
+        )
+
+        response = self.client.get("/report/reconciliation/export/", {"month": 3, "year": 2025})
+        rows = response.content.decode().splitlines()
+        self.assertEqual(rows[0], "Date,Assignment ID,Name,Mismatch")
+        self.assertEqual(rows[1], "2025-03-03,BK2,\", \",\"Rota'd, no time recorded\"")
+
+    def test_command_writes_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reconciliation.csv")
+            call_command(
+                "reconcile_rota", "--start", "2025-03-01", "--end", "2025-03-31", "--output", path, "--quiet"
+            )
+            with open(path) as output:
+                self.assertEqual(len(output.read().splitlines()), 3)
+
+
+class CoverageGapTests(TestCase):
+    """Every day is checked against per-level minimums and weekend senior cover"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("planner", is_staff=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        BankHoliday.objects.create(date=date(2030, 5, 6), title="Early May bank holiday")
+        # Fri 3rd fully covered, Sat 4th without a senior
+        for day, levels in (
+            (date(2030, 5, 3), ["trainee", "oncall", "senior"]),
+            (date(2030, 5, 4), ["trainee", "oncall"]),
+        ):
+            entry = RotaEntry.objects.create(date=day)
+            for level in levels:
+                RotaShift.objects.create(
+                    rota_entry=entry,
+                    staff=OnCallStaff.objects.create(
+                        assignment_id=f"{level}{day.day}",
+                        user=User.objects.create_user(f"{level}{day.day}"),
+                    ),
+                    seniority_level=level,
+                )
+
+    def setUp(self):
+        bump_rota_version()
+
+    def test_scan(self):
+        result = scan_coverage(
+            date(2030, 5, 3), date(2030, 5, 6), coverage={"trainee": 1, "oncall": 1, "senior": 0}
+        )
+
+        self.assertEqual((result["days_checked"], result["gap_days"], result["missing_shifts"]), (4, 3, 7))
+        self.assertEqual(
+            result["gaps"],
+            [
+                {"date": "2030-05-04", "day_type": "Saturday", "missing": {"senior": 1}},
+                {"date": "2030-05-05", "day_type": "Sunday", "missing": {"trainee": 1, "oncall": 1, "senior": 1}},
+                {"date": "2030-05-06", "day_type": "BankHoliday", "missing": {"trainee": 1, "oncall": 1, "senior": 1}},
+            ],
+        )
+
+    def test_api_is_cached_until_a_rota_write(self):
+        self.client.force_login(self.staff.user)
+        params = {"start": "2030-05-03", "end": "2030-05-03"}
+
+        self.assertEqual(self.client.get("/rota/api/coverage-gaps", params).json()["gap_days"], 0)
+        with self.assertNumQueries(2):  # session and user only
+            self.client.get("/rota/api/coverage-gaps", params)
+
+        RotaShift.objects.filter(rota_entry__date=date(2030, 5, 3), seniority_level="senior").delete()
+        bump_rota_version()
+        self.assertEqual(
+            self.client.get("/rota/api/coverage-gaps", params).json()["gaps"][0]["missing"], {"senior": 1}
+        )
+
+    def test_api_rejects_bad_range(self):
+        self.client.force_login(self.staff.user)
+
+        response = self.client.get("/rota/api/coverage-gaps", {"start": "2030-05-03", "end": "2033-05-03"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_dashboard_widget(self):
+        self.client.force_login(self.staff.user)
+
+        response = self.client.get("/")
+
+        self.assertContains(response, "Rota Coverage Gaps")
+
+
+class RotaYearViewTests(TestCase):
+    """Month grids come from one shift query and are cached per month"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("planner", first_name="Ann", last_name="Lee")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user, color="#123456")
+        entry = RotaEntry.objects.create(date=date(2025, 3, 3), shift_type="nhsp")
+        RotaShift.objects.create(rota_entry=entry, staff=cls.staff, seniority_level="senior")
+
+    def setUp(self):
+        bump_rota_version()
+        self.client.force_login(self.staff.user)
+
+    def test_year_is_one_shift_query_then_cached(self):
+        # shifts, holidays
+        with self.assertNumQueries(AUTH_QUERIES + 2):
+            response = self.client.get("/rota/year/", {"year": 2025})
+        self.assertEqual(len(response.context["month_grids"]), 12)
+        self.assertContains(response, "background-color: #12345670")
+
+        with self.assertNumQueries(AUTH_QUERIES):
+            self.client.get("/rota/year/", {"year": 2025, "quarter": 1})
+
+    def test_rota_write_invalidates_fragments(self):
+        self.client.get("/rota/year/", {"year": 2025, "quarter": 1})
+        RotaShift.objects.all().delete()
+        bump_rota_version()
+
+        response = self.client.get("/rota/year/", {"year": 2025, "quarter": 1})
+
+        self.assertNotContains(response, "#12345670")
+
+
+class RotaBulkOperationTests(TestCase):
+    """Month copies and staff moves check conflicts first and write in bulk"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("planner", first_name="Ann", last_name="Lee", is_staff=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.other_staff = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+        # Tue 4th (NHSP) and Wed 5th March 2025
+        for day, shift_type in ((date(2025, 3, 4), "nhsp"), (date(2025, 3, 5), "normal")):
+            entry = RotaEntry.objects.create(date=day, shift_type=shift_type)
+            RotaShift.objects.create(
+                rota_entry=entry, staff=cls.staff, seniority_level="senior", notes=f"note {day.day}"
+            )
+
+    def rota(self):
+        return list(
+            RotaShift.objects.order_by("rota_entry__date").values_list(
+                "rota_entry__date", "rota_entry__shift_type", "staff__assignment_id", "notes"
+            )
+        )
+
+    def test_weekdays_line_up(self):
+        # April 2025 starts on a Tuesday; March's first Tuesday is the 4th
+        self.assertEqual(aligned_offset(date(2025, 3, 1), date(2025, 4, 1)), 28)
+        self.assertEqual(aligned_offset(date(2025, 4, 1), date(2025, 3, 1)), -35)
+
+    def test_copy_month(self):
+        result = copy_rota_month(date(2025, 3, 1), date(2025, 4, 1), actor=self.staff.user)
+
+        self.assertEqual((result["shifts_copied"], result["entries_created"]), (2, 2))
+        self.assertEqual(
+            self.rota()[2:],
+            [(date(2025, 4, 1), "nhsp", "AL1", ""), (date(2025, 4, 2), "normal", "AL1", "")],
+        )
+        self.assertEqual(RotaChange.objects.filter(op=RotaChange.ADD_STAFF).count(), 2)
+
+    def test_copy_conflicts_write_nothing_unless_replacing(self):
+        entry = RotaEntry.objects.create(date=date(2025, 4, 1))
+        RotaShift.objects.create(rota_entry=entry, staff=self.staff, seniority_level="oncall")
+        RotaShift.objects.create(rota_entry=entry, staff=self.other_staff, seniority_level="oncall")
+
+        result = copy_rota_month(date(2025, 3, 1), date(2025, 4, 1))
+        self.assertEqual(result["conflicts"], [{"date": "2025-04-01", "staff_id": "AL1"}])
+        self.assertEqual(RotaShift.objects.count(), 4)
+
+        result = copy_rota_month(date(2025, 3, 1), date(2025, 4, 1), replace=True)
+        self.assertEqual(result["shifts_replaced"], 2)
+        self.assertEqual([row[0] for row in self.rota()], [date(2025, 3, 4), date(2025, 3, 5), date(2025, 4, 1), date(2025, 4, 2)])
+
+    def test_copy_fills_target_days_past_the_end_of_the_source(self):
+        # March to April 2026 is 28 days on; Apr 29-30 would map to Apr 1-2
+        for day in (date(2026, 3, 25), date(2026, 3, 26), date(2026, 4, 30)):
+            entry = RotaEntry.objects.create(date=day)
+            RotaShift.objects.create(rota_entry=entry, staff=self.other_staff, seniority_level="oncall")
+
+        result = copy_rota_month(date(2026, 3, 1), date(2026, 4, 1), replace=True)
+
+        self.assertEqual(result["shifts_copied"], 4)
+        self.assertEqual(
+            list(
+                RotaShift.objects.filter(rota_entry__date__month=4, rota_entry__date__year=2026)
+                .order_by("rota_entry__date")
+                .values_list("rota_entry__date", flat=True)
+            ),
+            [date(2026, 4, 22), date(2026, 4, 23), date(2026, 4, 29), date(2026, 4, 30)],
+        )
+
+    def test_shift_staff_keeps_notes_and_removes_empty_days(self):
+        result = shift_staff_rota(self.staff, 1, date(2025, 3, 1))
+
+        self.assertEqual((result["shifts_moved"], result["entries_created"], result["entries_removed"]), (2, 1, 1))
+        self.assertEqual(
+            self.rota(),
+            [(date(2025, 3, 5), "normal", "AL1", "note 4"), (date(2025, 3, 6), "normal", "AL1", "note 5")],
+        )
+        self.assertFalse(RotaEntry.objects.filter(date=date(2025, 3, 4)).exists())
+
+    def test_shift_staff_conflict(self):
+        entry = RotaEntry.objects.create(date=date(2025, 3, 12))
+        RotaShift.objects.create(rota_entry=entry, staff=self.staff, seniority_level="senior")
+
+        result = shift_staff_rota(self.staff, 7, date(2025, 3, 1), date(2025, 3, 5))
+
+        self.assertEqual(result["conflicts"], [{"date": "2025-03-12", "staff_id": "AL1"}])
+        self.assertEqual(RotaShift.objects.count(), 3)
+
+    def test_api_endpoints(self):
+        self.client.force_login(self.staff.user)
+
+        response = self.client.post(
+            "/rota/copy-month/",
+            json.dumps({"source_month": "2025-03", "target_month": "2025-04"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["shifts_copied"], 2)
+
+        response = self.client.post(
+            "/rota/shift-staff/",
+            json.dumps({"staff_id": "AL1", "days": 28, "start_date": "2025-03-01", "end_date": "2025-03-31"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_admin_copy_action(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+        self.client.post(
+            "/admin/records/rotaentry/",
+            {
+                "action": "copy_month",
+                "target_month": "2025-04",
+                "_selected_action": list(RotaEntry.objects.values_list("id", flat=True)),
+            },
+        )
+
+        self.assertEqual(RotaShift.objects.filter(rota_entry__date__month=4).count(), 2)
+
+
+class RotaPatternTests(TestCase):
+    """Pattern cycles, bank holiday policies and replacement"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = [
+            OnCallStaff.objects.create(assignment_id=code, user=User.objects.create_user(code))
+            for code in ("AL1", "BK2", "CD3")
+        ]
+        # Tuesdays in January 2030
+        for day in (8, 15, 22):
+            BankHoliday.objects.create(date=date(2030, 1, day), title=f"Holiday {day}")
+
+    def make_pattern(self, name, level, start, end, policy="include", weeks=2):
+        """Pattern alternating AL1 and BK2 week by week from Monday 7 January 2030"""
+        pattern = RotaPattern.objects.create(
+            name=name,
+            seniority_level=level,
+            cycle_weeks=weeks,
+            anchor_date=date(2030, 1, 7),
+            start_date=start,
+            end_date=end,
+            bank_holiday_policy=policy,
+        )
+        RotaPatternSlot.objects.bulk_create(
+            RotaPatternSlot(pattern=pattern, position=position, staff=self.staff[position // 7 % 2])
+            for position in range(weeks * 7)
+        )
+        return pattern
+
+    def rota(self, level=None):
+        shifts = RotaShift.objects.order_by("rota_entry__date")
+        if level:
+            shifts = shifts.filter(seniority_level=level)
+        return dict(shifts.values_list("rota_entry__date", "staff__assignment_id"))
+
+    def test_cycle_expansion(self):
+        pattern = self.make_pattern("Senior", "senior", date(2030, 1, 7), date(2030, 2, 3))
+
+        result = generate_rota_from_patterns([pattern])
+
+        rota = self.rota()
+        self.assertEqual(result["shifts_created"], 28)
+        self.assertEqual(rota[date(2030, 1, 13)], "AL1")
+        self.assertEqual(rota[date(2030, 1, 14)], "BK2")
+        self.assertEqual(rota[date(2030, 1, 21)], "AL1")
+        self.assertEqual(rota[date(2030, 2, 3)], "BK2")
+
+    def test_bank_holidays_skipped(self):
+        pattern = self.make_pattern("Senior", "senior", date(2030, 1, 7), date(2030, 1, 31), "skip")
+
+        generate_rota_from_patterns([pattern])
+
+        rota = self.rota()
+        self.assertEqual(len(rota), 22)
+        self.assertNotIn(date(2030, 1, 15), rota)
+
+    def test_bank_holiday_rotation_continues_on_partial_regeneration(self):
+        pattern = self.make_pattern("Senior", "senior", date(2030, 1, 7), date(2030, 1, 31), "override")
+        RotaPatternSlot.objects.create(pattern=pattern, position=0, staff=self.staff[2], bank_holiday=True)
+        RotaPatternSlot.objects.create(pattern=pattern, position=1, staff=self.staff[0], bank_holiday=True)
+
+        generate_rota_from_patterns([pattern])
+        turns = [self.rota()[date(2030, 1, day)] for day in (8, 15, 22)]
+        self.assertEqual(turns, ["CD3", "AL1", "CD3"])
+
+        # Starting after the first holiday keeps the rotation where it was
+        generate_rota_from_patterns([pattern], start_date=date(2030, 1, 14), replace=True)
+        self.assertEqual([self.rota()[date(2030, 1, day)] for day in (8, 15, 22)], turns)
+
+    def test_replace_limits_each_pattern_to_its_level_and_range(self):
+        senior = self.make_pattern("Senior", "senior", date(2030, 1, 7), date(2030, 1, 20))
+        oncall = self.make_pattern("On-call", "oncall", date(2030, 2, 4), date(2030, 2, 17))
+        # Outside each pattern's own range or level, so kept
+        february = RotaEntry.objects.create(date=date(2030, 2, 5))
+        RotaShift.objects.create(rota_entry=february, staff=self.staff[2], seniority_level="senior")
+        january = RotaEntry.objects.create(date=date(2030, 1, 9))
+        RotaShift.objects.create(rota_entry=january, staff=self.staff[2], seniority_level="oncall")
+        nhsp_day = RotaEntry.objects.create(date=date(2030, 1, 10), shift_type="nhsp")
+        # Replaced
+        replaced = RotaEntry.objects.create(date=date(2030, 1, 12))
+        RotaShift.objects.create(rota_entry=replaced, staff=self.staff[2], seniority_level="senior")
+
+        result = generate_rota_from_patterns([senior, oncall], replace=True)
+
+        self.assertEqual(result["shifts_replaced"], 1)
+        self.assertEqual(self.rota("senior")[date(2030, 2, 5)], "CD3")
+        self.assertEqual(self.rota("oncall")[date(2030, 1, 9)], "CD3")
+        self.assertEqual(self.rota("senior")[date(2030, 1, 12)], "AL1")
+        self.assertEqual(len(self.rota("senior")), 15)
+        self.assertEqual(len(self.rota("oncall")), 15)
+        self.assertTrue(RotaEntry.objects.filter(id=nhsp_day.id).exists())
+
+    def test_year_in_fixed_query_budget(self):
+        pattern = self.make_pattern("Senior", "senior", date(2030, 1, 1), date(2030, 12, 31), weeks=6)
+
+        # Slots, holidays, existing shifts, existing entries, then entries,
+        # shifts and the change log inserted in two batches each (plus the
+        # savepoint pair); nothing is written a day at a time
+        with self.assertNumQueries(12):
+            result = generate_rota_from_patterns([pattern])
+        self.assertEqual(result["shifts_created"], 365)
+
+
+class RotaSolverTests(TestCase):
+    """Solver output respects the hard rules and local search only improves it"""
+
+    START, END = date(2030, 3, 4), date(2030, 3, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        for level in ("trainee", "oncall", "senior"):
+            for n in range(5):
+                code = f"{level[0].upper()}{n}"
+                OnCallStaff.objects.create(
+                    assignment_id=code, seniority_level=level, user=User.objects.create_user(code)
+                )
+        BankHoliday.objects.create(date=date(2030, 3, 18), title="Holiday")
+        cls.existing = OnCallStaff.objects.get(assignment_id="S0")
+        entry = RotaEntry.objects.create(date=date(2030, 3, 10))
+        RotaShift.objects.create(rota_entry=entry, staff=cls.existing, seniority_level="senior")
+
+    def setUp(self):
+        bump_rota_version()
+
+    def assert_hard_rules(self, assignments, max_shifts_per_week, min_rest_days):
+        days_by_staff = {}
+        for day, staff_id in RotaShift.objects.values_list("rota_entry__date", "staff_id"):
+            days_by_staff.setdefault(staff_id, []).append(day)
+        for day, staff_id, _ in assignments:
+            days_by_staff.setdefault(staff_id, []).append(day)
+
+        for staff_id, days in days_by_staff.items():
+            days.sort()
+            self.assertEqual(len(days), len(set(days)), "two shifts on one day")
+            for earlier, later in zip(days, days[1:]):
+                self.assertGreater((later - earlier).days, min_rest_days, "rest gap broken")
+            for first in days:
+                week = [day for day in days if 0 <= (day - first).days < 7]
+                self.assertLessEqual(len(week), max_shifts_per_week, "weekly cap broken")
+
+    def test_feasible_period_is_fully_covered(self):
+        result = solve_rota(self.START, self.END, max_shifts_per_week=3, min_rest_days=1)
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["unfilled"], [])
+        self.assert_hard_rules(result["assignments"], 3, 1)
+        cover = {}
+        for day, _, level in result["assignments"]:
+            cover[(day, level)] = cover.get((day, level), 0) + 1
+        # Every day needs one of each level; the existing senior shift counts
+        self.assertEqual(len(result["assignments"]), 28 * 3 - 1)
+        self.assertNotIn((date(2030, 3, 10), "senior"), cover)
+        self.assertEqual(set(cover.values()), {1})
+        self.assertLessEqual(result["objective"], result["initial_objective"])
+
+    def test_existing_shifts_are_read_from_the_database(self):
+        rota_index.shifts()
+        # Written behind the index's back, without a version bump
+        entry = RotaEntry.objects.create(date=date(2030, 3, 12))
+        RotaShift.objects.create(rota_entry=entry, staff=self.existing, seniority_level="senior")
+
+        result = solve_rota(date(2030, 3, 11), date(2030, 3, 13), coverage={"trainee": 0, "oncall": 0})
+
+        self.assertEqual(
+            [day for day, _, _ in result["assignments"]], [date(2030, 3, 11), date(2030, 3, 13)]
+        )
+        self.assert_hard_rules(result["assignments"], 2, 1)
+
+    def test_infeasible_slots_are_reported(self):
+        # One senior resting a day between shifts can cover at most every other day
+        OnCallStaff.objects.filter(seniority_level="senior").exclude(id=self.existing.id).delete()
+
+        result = solve_rota(
+            date(2030, 3, 4), date(2030, 3, 8), coverage={"trainee": 0, "oncall": 0}, apply=True
+        )
+
+        self.assertTrue(result["success"])
+        self.assertEqual(len(result["assignments"]) + len(result["unfilled"]), 5)
+        self.assertTrue(result["unfilled"])
+        self.assertEqual(result["shifts_created"], len(result["assignments"]))
+        self.assert_hard_rules([], 2, 1)
+
+    def test_inactive_staff_are_not_assigned(self):
+        inactive = OnCallStaff.objects.get(assignment_id="T0")
+        User.objects.filter(id=inactive.user_id).update(is_active=False)
+
+        result = solve_rota(self.START, self.END, max_shifts_per_week=3, min_rest_days=1)
+
+        self.assertNotIn(inactive.id, [staff_id for _, staff_id, _ in result["assignments"]])
+        self.assertNotIn(inactive.id, [row["staff_id"] for row in result["staff_summary"]])
+
+    def test_apply_saves_the_previewed_assignments(self):
+        options = {"coverage": {"trainee": 0, "oncall": 0}}
+        preview = solve_rota(date(2030, 3, 11), date(2030, 3, 13), **options)
+
+        result = apply_rota_assignments(
+            date(2030, 3, 11), date(2030, 3, 13), preview["assignments"], **options
+        )
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["shifts_created"], 3)
+        saved = RotaShift.objects.filter(rota_entry__date__gte=date(2030, 3, 11)).values_list(
+            "rota_entry__date", "staff_id", "seniority_level"
+        )
+        self.assertEqual(sorted(saved), preview["assignments"])
+
+    def test_apply_rejects_assignments_the_rota_no_longer_allows(self):
+        options = {"coverage": {"trainee": 0, "oncall": 0}}
+        preview = solve_rota(date(2030, 3, 11), date(2030, 3, 13), **options)
+        # Someone covers the first day between the preview and the apply
+        entry = RotaEntry.objects.create(date=date(2030, 3, 11))
+        RotaShift.objects.create(rota_entry=entry, staff=self.existing, seniority_level="senior")
+
+        result = apply_rota_assignments(
+            date(2030, 3, 11), date(2030, 3, 13), preview["assignments"], **options
+        )
+
+        self.assertFalse(result["success"])
+        self.assertIn(preview["assignments"][0], result["conflicts"])
+        self.assertEqual(RotaShift.objects.filter(rota_entry__date__gte=date(2030, 3, 11)).count(), 1)
+
+    def test_view_applies_the_posted_preview(self):
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        form = {
+            "start_date": "2030-03-11",
+            "end_date": "2030-03-13",
+            "coverage_trainee": "0",
+            "coverage_oncall": "0",
+            "coverage_senior": "1",
+            "max_shifts_per_week": "2",
+            "min_rest_days": "1",
+        }
+        preview = self.client.post("/rota/solver/", {**form, "action": "preview"})
+        posted = [
+            f"{day.isoformat()}:{staff_id}:{level}"
+            for day, staff_id, level in preview.context["result"]["assignments"]
+        ]
+        self.assertContains(preview, f'name="assignment" value="{posted[0]}"')
+
+        self.client.post("/rota/solver/", {**form, "action": "apply", "assignment": posted})
+
+        saved = RotaShift.objects.filter(rota_entry__date__gte=date(2030, 3, 11)).values_list(
+            "rota_entry__date", "staff_id", "seniority_level"
+        )
+        self.assertEqual(
+            [f"{day.isoformat()}:{staff_id}:{level}" for day, staff_id, level in sorted(saved)],
+            posted,
+        )
+
+    def test_invalid_options(self):
+        self.assertFalse(solve_rota(self.END, self.START)["success"])
+        self.assertFalse(solve_rota(self.START, self.END, max_shifts_per_week=0)["success"])
+
+    def test_local_search_moves_never_increase_the_objective(self):
+        solver = RotaSolver(self.START, self.END, max_shifts_per_week=3, min_rest_days=0)
+        solver.load()
+        solver.greedy()
+        objective = solver.objective()
+
+        slots = range(len(solver.assignment))
+        for slot in slots:
+            if solver.assignment[slot] >= 0:
+                solver._try_reassign(slot)
+            self.assertLessEqual(solver.objective(), objective + 1e-9)
+            objective = solver.objective()
+        for a_slot in slots[::7]:
+            for b_slot in slots:
+                if solver.slot_level[a_slot] == solver.slot_level[b_slot]:
+                    solver._try_swap(a_slot, b_slot)
+                    self.assertLessEqual(solver.objective(), objective + 1e-9)
+                    objective = solver.objective()
+
+        self.assert_hard_rules(
+            [
+                (solver.index_date(solver.slot_day[slot]), solver.staff_ids[s], None)
+                for slot, s in enumerate(solver.assignment)
+                if s >= 0
+            ],
+            3,
+            0,
+        )
+
+
+class RotaImportTests(TestCase):
+    """CSV rows are validated in memory and imported all or nothing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("planner", is_staff=True, is_superuser=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        OnCallStaff.objects.create(assignment_id="BK2", user=User.objects.create_user("other"))
+        entry = RotaEntry.objects.create(date=date(2025, 3, 3))
+        RotaShift.objects.create(rota_entry=entry, staff=cls.staff, seniority_level="senior")
+
+    def test_import(self):
+        rows = [
+            "date,assignment_id,seniority,shift_type",
+            "2025-03-03,BK2,On-Call,normal",
+            "2025-03-04,AL1,senior,nhsp",
+            "2025-03-04,BK2,trainee,",
+            "",
+        ]
+
+        # staff, existing entries and shifts; then entries, version bump, two
+        # inserts and the audit rows (+ savepoint statements)
+        with self.assertNumQueries(3 + 7):
+            result = import_rota_csv(rows, actor=self.staff.user)
+
+        self.assertEqual((result["shifts_created"], result["entries_created"]), (3, 1))
+        self.assertEqual(RotaEntry.objects.get(date=date(2025, 3, 4)).shift_type, "nhsp")
+
+    def test_row_errors_import_nothing(self):
+        result = import_rota_csv(
+            [
+                "date,assignment_id,seniority",
+                "2025-03-03,AL1,senior",
+                "2025-02-30,BK2,senior",
+                "2025-03-05,ZZ9,senior",
+                "2025-03-05,BK2,boss",
+                "2025-03-06,BK2,senior",
+                "2025-03-06,BK2,oncall",
+            ]
+        )
+
+        self.assertEqual(
+            result["errors"],
+            [
+                {"row": 2, "error": "Staff already on 2025-03-03 in the rota"},
+                {"row": 3, "error": 'Invalid date "2025-02-30", expected YYYY-MM-DD'},
+                {"row": 4, "error": 'Unknown staff "ZZ9"'},
+                {"row": 5, "error": 'Invalid seniority "boss"'},
+                {"row": 7, "error": "Staff already on 2025-03-06 in row 6"},
+            ],
+        )
+        self.assertEqual(RotaShift.objects.count(), 1)
+
+    def test_command_and_admin_upload(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rota.csv")
+            with open(path, "w") as csv_file:
+                csv_file.write("date,assignment_id,seniority\n2025-03-04,AL1,senior\n")
+            call_command("import_rota", path, "--quiet")
+        self.assertEqual(RotaShift.objects.count(), 2)
+
+        self.client.force_login(self.staff.user)
+        upload = SimpleUploadedFile("rota.csv", b"date,assignment_id,seniority\n2025-03-05,AL1,x\n")
+        response = self.client.post("/admin/records/rotaentry/import/", {"csv_file": upload})
+        self.assertContains(response, 'Invalid seniority')
+
+
+class TimeBlockSubmissionTests(TestCase):
+    """A whole night's block, assignments and entries posted in one request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.task = TaskType.objects.create(name="Crossmatch")
+        cls.work_mode = WorkMode.objects.create(name="Lab")
+        Donor.objects.create(donor_id="D1")
+
+    def setUp(self):
+        self.client.force_login(self.staff.user)
+
+    def entry(self, start, end):
+        return {
+            "time_started": start,
+            "time_ended": end,
+            "task": self.task.id,
+            "work_mode": self.work_mode.id,
+        }
+
+    def submit(self, time_entries, day="2025-03-04"):
+        return self.client.post(
+            "/block/submit/",
+            json.dumps(
+                {
+                    "date": day,
+                    "assignments": [
+                        {"type": "donor", "entity_id": "D1"},
+                        {"type": "recipient", "entity_id": "R1"},
+                        {"type": "donor", "entity_id": "D1"},
+                    ],
+                    "time_entries": time_entries,
+                }
+            ),
+            content_type="application/json",
+        )
+
+    def test_block_saved_with_bulk_inserts(self):
+        # Sign-off, task types, work modes, bank holiday, day type, claim
+        # rule, block, an entity lookup per type, the new recipient and its
+        # id, assignments and entries, plus the savepoint pair
+        with self.assertNumQueries(AUTH_QUERIES + 15):
+            response = self.submit(
+                [self.entry("19:00", "20:30"), self.entry("23:00", "01:00"), self.entry("06:00", "07:00")]
+            )
+
+        self.assertEqual(response.status_code, 201)
+        block = TimeBlock.objects.get(id=response.json()["block_id"])
+        self.assertEqual(block.day_type.name, "Weekday")
+        self.assertEqual(block.time_entries.count(), 3)
+        self.assertEqual(
+            sorted(block.assignments.values_list("entity_type", "entity_id")),
+            [("donor", "D1"), ("recipient", "R1")],
+        )
+        self.assertTrue(Recipient.objects.filter(recipient_id="R1").exists())
+
+    def test_overlap_across_midnight_rejected(self):
+        response = self.submit([self.entry("23:00", "01:00"), self.entry("00:30", "02:00")])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], {"time_entries.1": ["Overlaps time entry 1."]})
+        self.assertFalse(TimeBlock.objects.exists())
+
+    def test_signed_off_month_rejected(self):
+        MonthlySignOff.objects.create(
+            staff=self.staff, year=2025, month=3, signed_off_by=self.staff
+        )
+
+        response = self.submit([self.entry("19:00", "20:00")])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("date", response.json()["errors"])
+        self.assertFalse(TimeBlock.objects.exists())
+
+    def test_add_block_page_posts_to_submission_endpoint(self):
+        response = self.client.get("/block/add/")
+
+        self.assertContains(response, 'data-submit-url="/block/submit/"')
+        self.assertContains(response, f'<option value="{self.task.id}">Crossmatch</option>')
+        self.assertContains(response, f'<option value="{self.work_mode.id}">Lab</option>')
+
+
+class TimeEntryOverlapTests(TestCase):
+    """Entries in a block may not overlap, including across midnight"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist", is_staff=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.task = TaskType.objects.create(name="Crossmatch")
+        cls.work_mode = WorkMode.objects.create(name="Lab")
+        cls.block = TimeBlock.objects.create(staff=cls.staff, date=date(2025, 3, 4))
+        cls.late = cls.add_entry("23:00", "01:00")
+
+    @classmethod
+    def add_entry(cls, start, end, block=None):
+        return TimeEntry.objects.create(
+            timeblock=block or cls.block,
+            time_started=start,
+            time_ended=end,
+            task=cls.task,
+            work_mode=cls.work_mode,
+        )
+
+    def test_add_entry_rejects_overlap_after_midnight(self):
+        self.client.force_login(self.staff.user)
+        data = {"task": self.task.id, "work_mode": self.work_mode.id}
+
+        response = self.client.post(
+            f"/block/{self.block.id}/add-entry/",
+            {**data, "time_started": "00:30", "time_ended": "02:00"},
+        )
+        self.assertContains(response, "overlaps the 23:00-01:00 entry")
+
+        response = self.client.post(
+            f"/block/{self.block.id}/add-entry/",
+            {**data, "time_started": "01:00", "time_ended": "02:00"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.block.time_entries.count(), 2)
+
+    def test_editing_an_entry_ignores_itself(self):
+        self.late.time_ended = "02:00"
+        self.late.full_clean()
+
+    def test_month_scan_finds_overlaps_in_one_query(self):
+        self.add_entry("00:00", "00:30")
+        other_block = TimeBlock.objects.create(staff=self.staff, date=date(2025, 3, 5))
+        self.add_entry("19:00", "20:00", block=other_block)
+        self.add_entry("19:30", "19:45", block=other_block)
+
+        with self.assertNumQueries(1):
+            overlaps = scan_month_overlaps(2025, 3)
+
+        self.assertEqual(
+            [
+                [(entry["time_started"], entry["time_ended"]) for entry in found["entries"]]
+                for found in overlaps[self.staff.id]
+            ],
+            [[("23:00", "01:00"), ("00:00", "00:30")], [("19:00", "20:00"), ("19:30", "19:45")]],
+        )
+
+        self.client.force_login(self.staff.user)
+        response = self.client.get("/signoff/?month=3&year=2025")
+        self.assertContains(response, "2 pairs of overlapping time entries")
+
+
+class ClaimRuleTests(TestCase):
+    """Claims follow the claim rules, per block and for a whole month"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist", is_staff=True)
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.other_staff = OnCallStaff.objects.create(
+            assignment_id="BK2", user=User.objects.create_user("other")
+        )
+        cls.task = TaskType.objects.create(name="Crossmatch")
+        cls.work_mode = WorkMode.objects.create(name="Lab")
+        weekday = DayType.objects.get_or_create(name="Weekday")[0]
+        ClaimRule.objects.create(
+            day_type=weekday, minimum_callout_minutes=30, rounding_minutes=15, multiplier="1.5"
+        )
+
+    def add_entry(self, block, start, end):
+        return TimeEntry.objects.create(
+            timeblock=block, time_started=start, time_ended=end, task=self.task, work_mode=self.work_mode
+        )
+
+    def test_block_claim_follows_entries(self):
+        block = TimeBlock.objects.create(staff=self.staff, date=date(2025, 3, 4))
+        self.add_entry(block, "19:00", "19:10")
+        late = self.add_entry(block, "23:00", "01:10")
+
+        # 30 (minimum) + 135 (rounded up) minutes at 1.5
+        block.refresh_from_db()
+        self.assertEqual(block.claim, Decimal("4.13"))
+
+        late.delete()
+        block.refresh_from_db()
+        self.assertEqual(block.claim, Decimal("0.75"))
+
+        # Saturdays have no rule, so their claim is typed in
+        saturday = TimeBlock.objects.create(staff=self.staff, date=date(2025, 3, 8), claim=2)
+        self.add_entry(saturday, "10:00", "11:00")
+        saturday.refresh_from_db()
+        self.assertEqual(saturday.claim, Decimal("2.00"))
+
+    def test_block_without_rule_is_not_written(self):
+        saturday = TimeBlock.objects.create(staff=self.staff, date=date(2025, 3, 8), claim=2)
+        entry = self.add_entry(saturday, "10:00", "11:00")
+
+        with CaptureQueriesContext(connection) as queries:
+            entry.delete()
+
+        self.assertFalse(
+            [query for query in queries if query["sql"].startswith('UPDATE "records_timeblock"')]
+        )
+
+    def test_month_recompute_shows_diff_then_applies(self):
+        block = TimeBlock.objects.create(staff=self.staff, date=date(2025, 3, 4))
+        self.add_entry(block, "19:00", "20:00")
+        signed_off = TimeBlock.objects.create(staff=self.other_staff, date=date(2025, 3, 4))
+        TimeBlock.objects.filter(id__in=[block.id, signed_off.id]).update(claim=5)
+        MonthlySignOff.objects.create(
+            staff=self.other_staff, year=2025, month=3, signed_off_by=self.staff
+        )
+
+        with self.assertNumQueries(3):
+            result = recompute_month_claims(2025, 3)
+
+        self.assertEqual(result["blocks_checked"], 1)
+        self.assertEqual(
+            [(change["staff"], change["old"], change["new"]) for change in result["changes"]],
+            [("AL1", Decimal("5.00"), Decimal("1.50"))],
+        )
+        block.refresh_from_db()
+        self.assertEqual(block.claim, Decimal("5.00"))
+
+        self.client.force_login(self.staff.user)
+        response = self.client.get("/report/claims/?month=3&year=2025")
+        self.assertContains(response, "Apply 1 Change")
+        self.client.post("/report/claims/?month=3&year=2025")
+        block.refresh_from_db()
+        self.assertEqual(block.claim, Decimal("1.50"))
+        self.assertEqual(TimeBlock.objects.get(id=signed_off.id).claim, Decimal("5.00"))
+
+
+class DashboardQueryTests(TestCase):
+    """The dashboard renders a month in a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.task = TaskType.objects.create(name="Crossmatch")
+        cls.work_mode = WorkMode.objects.create(name="Lab")
+
+    def setUp(self):
+        self.client.force_login(self.staff.user)
+
+    def add_block(self, day, *times):
+        block = TimeBlock.objects.create(staff=self.staff, date=date(2025, 3, day))
+        TimeEntry.objects.bulk_create(
+            TimeEntry(
+                timeblock=block, time_started=start, time_ended=end, task=self.task, work_mode=self.work_mode
+            )
+            for start, end in times
+        )
+        Assignment.objects.create(timeblock=block, entity_type="donor", entity_id=f"D{day}")
+        return block
+
+    def test_query_count_does_not_grow_with_blocks(self):
+        self.add_block(3, ("23:00", "01:30"), ("02:00", "03:00"))
+
+        # Blocks, assignments with their entities, the month selector's years and sign-off
+        with self.assertNumQueries(AUTH_QUERIES + 4):
+            response = self.client.get("/?month=3&year=2025")
+        self.assertContains(response, "23:00 - 03:00")
+        self.assertEqual(response.context["total_hours"], 3.5)
+
+        for day in range(4, 20):
+            self.add_block(day, ("19:00", "20:00"), ("21:00", "21:15"))
+        with self.assertNumQueries(AUTH_QUERIES + 4):
+            response = self.client.get("/?month=3&year=2025")
+        self.assertEqual(response.context["total_hours"], 3.5 + 16 * 1.25)
+
+        self.client.force_login(User.objects.create_superuser("admin"))
+        response = self.client.get(f"/staff/user/{self.staff.user.id}/?month=3&year=2025")
+        self.assertContains(response, "23:00 - 03:00")
+
+    def test_block_detail_loaded_on_demand(self):
+        block = self.add_block(3, ("23:00", "01:30"))
+        response = self.client.get("/?month=3&year=2025")
+        self.assertNotContains(response, "time-entry-row")
+        self.assertContains(response, f"/block/{block.id}/detail/")
+
+        response = self.client.get(f"/block/{block.id}/detail/")
+        self.assertContains(response, "Crossmatch")
+        response = self.client.get(f"/block/{block.id}/detail/?format=json")
+        self.assertEqual(response.json()["time_entries"][0]["hours"], 2.5)
+        self.assertEqual(response.json()["assignments"][0]["entity_id"], "D3")
+
+        self.client.force_login(User.objects.create_user("other"))
+        self.assertEqual(self.client.get(f"/block/{block.id}/detail/").status_code, 404)
+
+    def test_expand_all_loads_details_in_one_request(self):
+        blocks = [self.add_block(day, ("19:00", "20:00"), ("21:00", "21:15")) for day in range(3, 13)]
+        ids = ",".join(str(block.id) for block in blocks)
+
+        # Session and user, the blocks, then all their entries
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/block/details/?ids={ids}")
+
+        details = response.json()["blocks"]
+        self.assertEqual(len(details), 10)
+        self.assertIn("21:15", details[str(blocks[0].id)])
+        self.assertEqual(self.client.get("/block/details/?ids=x").status_code, 400)
+
+        self.client.force_login(User.objects.create_user("other"))
+        self.assertEqual(self.client.get(f"/block/details/?ids={ids}").json()["blocks"], {})
+
+
+class AssignmentEntityTests(TestCase):
+    """Assignments are linked to their entities by foreign key"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        for day in range(1, 6):
+            block = TimeBlock.objects.create(staff=cls.staff, date=date(2025, 3, day))
+            Donor.objects.create(donor_id=f"D{day}", name=f"Donor {day}")
+            Assignment.objects.create(timeblock=block, entity_type="donor", entity_id=f"D{day}")
+            Assignment.objects.create(timeblock=block, entity_type="recipient", entity_id=f"R{day}")
+
+    def test_with_entities(self):
+        with self.assertNumQueries(1):
+            assignments = list(Assignment.objects.select_related("timeblock").with_entities())
+        with self.assertNumQueries(0):
+            names = {a.entity_id: a.get_entity_object() for a in assignments}
+        self.assertEqual(names["D2"].name, "Donor 2")
+        # Missing entities resolve to None rather than being looked up again
+        self.assertIsNone(names["R2"])
+
+    def test_save_links_matching_entity(self):
+        donor = Donor.objects.get(donor_id="D1")
+        self.assertEqual(
+            set(TimeBlock.objects.filter(assignments__donor=donor).values_list("date", flat=True)),
+            {date(2025, 3, 1)},
+        )
+        assignment = Assignment.objects.get(entity_id="D1")
+        assignment.entity_type, assignment.entity_id = "recipient", "R9"
+        assignment.save()
+        self.assertIsNone(assignment.donor_id)
+        self.assertIsNone(assignment.recipient_id)
+        recipient = Recipient.objects.create(recipient_id="R9")
+        assignment.save()
+        self.assertEqual(assignment.recipient_id, recipient.id)
+
+        # A foreign key for another type is rejected by the database
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Assignment.objects.filter(id=assignment.id).update(donor=donor)
+
+    def test_admin_changelist_query_count(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/admin/records/assignment/")
+        Assignment.objects.bulk_create(
+            Assignment(timeblock=block, date=block.date, entity_type="donor", entity_id=f"X{n}")
+            for block in [TimeBlock.objects.get(date=date(2025, 3, 1))]
+            for n in range(20)
+        )
+        with self.assertNumQueries(len(few)):
+            response = self.client.get("/admin/records/assignment/")
+        self.assertContains(response, "Donor 3")
+
+
+class AssignmentSyncTests(TestCase):
+    """Saving a block writes only the assignments that changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.block = TimeBlock.objects.create(staff=cls.staff, date=date(2025, 3, 3))
+        Donor.objects.create(donor_id="D1")
+        for n in range(1, 4):
+            Assignment.objects.create(timeblock=cls.block, entity_type="donor", entity_id=f"D{n}")
+
+    def test_sync_assignments(self):
+        kept = Assignment.objects.get(entity_id="D1")
+        items = [
+            {"type": "donor", "entity_id": "D1"},
+            {"type": "donor", "entity_id": "D2", "notes": "Urgent"},
+            {"type": "recipient", "entity_id": "R1"},
+            {"type": "recipient", "entity_id": "R2"},
+            {"type": "unknown", "entity_id": "X1"},
+        ]
+        # Existing assignments, existing recipients, recipient insert and
+        # ids, assignment insert, notes update and delete (plus the savepoint)
+        with self.assertNumQueries(9):
+            counts = sync_assignments(self.block, items)
+        self.assertEqual(counts, {"created": 2, "updated": 1, "deleted": 1})
+        self.assertEqual(
+            sorted(self.block.assignments.values_list("entity_id", flat=True)), ["D1", "D2", "R1", "R2"]
+        )
+        self.assertEqual(Assignment.objects.get(entity_id="D1").created, kept.created)
+        self.assertEqual(Assignment.objects.get(entity_id="D2").notes, "Urgent")
+        self.assertTrue(Recipient.objects.filter(recipient_id="R2").exists())
+
+        with self.assertNumQueries(1):
+            counts = sync_assignments(self.block, items)
+        self.assertEqual(counts, {"created": 0, "updated": 0, "deleted": 0})
+
+    def test_edit_form_keeps_unchanged_assignments(self):
+        kept = set(self.block.assignments.values_list("id", flat=True))
+        form = TimeBlockEditForm(
+            data={
+                "date": "2025-03-03",
+                "oncall_type": "normal",
+                "assignments_data": json.dumps(
+                    [{"type": "donor", "entity_id": f"D{n}"} for n in range(1, 5)]
+                ),
+            },
+            instance=self.block,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        ids = set(self.block.assignments.values_list("id", flat=True))
+        self.assertEqual(len(ids), 4)
+        self.assertTrue(kept < ids)
+
+
+class EntityActivityTests(TestCase):
+    """Blocks touching an entity, keyset-paginated newest first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("scientist")
+        cls.staff = OnCallStaff.objects.create(assignment_id="AL1", user=user)
+        cls.manager = User.objects.create_user("manager", is_staff=True)
+        cls.donor = Donor.objects.create(donor_id="D1", name="Smith")
+        task = TaskType.objects.create(name="Crossmatch")
+        work_mode = WorkMode.objects.create(name="Lab")
+        for n in range(30):
+            # Two blocks a day so the cursor has to break ties on id
+            block = TimeBlock.objects.create(staff=cls.staff, date=date(2025, 1, 1 + n // 2))
+            Assignment.objects.create(timeblock=block, entity_type="donor", entity_id="D1")
+            TimeEntry.objects.create(
+                timeblock=block, time_started="23:00", time_ended="01:00", task=task, work_mode=work_mode
+            )
+        Assignment.objects.create(timeblock=block, entity_type="donor", entity_id="D2")
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def test_pages_follow_the_cursor(self):
+        url = self.donor.get_absolute_url()
+        with CaptureQueriesContext(connection) as first_page:
+            data = self.client.get(url, {"format": "json"}).json()
+        self.assertEqual(len(data["blocks"]), 25)
+        self.assertEqual(data["blocks"][0]["date"], "2025-01-15")
+        self.assertEqual(data["blocks"][0]["time_entries"][0]["hours"], 2.0)
+
+        with self.assertNumQueries(len(first_page)):
+            older = self.client.get(url, {"format": "json", "before": data["next_cursor"]}).json()
+        self.assertEqual(len(older["blocks"]), 5)
+        self.assertIsNone(older["next_cursor"])
+        seen = [block["id"] for block in data["blocks"] + older["blocks"]]
+        self.assertEqual(len(set(seen)), 30)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        response = self.client.get(url, {"before": data["next_cursor"]})
+        self.assertContains(response, "Smith")
+        self.assertContains(response, "Newest")
+        self.assertNotContains(response, "Older")
+
+    def test_moving_a_block_moves_its_assignments(self):
+        block = TimeBlock.objects.order_by("date", "id").first()
+        block.date = date(2025, 2, 1)
+        block.save()
+
+        self.assertEqual(Assignment.objects.get(timeblock=block).date, date(2025, 2, 1))
+        data = self.client.get(self.donor.get_absolute_url(), {"format": "json"}).json()
+        self.assertEqual(data["blocks"][0]["id"], block.id)
+
+    def test_access(self):
+        self.assertEqual(self.client.get("/entities/donor/D1/", {"before": "x"}).status_code, 200)
+        self.assertEqual(self.client.get("/entities/donor/D1/", {"format": "json", "before": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/entities/donor/D9/").status_code, 404)
+        self.assertEqual(self.client.get("/entities/staff/D1/").status_code, 404)
+        self.client.force_login(self.staff.user)
+        self.assertRedirects(self.client.get("/entities/donor/D1/"), "/")
+
+
+class EntitySearchTests(TestCase):
+    """Assignment autocomplete and the cached recent entity lists"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = OnCallStaff.objects.create(
+            assignment_id="AL1", user=User.objects.create_user("scientist")
+        )
+        Donor.objects.bulk_create(Donor(donor_id=f"AB{n:03d}") for n in range(15))
+        Donor.objects.create(donor_id="XY1", name="Late donor")
+
+    def setUp(self):
+        invalidate_recent_entities()
+        self.client.force_login(self.staff.user)
+
+    def test_prefix_search_is_case_insensitive_and_limited(self):
+        response = self.client.get("/entities/search/", {"type": "donor", "q": "ab"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), AUTOCOMPLETE_LIMIT)
+        self.assertEqual(results[0], {"id": "AB000", "label": "AB000"})
+
+        response = self.client.get("/entities/search/", {"type": "donor", "q": "x"})
+        self.assertEqual(response.json()["results"], [{"id": "XY1", "label": "XY1 (Late donor)"}])
+
+        response = self.client.get("/entities/search/", {"type": "staff", "q": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_recent_lists_cached_until_an_entity_is_created(self):
+        with self.assertNumQueries(3):
+            TimeBlockForm()
+        with self.assertNumQueries(0):
+            form = TimeBlockForm()
+        self.assertEqual(form.recent_donors[0]["donor_id"], "XY1")
+
+        Recipient.objects.create(recipient_id="R1")
+        self.assertEqual(TimeBlockForm().recent_recipients, [{"recipient_id": "R1", "name": ""}])
+
+    def test_recent_lists_refresh_on_rename_and_delete(self):
+        TimeBlockForm()
+        donor = Donor.objects.get(donor_id="XY1")
+        donor.notes = "Not shown in the lists"
+        donor.save()
+        with self.assertNumQueries(0):
+            TimeBlockForm()
+
+        donor.name = "Renamed donor"
+        donor.save()
+        self.assertEqual(TimeBlockForm().recent_donors[0]["name"], "Renamed donor")
+
+        donor.delete()
+        self.assertNotIn("XY1", [row["donor_id"] for row in TimeBlockForm().recent_donors])
+
+        Donor.objects.all().delete()
+        self.assertEqual(TimeBlockForm().recent_donors, [])
@@ -4,13 +4,21 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('block/add/', views.add_timeblock, name='add_timeblock'),
+    path('block/submit/', views.submit_timeblock, name='submit_timeblock'),
+    path('block/details/', views.timeblock_details, name='timeblock_details'),
+    path('block/<int:block_id>/detail/', views.timeblock_detail, name='timeblock_detail'),
     path('block/<int:block_id>/edit/', views.edit_timeblock, name='edit_timeblock'),
     path('block/<int:block_id>/delete/', views.delete_timeblock, name='delete_timeblock'),
     path('block/<int:block_id>/add-entry/', views.add_time_entry, name='add_time_entry'),
+    path('entities/search/', views.entity_search, name='entity_search'),
+    path('entities/<str:entity_type>/<path:entity_id>/', views.entity_activity, name='entity_activity'),
     path('entry/<int:entry_id>/edit/', views.edit_time_entry, name='edit_time_entry'),
     path('entry/<int:entry_id>/delete/', views.delete_time_entry, name='delete_time_entry'),
     path('report/', views.monthly_report, name='monthly_report'),
     path('report/export/', views.export_monthly_csv, name='export_monthly_csv'),
+    path('report/reconciliation/', views.rota_reconciliation, name='rota_reconciliation'),
+    path('report/reconciliation/export/', views.export_rota_reconciliation_csv, name='export_rota_reconciliation_csv'),
+    path('report/claims/', views.recompute_claims, name='recompute_claims'),
     path('staff/user/<int:user_id>/', views.admin_user_dashboard, name='admin_user_dashboard'),
     path('signoff/', views.signoff_management, name='signoff_management'),
     path('signoff/<int:staff_id>/<int:year>/<int:month>/', views.signoff_month, name='signoff_month'),
@@ -18,11 +26,23 @@ urlpatterns = [
     path('report/signoff/<int:year>/<int:month>/', views.signoff_report, name='signoff_report'),
     path('report/unsignoff/<int:year>/<int:month>/', views.unsignoff_report, name='unsignoff_report'),
     path('rota/', views.rota_calendar, name='rota_calendar'),
+    path('rota/year/', views.rota_year, name='rota_year'),
     path('rota/create-entry/', views.create_rota_entry, name='create_rota_entry'),
     path('rota/add-staff/', views.add_staff_to_rota, name='add_staff_to_rota'),
     path('rota/remove-staff/', views.remove_staff_from_rota, name='remove_staff_from_rota'),
     path('rota/toggle-shift-type/', views.toggle_shift_type, name='toggle_shift_type'),
     path('rota/clear-day/', views.clear_day_staff, name='clear_day_staff'),
+    path('rota/batch/', views.rota_batch, name='rota_batch'),
+    path('rota/copy-month/', views.copy_rota_month_view, name='copy_rota_month'),
+    path('rota/shift-staff/', views.shift_staff_rota_view, name='shift_staff_rota'),
+    path('rota/events/', views.rota_events, name='rota_events'),
+    path('rota/api/now', views.oncall_now, name='oncall_now'),
+    path('rota/api/coverage-gaps', views.coverage_gaps, name='coverage_gaps'),
+    path('rota/calendar/<str:token>/personal.ics', views.staff_calendar_feed, name='staff_calendar_feed'),
+    path('rota/calendar/<str:token>/team.ics', views.team_calendar_feed, name='team_calendar_feed'),
+    path('rota/calendar/reset-link/', views.reset_calendar_feed_token, name='reset_calendar_feed_token'),
     path('rota/statistics/', views.rota_statistics, name='rota_statistics'),
     path('rota/statistics/bank-holiday-detail/', views.bank_holiday_detail, name='bank_holiday_detail'),
+    path('rota/solver/', views.rota_solver, name='rota_solver'),
+    path('rota/history/', views.rota_history, name='rota_history'),
 ]
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Save a block's assignments as a diff against the ones it already has.
+
+Entities referenced for the first time are bulk-created, new assignments
+are bulk-created, changed notes are bulk-updated and only assignments no
+longer listed are deleted, so saving a block costs a handful of queries
+however many assignments it has, and unchanged assignments keep their
+``created`` timestamps.
+"""
+
+from django.db import transaction
+
+from ..models import ASSIGNMENT_TYPE_CONFIG, Assignment
+from .entity_search import ENTITY_MODELS, invalidate_recent_entities
+
+ENTITY_ID_MAX_LENGTH = Assignment._meta.get_field("entity_id").max_length
+
+
+def ensure_entities(entity_keys):
+    """
+    Create the entities in entity_keys that do not exist yet.
+
+    Args:
+        entity_keys (iterable): (entity_type, entity_id) pairs
+
+    Returns:
+        dict: (entity_type, entity_id) -> primary key of the entity
+    """
+    wanted = {}
+    for entity_type, entity_id in entity_keys:
+        wanted.setdefault(entity_type, set()).add(entity_id)
+
+    pks = {}
+    created = False
+    for entity_type, entity_ids in wanted.items():
+        model, id_field, _ = ENTITY_MODELS[entity_type]
+        existing = dict(
+            model.objects.filter(**{f"{id_field}__in": entity_ids}).values_list(id_field, "pk")
+        )
+        missing = entity_ids - existing.keys()
+        if missing:
+            model.objects.bulk_create(
+                [model(**{id_field: entity_id}) for entity_id in missing],
+                ignore_conflicts=True,
+            )
+            # Ignored conflicts leave no primary keys behind, so read them back
+            existing.update(
+                model.objects.filter(**{f"{id_field}__in": missing}).values_list(id_field, "pk")
+            )
+            created = True
+        pks.update(((entity_type, entity_id), pk) for entity_id, pk in existing.items())
+    if created:
+        # bulk_create skips save(), so refresh the recent lists here
+        invalidate_recent_entities()
+    return pks
+
+
+def new_assignment(block, entity_type, entity_id, entity_pk, notes=""):
+    """Unsaved assignment linked to its entity, styled for its type"""
+    config = ASSIGNMENT_TYPE_CONFIG.get(entity_type, {})
+    return Assignment(
+        timeblock=block,
+        date=block.date,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        notes=notes,
+        color=config.get("color", "primary"),
+        icon=config.get("icon", "bi-person-fill"),
+        **{f"{entity_type}_id": entity_pk},
+    )
+
+
+def _wanted_assignments(items):
+    wanted = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        entity_type = item.get("type")
+        entity_id = str(item.get("entity_id") or "").strip()
+        if entity_type in ENTITY_MODELS and entity_id and len(entity_id) <= ENTITY_ID_MAX_LENGTH:
+            wanted.setdefault((entity_type, entity_id), str(item.get("notes") or ""))
+    return wanted
+
+
+def sync_assignments(block, items):
+    """
+    Make a saved block's assignments match items.
+
+    Args:
+        block (TimeBlock): Saved block
+        items (list): dicts with ``type``, ``entity_id`` and ``notes``;
+            invalid or repeated items are skipped
+
+    Returns:
+        dict: counts of assignments created, updated and deleted
+    """
+    wanted = _wanted_assignments(items)
+    existing = {
+        (assignment.entity_type, assignment.entity_id): assignment
+        for assignment in block.assignments.all()
+    }
+
+    new_keys = [key for key in wanted if key not in existing]
+    removed_ids = [assignment.id for key, assignment in existing.items() if key not in wanted]
+    changed = []
+    for key, assignment in existing.items():
+        if key in wanted and assignment.notes != wanted[key]:
+            assignment.notes = wanted[key]
+            changed.append(assignment)
+
+    counts = {"created": len(new_keys), "updated": len(changed), "deleted": len(removed_ids)}
+    if not any(counts.values()):
+        return counts
+
+    with transaction.atomic():
+        if new_keys:
+            pks = ensure_entities(new_keys)
+            Assignment.objects.bulk_create(
+                [
+                    new_assignment(block, *key, pks[key], wanted[key])
+                    for key in new_keys
+                ]
+            )
+        if changed:
+            Assignment.objects.bulk_update(changed, ["notes"])
+        if removed_ids:
+            Assignment.objects.filter(id__in=removed_ids).delete()
+
+    return counts
@@ -0,0 +1,98 @@
+"""
+Time blocks for a staff member's month, summarised in the database.
+
+Each block is annotated with its hours, entry count and time span in the
+block query itself, and assignments and their entities are prefetched
+once, so a month takes a fixed number of queries however busy it was.
+"""
+
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from ..models import Assignment, TimeBlock, TimeEntry
+from .date_helpers import get_month_date_range
+from .time_overlap import MINUTES_PER_DAY
+
+
+def _minute_of_day(field):
+    return ExtractHour(field) * 60 + ExtractMinute(field)
+
+
+def entry_minutes():
+    """Expression for a time entry's length in minutes, wrapping past midnight"""
+    started = _minute_of_day("time_started")
+    ended = _minute_of_day("time_ended")
+    return Case(
+        When(time_ended__lte=F("time_started"), then=ended - started + MINUTES_PER_DAY),
+        default=ended - started,
+        output_field=IntegerField(),
+    )
+
+
+def annotate_block_summary(queryset):
+    """
+    Annotate time blocks with entry_count, worked_minutes, first_started
+    and last_ended (the first entry's start and the last entry's end, in
+    the order entries were added).
+    """
+    entries = TimeEntry.objects.filter(timeblock=OuterRef("pk"))
+    minutes = (
+        entries.order_by()
+        .values("timeblock")
+        .annotate(total=Sum(entry_minutes()))
+        .values("total")
+    )
+    return queryset.annotate(
+        entry_count=Count("time_entries"),
+        worked_minutes=Subquery(minutes, output_field=IntegerField()),
+        first_started=Subquery(entries.order_by("id").values("time_started")[:1]),
+        last_ended=Subquery(entries.order_by("-id").values("time_ended")[:1]),
+    )
+
+
+def month_block_summary(staff, year, month):
+    """
+    A staff member's blocks for a month, newest first, with totals.
+
+    Returns:
+        dict: time_blocks (list, each with calculated_hours and the
+        annotate_block_summary fields and assignments prefetched with their
+        entities),
+        total_hours and total_claims
+    """
+    month_start, next_month_start = get_month_date_range(year, month)
+    time_blocks = list(
+        annotate_block_summary(
+            TimeBlock.objects.filter(
+                staff=staff, date__gte=month_start, date__lt=next_month_start
+            )
+        )
+        .select_related("day_type")
+        .prefetch_related(
+            Prefetch("assignments", queryset=Assignment.objects.with_entities())
+        )
+        .order_by("-date")
+    )
+
+    total_minutes = 0
+    total_claims = 0
+    for block in time_blocks:
+        total_minutes += block.worked_minutes or 0
+        block.calculated_hours = round((block.worked_minutes or 0) / 60, 2)
+        total_claims += block.claim or 0
+
+    return {
+        "time_blocks": time_blocks,
+        "total_hours": round(total_minutes / 60, 2),
+        "total_claims": total_claims,
+    }
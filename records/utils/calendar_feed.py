@@ -0,0 +1,172 @@
+"""iCalendar (.ics) feeds of the on-call rota"""
+
+import hashlib
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import OnCallStaff, RotaShift
+from .rota_version import get_rota_version
+
+# How far back each feed reaches; everything in the future is included
+PERSONAL_FEED_HISTORY_DAYS = 365
+TEAM_FEED_HISTORY_DAYS = 90
+
+# Cached feeds are keyed by rota version, so this only bounds memory use
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+FEED_SCOPES = ("personal", "team")
+
+
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold a content line at 75 octets as required by RFC 5545"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _utc_stamp(moment):
+    return moment.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _shift_bounds(day):
+    """Start and end of the on-call period for a rota date, in UTC"""
+    handover = time(hour=settings.ROTA_HANDOVER_HOUR)
+    start = timezone.make_aware(datetime.combine(day, handover))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), handover))
+    return _utc_stamp(start), _utc_stamp(end)
+
+
+def build_calendar(name, shifts, team):
+    """
+    Render rota shifts as an iCalendar document.
+
+    Args:
+        name (str): Calendar display name
+        shifts: Iterable of (date, shift_type, last_modified, seniority_level,
+            notes, assignment_id, first_name, last_name) tuples
+        team (bool): Put the staff name in each event summary
+
+    Returns:
+        bytes: The .ics document
+    """
+    levels = dict(RotaShift.SENIORITY_CHOICES)
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//On Call Records//Rota//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for day, shift_type, last_modified, level, notes, assignment_id, first_name, last_name in shifts:
+        start, end = _shift_bounds(day)
+        summary = f"On call ({levels.get(level, level)})"
+        if team:
+            staff_name = f"{first_name} {last_name}".strip() or assignment_id
+            summary = f"{levels.get(level, level)}: {staff_name}"
+        if shift_type == "nhsp":
+            summary += " - NHSP"
+        lines.extend(
+            [
+                "BEGIN:VEVENT",
+                f"UID:rota-{day.isoformat()}-{assignment_id}@oncall-records",
+                f"DTSTAMP:{_utc_stamp(last_modified)}",
+                f"DTSTART:{start}",
+                f"DTEND:{end}",
+                f"SUMMARY:{_escape(summary)}",
+            ]
+        )
+        if notes:
+            lines.append(f"DESCRIPTION:{_escape(notes)}")
+        lines.extend(["TRANSP:TRANSPARENT", "END:VEVENT"])
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode("utf-8")
+
+
+def _feed_shifts(staff=None, history_days=TEAM_FEED_HISTORY_DAYS):
+    shifts = RotaShift.objects.filter(
+        rota_entry__date__gte=timezone.localdate() - timedelta(days=history_days)
+    )
+    if staff is not None:
+        shifts = shifts.filter(staff=staff)
+    return shifts.order_by("rota_entry__date", "seniority_level").values_list(
+        "rota_entry__date",
+        "rota_entry__shift_type",
+        "rota_entry__last_modified",
+        "seniority_level",
+        "notes",
+        "staff__assignment_id",
+        "staff__user__first_name",
+        "staff__user__last_name",
+    )
+
+
+def calendar_token_cache_key(token):
+    """Cache key mapping a feed token to its staff id"""
+    return f"records:calendar_token:{get_rota_version()}:{token}"
+
+
+def get_calendar_feed(token, scope):
+    """
+    Return (etag, body) for a feed, or None if the token is unknown.
+
+    Token lookups and rendered feeds are cached under the current rota
+    version, so repeated polls between rota changes only read the cache.
+    The team feed is rendered once and shared by every subscriber.
+    """
+    version = get_rota_version()
+
+    token_key = calendar_token_cache_key(token)
+    staff_id = cache.get(token_key)
+    if staff_id is None:
+        staff = OnCallStaff.objects.filter(calendar_token=token).only("id").first()
+        if staff is None:
+            return None
+        staff_id = staff.id
+        cache.set(token_key, staff_id, FEED_CACHE_TIMEOUT)
+
+    feed_key = (
+        f"records:calendar_feed:{version}:team"
+        if scope == "team"
+        else f"records:calendar_feed:{version}:staff:{staff_id}"
+    )
+    feed = cache.get(feed_key)
+    if feed is not None:
+        return feed
+
+    if scope == "team":
+        body = build_calendar("On-call rota", _feed_shifts(), team=True)
+    else:
+        staff = OnCallStaff.objects.select_related("user").get(id=staff_id)
+        body = build_calendar(
+            f"On call - {staff.user.get_full_name() or staff.assignment_id}",
+            _feed_shifts(staff, PERSONAL_FEED_HISTORY_DAYS),
+            team=False,
+        )
+
+    feed = (f'"{hashlib.md5(body).hexdigest()}"', body)
+    cache.set(feed_key, feed, FEED_CACHE_TIMEOUT)
+    return feed
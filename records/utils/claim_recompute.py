@@ -0,0 +1,100 @@
+"""
+Recompute a month's block claims from the claim rules.
+
+Rules, sign-offs, blocks and time entries are each read in one query; the
+per-entry rounding and minimum call-out are applied to whole-month arrays
+and summed per block, so a month costs the same handful of queries however
+many blocks it has. Changes are returned as a diff and only written, with
+one bulk update, when asked to.
+"""
+
+import numpy as np
+
+from ..models import ClaimRule, MonthlySignOff, TimeBlock, TimeEntry
+from .claim_rules import claim_from_minutes
+from .date_helpers import get_month_date_range
+from .time_overlap import MINUTES_PER_DAY
+
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def _minutes(times):
+    return np.array([t.hour * 60 + t.minute for t in times], dtype=np.int64)
+
+
+def recompute_month_claims(year, month, apply=False):
+    """
+    Work out every block's claim for a month from the claim rules.
+
+    Blocks with no matching rule, and months already signed off for a
+    staff member, are left alone.
+
+    Args:
+        year (int): Year to recompute
+        month (int): Month to recompute (1-12)
+        apply (bool): Write the changed claims
+
+    Returns:
+        dict: blocks checked and a list of changes, each a dict with
+        block_id, staff, date, old and new claim
+    """
+    start_date, next_month_start = get_month_date_range(year, month)
+    rules = {
+        (rule.day_type_id, rule.oncall_type): rule for rule in ClaimRule.objects.all()
+    }
+    signed_off = MonthlySignOff.objects.filter(year=year, month=month).values("staff_id")
+    blocks = [
+        block
+        for block in TimeBlock.objects.filter(
+            date__gte=start_date, date__lt=next_month_start
+        )
+        .exclude(staff_id__in=signed_off)
+        .order_by("date", "staff__assignment_id")
+        .values_list("id", "staff__assignment_id", "date", "day_type_id", "oncall_type", "claim")
+        if (block[3], block[4]) in rules
+    ]
+    if not blocks:
+        return {"blocks_checked": 0, "changes": []}
+
+    # Per-block rule parameters, indexed by block position
+    position = {block[0]: index for index, block in enumerate(blocks)}
+    block_rules = [rules[(block[3], block[4])] for block in blocks]
+    rounding = np.array([rule.rounding_minutes for rule in block_rules], dtype=np.int64)
+    minimum = np.array([rule.minimum_callout_minutes for rule in block_rules], dtype=np.int64)
+
+    entry_rows = list(
+        TimeEntry.objects.filter(
+            timeblock__date__gte=start_date, timeblock__date__lt=next_month_start
+        )
+        .exclude(timeblock__staff_id__in=signed_off)
+        .values_list("timeblock_id", "time_started", "time_ended")
+    )
+    entry_rows = [row for row in entry_rows if row[0] in position]
+    totals = np.zeros(len(blocks), dtype=np.int64)
+    if entry_rows:
+        block_ids, starts, ends = zip(*entry_rows)
+        index = np.array([position[block_id] for block_id in block_ids], dtype=np.int64)
+        # Entries ending at or before their start run past midnight
+        minutes = (_minutes(ends) - _minutes(starts)) % MINUTES_PER_DAY
+        minutes[minutes == 0] = MINUTES_PER_DAY
+        step = rounding[index]
+        rounded = np.where(step > 0, -(-minutes // np.maximum(step, 1)) * step, minutes)
+        claimed = np.maximum(rounded, minimum[index])
+        totals = np.bincount(index, weights=claimed, minlength=len(blocks)).astype(np.int64)
+
+    changes = []
+    for (block_id, staff, day, _, _, old), rule, total in zip(blocks, block_rules, totals):
+        new = claim_from_minutes(total, rule.multiplier)
+        if old != new:
+            changes.append(
+                {"block_id": block_id, "staff": staff, "date": day, "old": old, "new": new}
+            )
+
+    if apply and changes:
+        TimeBlock.objects.bulk_update(
+            [TimeBlock(id=change["block_id"], claim=change["new"]) for change in changes],
+            ["claim"],
+            batch_size=BULK_UPDATE_BATCH_SIZE,
+        )
+
+    return {"blocks_checked": len(blocks), "changes": changes}
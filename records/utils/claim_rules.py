@@ -0,0 +1,40 @@
+"""
+Claim arithmetic shared by single blocks and the monthly recompute.
+
+Claims are worked out in whole minutes per time entry: each entry is
+rounded up to the rule's increment, then raised to its minimum call-out,
+and the block's total is converted to hours at the rule's multiplier.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from .time_overlap import minute_interval
+
+CLAIM_PLACES = Decimal("0.01")
+
+
+def entry_claim_minutes(minutes, rounding_minutes, minimum_minutes):
+    """Claimable minutes for one entry of the given length"""
+    if rounding_minutes:
+        minutes = -(-minutes // rounding_minutes) * rounding_minutes
+    return max(minutes, minimum_minutes)
+
+
+def claim_from_minutes(total_minutes, multiplier):
+    """Convert claimable minutes to a claim in hours at the given multiplier"""
+    claim = Decimal(int(total_minutes)) * Decimal(multiplier) / 60
+    return claim.quantize(CLAIM_PLACES, rounding=ROUND_HALF_UP)
+
+
+def calculate_claim(entry_times, rounding_minutes, minimum_minutes, multiplier):
+    """
+    Claim for a block from its entries' (time_started, time_ended) pairs.
+
+    Entries ending at or before their start run past midnight, as for
+    TimeEntry.hours.
+    """
+    total = 0
+    for time_started, time_ended in entry_times:
+        start, end = minute_interval(time_started, time_ended)
+        total += entry_claim_minutes(end - start, rounding_minutes, minimum_minutes)
+    return claim_from_minutes(total, multiplier)
@@ -1,4 +1,7 @@
+import hmac
 from functools import wraps
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -37,6 +40,27 @@ def require_staff_permission(view_func):
     return wrapper
 
 
+def require_rota_api_access(view_func):
+    """
+    Decorator for machine-readable rota endpoints.
+    Accepts an "Authorization: Bearer <key>" header matching one of
+    settings.ROTA_API_KEYS without touching the database, and otherwise
+    falls back to the logged-in session.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            key = auth_header[len('Bearer '):].encode()
+            if any(hmac.compare_digest(key, allowed.encode()) for allowed in settings.ROTA_API_KEYS):
+                return view_func(request, *args, **kwargs)
+            return JsonResponse({'error': 'Invalid API key'}, status=401)
+        if request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    return wrapper
+
+
 def check_month_not_signed_off(view_func):
     """
     Decorator that prevents editing of time blocks/entries in signed-off months.
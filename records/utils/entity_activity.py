@@ -0,0 +1,86 @@
+"""
+Every time block that touched a donor, recipient or lab task, newest first.
+
+Pages are keyset-paginated on the block's (date, id): the cursor is the
+last block shown, and the next page starts strictly before it. Assignments
+carry a copy of their block's date, so the (entity_type, entity_id, date,
+timeblock) index serves both the seek and the order and a page reads only
+its own rows; the page's time entries follow in one query.
+"""
+
+from datetime import date
+
+from django.db.models import Q
+
+from ..models import Assignment, TimeEntry
+
+PAGE_SIZE = 25
+
+
+def format_cursor(block):
+    return f"{block.date.isoformat()}.{block.id}"
+
+
+def parse_cursor(value):
+    """
+    Parse a cursor made by format_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    day, _, block_id = value.partition(".")
+    return date.fromisoformat(day), int(block_id)
+
+
+def entity_activity(entity_type, entity_id, before=None, limit=PAGE_SIZE):
+    """
+    One page of the blocks an entity was assigned to.
+
+    Args:
+        entity_type (str): Assignment entity type
+        entity_id (str): Identifier as stored on the assignments
+        before (tuple): Optional (date, block id) cursor; only blocks
+            before it are returned
+        limit (int): Blocks per page
+
+    Returns:
+        dict: blocks (TimeBlocks, each with ``assignment`` and its
+        ``entries`` in the order they were added) and next_cursor (None on
+        the last page)
+    """
+    assignments = Assignment.objects.filter(entity_type=entity_type, entity_id=entity_id)
+    if before:
+        day, block_id = before
+        # date__lte bounds the index range; the OR breaks ties on the block id
+        assignments = assignments.filter(date__lte=day).filter(
+            Q(date__lt=day) | Q(timeblock_id__lt=block_id)
+        )
+    page = list(
+        assignments.select_related("timeblock__staff__user", "timeblock__day_type").order_by(
+            "-date", "-timeblock_id"
+        )[: limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    blocks = []
+    for assignment in page:
+        block = assignment.timeblock
+        block.assignment = assignment
+        block.entries = []
+        blocks.append(block)
+
+    if blocks:
+        by_id = {block.id: block for block in blocks}
+        for entry in (
+            TimeEntry.objects.filter(timeblock_id__in=by_id)
+            .select_related("task", "work_mode")
+            .order_by("id")
+        ):
+            entry.timeblock = by_id[entry.timeblock_id]
+            entry.timeblock.entries.append(entry)
+
+    return {
+        "blocks": blocks,
+        "next_cursor": format_cursor(blocks[-1]) if has_more else None,
+    }
@@ -0,0 +1,69 @@
+"""
+Donor, recipient and lab task lookups for the assignment pickers.
+
+Prefix searches use case-insensitive ``istartswith`` lookups, served by
+the prefix indexes from migration 0042. The short "recent" lists shown on
+every block form are cached briefly and cleared whenever an entity is
+created, deleted or renamed.
+"""
+
+from django.core.cache import cache
+
+from ..models import Donor, LabTask, Recipient
+
+# Entity model, identifying field and descriptive field for each assignment type
+ENTITY_MODELS = {
+    "donor": (Donor, "donor_id", "name"),
+    "recipient": (Recipient, "recipient_id", "name"),
+    "lab_task": (LabTask, "name", "description"),
+}
+
+RECENT_ENTITIES_CACHE_KEY = "records:recent_entities"
+RECENT_ENTITIES_CACHE_TIMEOUT = 60 * 5
+RECENT_LIMIT = 10
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_QUERY_LENGTH = 50
+
+
+def invalidate_recent_entities():
+    cache.delete(RECENT_ENTITIES_CACHE_KEY)
+
+
+def get_recent_entities():
+    """
+    Most recently created entities of each type, newest first.
+
+    Returns:
+        dict: assignment type -> list of dicts with the model's identifying
+        and descriptive fields (e.g. donor_id and name)
+    """
+    recent = cache.get(RECENT_ENTITIES_CACHE_KEY)
+    if recent is None:
+        recent = {
+            entity_type: list(
+                model.objects.order_by("-created").values(id_field, label_field)[:RECENT_LIMIT]
+            )
+            for entity_type, (model, id_field, label_field) in ENTITY_MODELS.items()
+        }
+        cache.set(RECENT_ENTITIES_CACHE_KEY, recent, RECENT_ENTITIES_CACHE_TIMEOUT)
+    return recent
+
+
+def search_entities(entity_type, prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Entities of one type whose identifier starts with prefix (any case).
+
+    Returns:
+        list: {"id", "label"} dicts in identifier order, at most limit long
+    """
+    model, id_field, label_field = ENTITY_MODELS[entity_type]
+    rows = (
+        model.objects.filter(**{f"{id_field}__istartswith": prefix})
+        .order_by(id_field)
+        .values_list(id_field, label_field)[:limit]
+    )
+    return [
+        {"id": entity_id, "label": f"{entity_id} ({label})" if label else entity_id}
+        for entity_id, label in rows
+    ]
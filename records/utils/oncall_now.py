@@ -0,0 +1,145 @@
+"""In-memory lookup of who is on call at a given moment"""
+
+import json
+import threading
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import OnCallStaff
+from .date_helpers import get_month_date_range
+from .rota_index import LEVELS, SHIFT_TYPES, rota_index
+from .rota_version import get_rota_version
+
+# Months kept in memory before the index starts again from empty
+MAX_CACHED_MONTHS = 24
+
+
+def rota_date_for(moment):
+    """
+    Return the rota date covering a moment.
+
+    A rota day runs from the handover time on its date until the handover
+    time the next day, so early-morning lookups belong to the previous day.
+    """
+    local = timezone.localtime(moment)
+    handover = time(hour=settings.ROTA_HANDOVER_HOUR)
+    if local.time() < handover:
+        return local.date() - timedelta(days=1)
+    return local.date()
+
+
+class OnCallIndex:
+    """
+    Per-process index of rota date -> pre-serialised on-call payload.
+
+    Months are built on first use from the shared rota index plus one query
+    for the names of the staff on call. The whole index is dropped when the
+    shared rota version changes, so a warm lookup costs one cache read and a
+    dict lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._days = {}
+        self._months = set()
+
+    def lookup(self, rota_date):
+        """Return (version, payload) where payload is a JSON fragment (bytes)"""
+        version = get_rota_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._days = {}
+                    self._months = set()
+                    self._version = version
+
+        days = self._days
+        payload = days.get(rota_date)
+        if payload is None:
+            with self._lock:
+                if self._version == version:
+                    self._load_month(rota_date.year, rota_date.month)
+                payload = self._days.get(rota_date)
+            if payload is None:
+                # Index was reset by a concurrent write; serve this request uncached
+                payload = self._build_month(rota_date.year, rota_date.month)[rota_date]
+        return version, payload
+
+    def _load_month(self, year, month):
+        if (year, month) in self._months:
+            return
+        if len(self._months) >= MAX_CACHED_MONTHS:
+            self._days = {}
+            self._months = set()
+        days = dict(self._days)
+        days.update(self._build_month(year, month))
+        self._days = days
+        self._months.add((year, month))
+
+    @staticmethod
+    def _build_month(year, month):
+        start_date, next_month_start = get_month_date_range(year, month)
+        end_date = next_month_start - timedelta(days=1)
+
+        shifts = rota_index.shifts(start_date, end_date)
+        holidays = rota_index.holiday_dates()
+        days = {}
+        current = start_date
+        while current <= end_date:
+            days[current] = {
+                "rota_date": current.isoformat(),
+                "shift_type": None,
+                "bank_holiday": current in holidays,
+                "oncall": {level: [] for level in LEVELS},
+            }
+            current += timedelta(days=1)
+
+        staff = {
+            staff_id: (assignment_id, f"{first_name} {last_name}".strip())
+            for staff_id, assignment_id, first_name, last_name in OnCallStaff.objects.filter(
+                id__in=set(shifts.staff.tolist())
+            ).values_list("id", "assignment_id", "user__first_name", "user__last_name")
+        }
+        # Ordered by day, then assignment id (staff deleted meanwhile are skipped)
+        rows = sorted(
+            (
+                row
+                for row in zip(
+                    shifts.day.tolist(),
+                    shifts.staff.tolist(),
+                    shifts.level.tolist(),
+                    shifts.shift_type.tolist(),
+                    shifts.shift_id.tolist(),
+                )
+                if row[1] in staff
+            ),
+            key=lambda row: (row[0], staff[row[1]][0]),
+        )
+        for ordinal, staff_id, level, shift_type, shift_id in rows:
+            day_data = days[date.fromordinal(ordinal)]
+            day_data["shift_type"] = SHIFT_TYPES[shift_type]
+            assignment_id, name = staff[staff_id]
+            day_data["oncall"][LEVELS[level]].append(
+                {
+                    "staff_id": assignment_id,
+                    "name": name,
+                    "notes": shifts.notes.get(shift_id, ""),
+                }
+            )
+
+        # Serialise once; requests only prepend the timestamp
+        return {
+            day: json.dumps(day_data)[1:].encode() for day, day_data in days.items()
+        }
+
+
+oncall_index = OnCallIndex()
+
+
+def oncall_response_body(moment):
+    """Return (version, JSON bytes) describing who is on call at a moment"""
+    version, payload = oncall_index.lookup(rota_date_for(moment))
+    return version, b'{"at": "' + moment.isoformat().encode() + b'", ' + payload
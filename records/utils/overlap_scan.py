@@ -0,0 +1,63 @@
+"""
+Find overlapping time entries across a whole month before sign-off.
+
+All entries in the month are read in one query ordered by block, and each
+block's entries are checked with the same minute-axis sweep used when an
+entry is saved.
+"""
+
+from itertools import groupby
+
+from ..models import TimeEntry
+from .date_helpers import get_month_date_range
+from .time_overlap import find_overlaps, minute_interval
+
+
+def scan_month_overlaps(year, month, staff=None):
+    """
+    Find entries overlapping another entry in the same block for a month.
+
+    Args:
+        year (int): Year to scan
+        month (int): Month to scan (1-12)
+        staff (OnCallStaff): Optionally limit the scan to one staff member
+
+    Returns:
+        dict: staff_id -> list of overlaps in date order, each a dict with
+        block_id, date and the two entries' ids and HH:MM times
+    """
+    start_date, next_month_start = get_month_date_range(year, month)
+    entries = TimeEntry.objects.filter(
+        timeblock__date__gte=start_date, timeblock__date__lt=next_month_start
+    )
+    if staff is not None:
+        entries = entries.filter(timeblock__staff=staff)
+    rows = entries.order_by("timeblock__date", "timeblock_id", "id").values_list(
+        "timeblock_id", "timeblock__staff_id", "timeblock__date", "id", "time_started", "time_ended"
+    )
+
+    overlaps = {}
+    for block_id, block_rows in groupby(rows, key=lambda row: row[0]):
+        block_rows = list(block_rows)
+        _, staff_id, day, _, _, _ = block_rows[0]
+        times = {entry_id: (started, ended) for _, _, _, entry_id, started, ended in block_rows}
+        intervals = [
+            (entry_id, *minute_interval(started, ended))
+            for entry_id, (started, ended) in times.items()
+        ]
+        for first, second in find_overlaps(intervals):
+            overlaps.setdefault(staff_id, []).append(
+                {
+                    "block_id": block_id,
+                    "date": day,
+                    "entries": [
+                        {
+                            "id": entry_id,
+                            "time_started": f"{times[entry_id][0]:%H:%M}",
+                            "time_ended": f"{times[entry_id][1]:%H:%M}",
+                        }
+                        for entry_id in (first, second)
+                    ],
+                }
+            )
+    return overlaps
@@ -0,0 +1,537 @@
+"""Batched rota mutations applied in a single transaction"""
+
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import OnCallStaff, RotaChange, RotaEntry, RotaShift
+from .rota_concurrency import (
+    CONFLICT_ERROR,
+    RotaConflict,
+    parse_expected_version,
+    rota_day_states,
+)
+from .rota_events import rota_event
+from .rota_history import log_rota_changes, rota_change, shift_type_change
+from .rota_version import rota_changed
+
+ROTA_OPERATIONS = (
+    "create_entry",
+    "add_staff",
+    "toggle_shift_type",
+    "remove_staff",
+    "clear_day",
+)
+
+MAX_BATCH_OPERATIONS = 500
+
+SENIORITY_LEVELS = {choice for choice, _ in RotaShift.SENIORITY_CHOICES}
+
+
+class _DayState:
+    """In-memory view of one rota day while a batch is being applied"""
+
+    def __init__(self, date, entry=None):
+        self.date = date
+        self.entry = entry
+        self.shift_type = (entry.shift_type if entry else None) or "normal"
+        self.shifts = {}  # staff_id -> RotaShift (saved or pending)
+        self.delete_entry = False
+
+    @property
+    def version(self):
+        """Version of the day as loaded, 0 when it had no rota entry"""
+        return self.entry.version if self.entry is not None and self.entry.pk else 0
+
+    def final_version(self):
+        """Version the day ends up with once the batch is written"""
+        if self.delete_entry or self.entry is None:
+            return 0
+        return self.entry.version
+
+    def matches(self, version, rota_entry_id):
+        """Whether the day is still as the client last saw it"""
+        if version is None:
+            return True
+        if rota_entry_id and (self.entry is None or self.entry.pk != rota_entry_id):
+            return False
+        return version == self.version
+
+    def ensure_entry(self, new_entries):
+        """Make sure the day has a rota entry, creating a pending one if needed"""
+        self.delete_entry = False
+        if self.entry is None:
+            self.entry = RotaEntry(date=self.date, shift_type=self.shift_type)
+            new_entries.append(self.entry)
+        return self.entry
+
+
+def _parse_date(value):
+    if not value:
+        raise ValueError("Date is required")
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _parse_operation(operation):
+    """Validate a raw operation dict and return a normalised copy"""
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be an object")
+
+    op = operation.get("op")
+    if op not in ROTA_OPERATIONS:
+        raise ValueError(f"Unknown operation: {op}")
+
+    parsed = {"op": op}
+    parsed["version"], parsed["rota_entry_id"] = parse_expected_version(operation)
+
+    if op == "remove_staff":
+        shift_id = operation.get("shift_id")
+        if not shift_id:
+            raise ValueError("Shift ID is required")
+        parsed["shift_id"] = int(shift_id)
+        # Optional, so a conflict can report the day's current state
+        if operation.get("date"):
+            parsed["date"] = _parse_date(operation.get("date"))
+        return parsed
+
+    parsed["date"] = _parse_date(operation.get("date"))
+
+    if op == "add_staff":
+        staff_id = operation.get("staff_id")
+        seniority_level = operation.get("seniority_level")
+        if not all([staff_id, seniority_level]):
+            raise ValueError("Missing required data")
+        if seniority_level not in SENIORITY_LEVELS:
+            raise ValueError(f"Invalid seniority level: {seniority_level}")
+        parsed["staff_id"] = int(staff_id)
+        parsed["seniority_level"] = seniority_level
+    elif op == "clear_day":
+        seniority_level = operation.get("seniority_level")
+        if seniority_level and seniority_level not in SENIORITY_LEVELS:
+            raise ValueError(f"Invalid seniority level: {seniority_level}")
+        parsed["seniority_level"] = seniority_level
+
+    return parsed
+
+
+def apply_rota_operations(operations, actor=None):
+    """
+    Apply a list of rota operations atomically.
+
+    Existing rows are loaded up front, the operations are replayed in order
+    against an in-memory copy of the affected days, and the net result is
+    written with bulk inserts, updates and deletes. If any operation fails
+    nothing is written.
+
+    No rows are locked. Operations may carry the ``version`` of their day the
+    client last saw, and every touched day's version is bumped with a
+    conditional UPDATE against the version loaded here, so a day changed by
+    anyone else in between fails the whole batch as a conflict.
+
+    Args:
+        operations (list): Operation dicts, each with an ``op`` key from
+            ROTA_OPERATIONS plus the same fields the single-action rota
+            endpoints accept.
+        actor: User recorded in the rota change log
+
+    Returns:
+        tuple: (success, results) where results holds one dict per operation
+        shaped like the response of the matching single-action endpoint.
+        Operations that hit a conflict have ``conflict`` set and carry the
+        day's ``current`` state.
+    """
+    results = [None] * len(operations)
+    parsed_operations = []
+
+    for index, operation in enumerate(operations):
+        try:
+            parsed_operations.append(_parse_operation(operation))
+        except (ValueError, TypeError) as e:
+            results[index] = {"success": False, "error": str(e)}
+            parsed_operations.append(None)
+
+    if any(result is not None for result in results):
+        return False, _mark_not_applied(results)
+
+    events = []
+    changes = []
+    conflict_dates = set()
+    try:
+        with transaction.atomic():
+            success = _apply_parsed_operations(
+                parsed_operations, results, events, changes, conflict_dates
+            )
+            if success:
+                log_rota_changes(actor, changes)
+                rota_changed(events)
+            else:
+                transaction.set_rollback(True)
+    except RotaConflict as e:
+        success = False
+        conflict_dates.update(e.dates)
+        for index, op in enumerate(parsed_operations):
+            if op.get("date") in e.dates:
+                results[index] = {"success": False, "error": CONFLICT_ERROR, "conflict": True}
+
+    if not success:
+        if conflict_dates:
+            states = rota_day_states(conflict_dates)
+            for index, op in enumerate(parsed_operations):
+                result = results[index]
+                if result is not None and result.get("conflict") and op.get("date"):
+                    result["current"] = states[op["date"]]
+        return False, _mark_not_applied(results)
+    return True, results
+
+
+def _mark_not_applied(results):
+    return [
+        result
+        if result is not None and not result["success"]
+        else {"success": False, "error": "Batch was not applied"}
+        for result in results
+    ]
+
+
+def _apply_parsed_operations(
+    parsed_operations, results, events, changes, conflict_dates
+):
+    dates = {op["date"] for op in parsed_operations if "date" in op}
+    staff_ids = {op["staff_id"] for op in parsed_operations if "staff_id" in op}
+    shift_ids = {op["shift_id"] for op in parsed_operations if "shift_id" in op}
+
+    # Shifts removed by id may live on days not otherwise mentioned
+    if shift_ids:
+        dates.update(
+            RotaShift.objects.filter(id__in=shift_ids).values_list(
+                "rota_entry__date", flat=True
+            )
+        )
+
+    staff_by_id = (
+        OnCallStaff.objects.select_related("user").in_bulk(staff_ids)
+        if staff_ids
+        else {}
+    )
+
+    days = {day: _DayState(day) for day in dates}
+    for entry in RotaEntry.objects.filter(date__in=dates):
+        days[entry.date] = _DayState(entry.date, entry)
+
+    shifts_by_id = {}
+    for shift in RotaShift.objects.filter(rota_entry__date__in=dates).select_related(
+        "rota_entry"
+    ):
+        day = days[shift.rota_entry.date]
+        shift.rota_entry = day.entry
+        day.shifts[shift.staff_id] = shift
+        shifts_by_id[shift.id] = shift
+
+    new_entries = []
+    new_shifts = []
+    deleted_shift_ids = set()
+    deferred_ids = []  # (dict, key, instance) filled once pks are known
+    versioned = []  # (result, event, day) given the day's final version
+    success = True
+
+    def conflict(index, day):
+        nonlocal success
+        results[index] = {"success": False, "error": CONFLICT_ERROR, "conflict": True}
+        conflict_dates.add(day)
+        success = False
+
+    for index, op in enumerate(parsed_operations):
+        name = op["op"]
+
+        if name == "remove_staff":
+            shift = shifts_by_id.get(op["shift_id"])
+            if shift is None:
+                if op["version"] is not None and "date" in op:
+                    # Removed (or moved) since the client loaded the day
+                    conflict(index, op["date"])
+                    continue
+                results[index] = {"success": False, "error": "Shift not found"}
+                success = False
+                continue
+            day = days[shift.rota_entry.date]
+            if not day.matches(op["version"], op["rota_entry_id"]):
+                conflict(index, day.date)
+                continue
+            del day.shifts[shift.staff_id]
+            del shifts_by_id[shift.id]
+            deleted_shift_ids.add(shift.id)
+            remaining_shifts = len(day.shifts)
+            if remaining_shifts == 0:
+                day.delete_entry = True
+            results[index] = {
+                "success": True,
+                "remaining_shifts": remaining_shifts,
+                "rota_entry_deleted": remaining_shifts == 0,
+            }
+            events.append(rota_event("remove_staff", day.date, shift_id=shift.id))
+            changes.append(rota_change(day.date, RotaChange.REMOVE_STAFF, shift.staff_id))
+            versioned.append((results[index], events[-1], day))
+            continue
+
+        day = days[op["date"]]
+        if not day.matches(op["version"], op["rota_entry_id"]):
+            conflict(index, day.date)
+            continue
+
+        if name == "create_entry":
+            created = day.entry is None
+            entry = day.ensure_entry(new_entries)
+            results[index] = {
+                "success": True,
+                "shift_type": day.shift_type,
+                "rota_entry_id": entry.pk,
+                "created": created,
+            }
+            deferred_ids.append((results[index], "rota_entry_id", entry))
+            versioned.append((results[index], None, day))
+            if created:
+                events.append(
+                    rota_event("create_entry", day.date, shift_type=day.shift_type)
+                )
+                changes.append(rota_change(day.date, RotaChange.CREATE_ENTRY))
+                versioned.append((None, events[-1], day))
+
+        elif name == "toggle_shift_type":
+            entry = day.ensure_entry(new_entries)
+            day.shift_type = "nhsp" if day.shift_type == "normal" else "normal"
+            results[index] = {
+                "success": True,
+                "shift_type": day.shift_type,
+                "rota_entry_id": entry.pk,
+            }
+            deferred_ids.append((results[index], "rota_entry_id", entry))
+            events.append(
+                rota_event("toggle_shift_type", day.date, shift_type=day.shift_type)
+            )
+            changes.append(shift_type_change(day.date, day.shift_type))
+            versioned.append((results[index], events[-1], day))
+
+        elif name == "add_staff":
+            staff = staff_by_id.get(op["staff_id"])
+            if staff is None:
+                results[index] = {"success": False, "error": "Staff not found"}
+                success = False
+                continue
+            if staff.id in day.shifts:
+                results[index] = {
+                    "success": False,
+                    "error": "Staff already assigned on this date",
+                }
+                success = False
+                continue
+            entry = day.ensure_entry(new_entries)
+            shift = RotaShift(
+                rota_entry=entry, staff=staff, seniority_level=op["seniority_level"]
+            )
+            day.shifts[staff.id] = shift
+            new_shifts.append(shift)
+            changes.append(rota_change(day.date, RotaChange.ADD_STAFF, staff.id))
+            results[index] = {
+                "success": True,
+                "shift": {
+                    "id": None,
+                    "staff_id": staff.assignment_id,
+                    "staff_name": staff.user.get_full_name(),
+                    "staff_color": staff.color,
+                    "seniority_level": op["seniority_level"],
+                    "notes": "",
+                },
+                "rota_entry_id": entry.pk,
+                "shift_type": day.shift_type,
+            }
+            deferred_ids.append((results[index]["shift"], "id", shift))
+            deferred_ids.append((results[index], "rota_entry_id", entry))
+            # Shares the result's shift dict, so the id is filled in on write
+            events.append(
+                rota_event(
+                    "add_staff",
+                    day.date,
+                    shift=results[index]["shift"],
+                    shift_type=day.shift_type,
+                )
+            )
+            versioned.append((results[index], events[-1], day))
+
+        elif name == "clear_day":
+            if day.entry is None or day.delete_entry:
+                results[index] = {
+                    "success": False,
+                    "error": "No rota entry found for this date",
+                }
+                success = False
+                continue
+            seniority_level = op["seniority_level"]
+            cleared = [
+                staff_id
+                for staff_id, shift in day.shifts.items()
+                if not seniority_level or shift.seniority_level == seniority_level
+            ]
+            for staff_id in cleared:
+                changes.append(rota_change(day.date, RotaChange.REMOVE_STAFF, staff_id))
+                shift = day.shifts.pop(staff_id)
+                if shift.pk:
+                    deleted_shift_ids.add(shift.pk)
+                    del shifts_by_id[shift.pk]
+                else:
+                    new_shifts.remove(shift)
+            if not day.shifts:
+                day.delete_entry = True
+            results[index] = {
+                "success": True,
+                "deleted_count": len(cleared),
+                "rota_entry_id": None if day.delete_entry else day.entry.pk,
+            }
+            if not day.delete_entry:
+                deferred_ids.append((results[index], "rota_entry_id", day.entry))
+            events.append(
+                rota_event("clear_day", day.date, seniority_level=seniority_level)
+            )
+            versioned.append((results[index], events[-1], day))
+
+    if not success:
+        return False
+
+    _write_changes(days, new_entries, new_shifts, deleted_shift_ids)
+
+    for result, key, instance in deferred_ids:
+        result[key] = instance.pk
+    for result, event, day in versioned:
+        for payload in (result, event):
+            if payload is not None:
+                payload["version"] = day.final_version()
+    return True
+
+
+def _write_changes(days, new_entries, new_shifts, deleted_shift_ids):
+    """
+    Persist the net effect of a batch with bulk statements.
+
+    Raises RotaConflict if any touched day changed since it was loaded.
+    """
+    # Bump every existing day's version against the version loaded, grouped
+    # by (loaded version, new shift type) so type changes ride along
+    claims = {}
+    for day in days.values():
+        entry = day.entry
+        if entry is None or not entry.pk:
+            continue
+        new_type = None
+        if not day.delete_entry and entry.shift_type != day.shift_type:
+            new_type = day.shift_type
+            entry.shift_type = day.shift_type
+        claims.setdefault((entry.version, new_type), []).append(entry)
+    now = timezone.now()
+    for (version, new_type), entries in claims.items():
+        changes = {"shift_type": new_type} if new_type else {}
+        updated = RotaEntry.objects.filter(
+            id__in=[entry.pk for entry in entries], version=version
+        ).update(version=F("version") + 1, last_modified=now, **changes)
+        if updated != len(entries):
+            raise RotaConflict(entry.date for entry in entries)
+        for entry in entries:
+            entry.version = version + 1
+
+    for entry in new_entries:
+        entry.shift_type = days[entry.date].shift_type
+    entries_to_create = [
+        entry for entry in new_entries if not days[entry.date].delete_entry
+    ]
+    if entries_to_create:
+        try:
+            # The unique date rejects days someone else has just created
+            with transaction.atomic():
+                RotaEntry.objects.bulk_create(entries_to_create)
+        except IntegrityError:
+            raise RotaConflict(entry.date for entry in entries_to_create)
+
+    if deleted_shift_ids:
+        RotaShift.objects.filter(id__in=deleted_shift_ids).delete()
+
+    if new_shifts:
+        for shift in new_shifts:
+            shift.rota_entry_id = shift.rota_entry.pk
+        RotaShift.objects.bulk_create(new_shifts)
+
+    emptied_entry_ids = [
+        day.entry.pk
+        for day in days.values()
+        if day.delete_entry and day.entry is not None and day.entry.pk
+    ]
+    if emptied_entry_ids:
+        RotaEntry.objects.filter(id__in=emptied_entry_ids).delete()
+
+
+def bulk_create_shifts(planned_shifts, actor=None, shift_types=None, notes=None):
+    """
+    Create rota entries for missing days and bulk insert the given shifts.
+
+    Must be called inside a transaction. Callers are expected to have checked
+    planned shifts against existing ones for the (rota_entry, staff) unique
+    constraint already.
+
+    Args:
+        planned_shifts (list): (date, staff_id, seniority_level) tuples
+        actor: User recorded in the rota change log
+        shift_types (dict): Optional date -> shift type for days that need a
+            new rota entry (default "normal")
+        notes (list): Optional notes for each planned shift, in order
+
+    Returns:
+        tuple: (entries_created, shifts) with the number of new RotaEntry rows
+        and the created RotaShift instances
+    """
+    if not planned_shifts:
+        return 0, []
+
+    dates = {day for day, _, _ in planned_shifts}
+    entries_by_date = {
+        entry.date: entry
+        for entry in RotaEntry.objects.select_for_update().filter(
+            date__gte=min(dates), date__lte=max(dates)
+        )
+    }
+    touched_ids = [
+        entries_by_date[day].pk for day in dates if day in entries_by_date
+    ]
+    if touched_ids:
+        # Open calendars holding the old versions must reload these days
+        RotaEntry.objects.filter(id__in=touched_ids).update(
+            version=F("version") + 1, last_modified=timezone.now()
+        )
+    shift_types = shift_types or {}
+    new_entries = [
+        RotaEntry(date=day, shift_type=shift_types.get(day, "normal"))
+        for day in sorted(dates)
+        if day not in entries_by_date
+    ]
+    RotaEntry.objects.bulk_create(new_entries)
+    entries_by_date.update((entry.date, entry) for entry in new_entries)
+
+    shifts = RotaShift.objects.bulk_create(
+        [
+            RotaShift(
+                rota_entry=entries_by_date[day],
+                staff_id=staff_id,
+                seniority_level=level,
+                notes=shift_notes,
+            )
+            for (day, staff_id, level), shift_notes in zip(
+                planned_shifts, notes or [""] * len(planned_shifts)
+            )
+        ]
+    )
+    log_rota_changes(
+        actor,
+        [
+            rota_change(day, RotaChange.ADD_STAFF, staff_id)
+            for day, staff_id, _ in planned_shifts
+        ],
+    )
+    return len(new_entries), shifts
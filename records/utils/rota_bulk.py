@@ -0,0 +1,244 @@
+"""Bulk rota operations: copying a month and shifting a staff member's rota"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import RotaChange, RotaEntry, RotaShift
+from .date_helpers import get_month_date_range
+from .rota_batch import bulk_create_shifts
+from .rota_events import rota_event
+from .rota_history import log_rota_changes, rota_change
+from .rota_version import rota_changed
+
+
+def aligned_offset(source_start, target_start):
+    """
+    Days to add to a source date so that weekdays line up.
+
+    The target's first day maps to the first same weekday in the source, so
+    the result is always a whole number of weeks.
+    """
+    offset = (target_start - source_start).days
+    return offset - offset % 7
+
+
+def _source_days(source_next, target_start, target_next, offset):
+    """
+    Source day for every target day, keyed by source day.
+
+    Target days are copied from the day a whole number of weeks earlier
+    (see aligned_offset). Near the end of the target month that can fall
+    past the end of the source month; those days take the source month's
+    last day on the same weekday instead.
+    """
+    targets_by_source = {}
+    target_day = target_start
+    while target_day < target_next:
+        source_day = target_day - offset
+        while source_day >= source_next:
+            source_day -= timedelta(days=7)
+        targets_by_source.setdefault(source_day, []).append(target_day)
+        target_day += timedelta(days=1)
+    return targets_by_source
+
+
+def _conflict_list(conflicts):
+    return [
+        {"date": day.isoformat(), "staff_id": assignment_id}
+        for day, assignment_id in sorted(conflicts)
+    ]
+
+
+def copy_rota_month(source_month, target_month, replace=False, actor=None):
+    """
+    Copy one month's shifts onto another month, aligned by weekday.
+
+    Every target day is copied from a source day on the same weekday (see
+    _source_days). New rota entries take the shift type of their source
+    day; shift notes are not copied. Unless replace is True, staff already
+    on the rota on a target day are reported as conflicts and nothing is
+    written. With replace, the target month is cleared first and ends up
+    an exact copy.
+
+    Args:
+        source_month (date): Any day in the month to copy from
+        target_month (date): Any day in the month to copy to
+        replace (bool): Clear the target month before copying
+        actor: User recorded in the rota change log
+
+    Returns:
+        dict: Summary with success flag, shift/entry counts and, on
+        failure, an error and any conflicting (date, staff) pairs
+    """
+    source_start, source_next = get_month_date_range(source_month.year, source_month.month)
+    target_start, target_next = get_month_date_range(target_month.year, target_month.month)
+    if source_start == target_start:
+        return {"success": False, "error": "Source and target month must differ"}
+    offset = timedelta(days=aligned_offset(source_start, target_start))
+    targets_by_source = _source_days(source_next, target_start, target_next, offset)
+
+    with transaction.atomic():
+        planned = []
+        shift_types = {}
+        staff_codes = {}
+        for day, shift_type, staff_id, assignment_id, level in RotaShift.objects.filter(
+            rota_entry__date__gte=source_start, rota_entry__date__lt=source_next
+        ).values_list(
+            "rota_entry__date",
+            "rota_entry__shift_type",
+            "staff_id",
+            "staff__assignment_id",
+            "seniority_level",
+        ):
+            for target_day in targets_by_source.get(day, ()):
+                planned.append((target_day, staff_id, level))
+                shift_types[target_day] = shift_type
+                staff_codes[staff_id] = assignment_id
+
+        if not planned:
+            return {"success": False, "error": "No shifts to copy"}
+
+        target_shifts = RotaShift.objects.filter(
+            rota_entry__date__gte=target_start, rota_entry__date__lt=target_next
+        )
+        existing = list(target_shifts.values_list("rota_entry__date", "staff_id"))
+        if not replace:
+            taken = set(existing)
+            conflicts = {
+                (day, staff_codes[staff_id])
+                for day, staff_id, _ in planned
+                if (day, staff_id) in taken
+            }
+            if conflicts:
+                return {
+                    "success": False,
+                    "error": "Staff already on the rota in the target month",
+                    "conflicts": _conflict_list(conflicts),
+                }
+        else:
+            # Fresh entries take the source day's shift type; open calendars
+            # see the old entry ids disappear and reload those days
+            log_rota_changes(
+                actor,
+                [rota_change(day, RotaChange.REMOVE_STAFF, staff_id) for day, staff_id in existing],
+            )
+            RotaEntry.objects.filter(
+                date__gte=target_start, date__lt=target_next
+            ).delete()
+
+        entries_created, _ = bulk_create_shifts(planned, actor=actor, shift_types=shift_types)
+
+        rota_changed(
+            [
+                rota_event(
+                    "refresh",
+                    start_date=target_start.isoformat(),
+                    end_date=(target_next - timedelta(days=1)).isoformat(),
+                )
+            ]
+        )
+
+    return {
+        "success": True,
+        "source_month": source_start.strftime("%Y-%m"),
+        "target_month": target_start.strftime("%Y-%m"),
+        "offset_days": offset.days,
+        "shifts_copied": len(planned),
+        "shifts_replaced": len(existing) if replace else 0,
+        "entries_created": entries_created,
+    }
+
+
+def shift_staff_rota(staff, days, start_date, end_date=None, actor=None):
+    """
+    Move a staff member's shifts from a date onwards by a number of days.
+
+    Shifts keep their seniority level and notes. If the staff member is
+    already on the rota on a day a shift would move to (and that shift is
+    not itself moving) the move is reported as a conflict and nothing is
+    written. Rota days left without staff are removed.
+
+    Args:
+        staff (OnCallStaff): Staff member whose shifts move
+        days (int): Days to move by; negative moves earlier
+        start_date (date): First date of shifts to move
+        end_date (date): Optional last date of shifts to move
+        actor: User recorded in the rota change log
+
+    Returns:
+        dict: Summary with success flag and shift/entry counts, or an error
+        and any conflicting dates
+    """
+    if not days:
+        return {"success": False, "error": "Number of days must not be zero"}
+    delta = timedelta(days=days)
+
+    with transaction.atomic():
+        shifts = RotaShift.objects.filter(staff=staff, rota_entry__date__gte=start_date)
+        if end_date:
+            shifts = shifts.filter(rota_entry__date__lte=end_date)
+        moving = list(
+            shifts.order_by("rota_entry__date").values_list(
+                "id", "rota_entry_id", "rota_entry__date", "seniority_level", "notes"
+            )
+        )
+        if not moving:
+            return {"success": False, "error": "No shifts to move"}
+
+        moving_ids = [shift_id for shift_id, _, _, _, _ in moving]
+        blocked = RotaShift.objects.filter(
+            staff=staff,
+            rota_entry__date__in=[day + delta for _, _, day, _, _ in moving],
+        ).exclude(id__in=moving_ids)
+        conflicts = {
+            (day, staff.assignment_id)
+            for day in blocked.values_list("rota_entry__date", flat=True)
+        }
+        if conflicts:
+            return {
+                "success": False,
+                "error": "Staff already on the rota on days shifts would move to",
+                "conflicts": _conflict_list(conflicts),
+            }
+
+        RotaShift.objects.filter(id__in=moving_ids).delete()
+        source_entry_ids = {entry_id for _, entry_id, _, _, _ in moving}
+        RotaEntry.objects.filter(id__in=source_entry_ids).update(
+            version=F("version") + 1, last_modified=timezone.now()
+        )
+        log_rota_changes(
+            actor,
+            [rota_change(day, RotaChange.REMOVE_STAFF, staff.id) for _, _, day, _, _ in moving],
+        )
+
+        entries_created, _ = bulk_create_shifts(
+            [(day + delta, staff.id, level) for _, _, day, level, _ in moving],
+            actor=actor,
+            notes=[notes for _, _, _, _, notes in moving],
+        )
+
+        _, deleted = RotaEntry.objects.filter(
+            id__in=source_entry_ids, shifts__isnull=True
+        ).delete()
+
+        first_day = moving[0][2]
+        last_day = moving[-1][2]
+        rota_changed(
+            [
+                rota_event(
+                    "refresh",
+                    start_date=min(first_day, first_day + delta).isoformat(),
+                    end_date=max(last_day, last_day + delta).isoformat(),
+                )
+            ]
+        )
+
+    return {
+        "success": True,
+        "shifts_moved": len(moving),
+        "entries_created": entries_created,
+        "entries_removed": deleted.get("records.RotaEntry", 0),
+    }
@@ -0,0 +1,128 @@
+"""
+Optimistic concurrency for rota days.
+
+Every change to a day increments RotaEntry.version. Clients send back the
+version (and entry id) they last saw; the write starts with a conditional
+UPDATE that both checks and bumps it, so a stale edit updates no rows and
+is answered with the day's current state instead of overwriting it.
+"""
+
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import RotaEntry
+
+CONFLICT_ERROR = "This day was changed by someone else"
+
+
+class RotaConflict(Exception):
+    """A rota day changed after the client (or batch) read it"""
+
+    def __init__(self, dates):
+        super().__init__(CONFLICT_ERROR)
+        self.dates = set(dates)
+
+
+def parse_expected_version(data):
+    """
+    Read the optional ``version`` / ``rota_entry_id`` a client sent.
+
+    Returns:
+        tuple: (version, rota_entry_id); version is None when the client did
+        not send one (unconditional write) and 0 when it saw no rota entry
+    """
+    version = data.get("version")
+    rota_entry_id = data.get("rota_entry_id")
+    if version is not None:
+        version = int(version)
+        if version < 0:
+            raise ValueError("Version must not be negative")
+    if rota_entry_id:
+        rota_entry_id = int(rota_entry_id)
+    else:
+        rota_entry_id = None
+    return version, rota_entry_id
+
+
+def claim_rota_entry(entries, version=None, **changes):
+    """
+    Increment the version of the matching rota entry in one statement.
+
+    Args:
+        entries: RotaEntry queryset narrowed to a single day
+        version (int): Only update if the entry is still at this version
+        **changes: Extra fields to set in the same UPDATE
+
+    Returns:
+        int: Number of rows updated (0 means missing or changed)
+    """
+    if version is not None:
+        entries = entries.filter(version=version)
+    return entries.update(
+        version=F("version") + 1, last_modified=timezone.now(), **changes
+    )
+
+
+def rota_day_states(dates):
+    """
+    Current state of rota days in one query, keyed by date.
+
+    Each state has the date, rota_entry_id, version (0 if there is no entry),
+    shift_type and shifts shaped like the rota endpoints' shift payloads.
+    """
+    states = {
+        day: {
+            "date": day.isoformat(),
+            "rota_entry_id": None,
+            "version": 0,
+            "shift_type": "normal",
+            "shifts": [],
+        }
+        for day in dates
+    }
+    rows = (
+        RotaEntry.objects.filter(date__in=states)
+        .order_by("date", "shifts__seniority_level", "shifts__staff__assignment_id")
+        .values_list(
+            "date",
+            "id",
+            "version",
+            "shift_type",
+            "shifts__id",
+            "shifts__seniority_level",
+            "shifts__notes",
+            "shifts__staff__assignment_id",
+            "shifts__staff__user__first_name",
+            "shifts__staff__user__last_name",
+            "shifts__staff__color",
+        )
+    )
+    for (
+        day,
+        entry_id,
+        version,
+        shift_type,
+        shift_id,
+        level,
+        notes,
+        assignment_id,
+        first_name,
+        last_name,
+        color,
+    ) in rows:
+        state = states[day]
+        state.update(
+            rota_entry_id=entry_id, version=version, shift_type=shift_type or "normal"
+        )
+        if shift_id:
+            state["shifts"].append(
+                {
+                    "id": shift_id,
+                    "staff_id": assignment_id,
+                    "staff_name": f"{first_name} {last_name}".strip(),
+                    "staff_color": color,
+                    "seniority_level": level,
+                    "notes": notes or "",
+                }
+            )
+    return states
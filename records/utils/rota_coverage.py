@@ -0,0 +1,104 @@
+"""
+Coverage-gap scanner for rota periods.
+
+Every day in a range is checked against the coverage rules in one pass over
+the in-memory rota index: shifts are counted into a days x levels matrix and
+compared with the required matrix. Results are cached under the rota
+version, so any rota write invalidates them.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from .date_helpers import get_month_date_range
+from .rota_index import DAY_TYPES, LEVELS, rota_index
+from .rota_solver import DEFAULT_COVERAGE
+from .rota_version import get_rota_version
+
+# Default scan: the rest of this month and the following six
+SCAN_MONTHS = 6
+
+MAX_SCAN_DAYS = 731
+
+# Days that need senior cover whatever the per-level minimums say
+SENIOR_COVER_DAY_TYPES = ["Saturday", "Sunday", "BankHoliday"]
+
+# Results are keyed by rota version, so this only bounds memory use
+COVERAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def default_scan_range():
+    """Return (start_date, end_date) for the default forward-looking scan"""
+    today = timezone.now().date()
+    month_index = today.month - 1 + SCAN_MONTHS
+    _, next_month_start = get_month_date_range(
+        today.year + month_index // 12, month_index % 12 + 1
+    )
+    return today, next_month_start - timedelta(days=1)
+
+
+def scan_coverage(start_date, end_date, coverage=None):
+    """
+    Check every day between two dates (inclusive) against the coverage rules.
+
+    Args:
+        start_date (date): First day to check
+        end_date (date): Last day to check
+        coverage (dict): Minimum shifts per seniority level, defaulting to
+            the solver's DEFAULT_COVERAGE
+
+    Returns:
+        dict: Summary with the days checked and, per gap day, the number of
+        shifts missing for each seniority level
+    """
+    coverage = {**DEFAULT_COVERAGE, **(coverage or {})}
+    shifts = rota_index.shifts(start_date, end_date)
+    day_types = rota_index.day_types(start_date, end_date)
+    n_days = len(day_types)
+    width = len(LEVELS)
+
+    counts = np.bincount(
+        (shifts.day.astype(np.int64) - start_date.toordinal()) * width + shifts.level,
+        minlength=n_days * width,
+    ).reshape(n_days, width)
+
+    required = np.tile([coverage.get(level, 0) for level in LEVELS], (n_days, 1))
+    senior_days = np.isin(
+        day_types, [DAY_TYPES.index(day_type) for day_type in SENIOR_COVER_DAY_TYPES]
+    )
+    senior = LEVELS.index("senior")
+    required[senior_days, senior] = np.maximum(required[senior_days, senior], 1)
+
+    missing = np.maximum(required - counts, 0)
+    gaps = [
+        {
+            "date": date.fromordinal(start_date.toordinal() + index).isoformat(),
+            "day_type": DAY_TYPES[day_types[index]],
+            "missing": {
+                level: count for level, count in zip(LEVELS, missing[index].tolist()) if count
+            },
+        }
+        for index in np.flatnonzero(missing.any(axis=1)).tolist()
+    ]
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "days_checked": n_days,
+        "gap_days": len(gaps),
+        "missing_shifts": int(missing.sum()),
+        "gaps": gaps,
+    }
+
+
+def get_coverage_gaps(start_date, end_date):
+    """scan_coverage with the default rules, cached under the rota version"""
+    version = get_rota_version()
+    cache_key = f"records:coverage_gaps:{version}:{start_date}:{end_date}"
+    result = cache.get(cache_key)
+    if result is None:
+        result = scan_coverage(start_date, end_date)
+        cache.set(cache_key, result, COVERAGE_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,138 @@
+"""
+Live rota change events for open calendar pages.
+
+Rota writes pass small change payloads to rota_changed(). Once the
+transaction commits they are stored as RotaEvent rows and pushed to the
+server-sent event streams in this process straight away. A single poller per
+process picks up events written by other workers, so every open calendar
+sees every change whichever process made it.
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ..models import RotaEvent
+
+logger = logging.getLogger(__name__)
+
+# How long events are kept for reconnecting clients and other workers
+EVENT_RETENTION = timedelta(hours=1)
+
+# Seconds between checks for events written by other worker processes
+POLL_INTERVAL = 2.0
+
+# Events buffered per stream before a slow client starts missing pushes
+# (it still gets them from the next poll)
+STREAM_QUEUE_SIZE = 100
+
+
+def rota_event(op, day=None, **fields):
+    """Build a change payload for rota_changed()"""
+    event = {"op": op}
+    if day is not None:
+        event["date"] = day.isoformat()
+    event.update(fields)
+    return event
+
+
+class RotaEventBroadcaster:
+    """Fan rota change events out to the SSE streams open in this process"""
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = {}  # asyncio.Queue -> event loop
+        self._delivered = set()  # ids already pushed, newer than the cursor
+        self._cursor = None  # highest id seen by the poller
+        self._poller = None
+
+    def subscribe(self):
+        """Register a stream on the running event loop and return its queue"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = loop
+            if self._poller is None or self._poller.done():
+                self._poller = loop.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, events):
+        """Push (id, payload) pairs to every stream; safe to call from any thread"""
+        with self._lock:
+            if not self._subscribers:
+                return
+            fresh = [event for event in events if event[0] not in self._delivered]
+            self._delivered.update(event_id for event_id, _ in fresh)
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, fresh)
+            except RuntimeError:
+                # Event loop already closed
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queue, events):
+        try:
+            queue.put_nowait(events)
+        except asyncio.QueueFull:
+            pass
+
+    async def _poll(self):
+        """Pick up events committed by other processes while streams are open"""
+        self._cursor = await latest_event_id()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    self._delivered = set()
+                    return
+            try:
+                rows = await events_after(self._cursor)
+            except Exception:
+                logger.exception("Polling rota events failed")
+                continue
+            if rows:
+                self._cursor = rows[-1][0]
+                self.publish(rows)
+            with self._lock:
+                self._delivered = {
+                    event_id for event_id in self._delivered if event_id > self._cursor
+                }
+
+
+broadcaster = RotaEventBroadcaster()
+
+
+async def latest_event_id():
+    event = await RotaEvent.objects.order_by("-id").only("id").afirst()
+    return event.id if event else 0
+
+
+async def events_after(event_id, limit=500):
+    """Return (id, payload) pairs for events newer than event_id"""
+    return [
+        row
+        async for row in RotaEvent.objects.filter(id__gt=event_id)
+        .order_by("id")
+        .values_list("id", "payload")[:limit]
+    ]
+
+
+def publish_rota_events(events):
+    """Store committed change payloads and push them to local streams"""
+    created = RotaEvent.objects.bulk_create([RotaEvent(payload=event) for event in events])
+    RotaEvent.objects.filter(created__lt=timezone.now() - EVENT_RETENTION).delete()
+    # Backends that cannot return ids rely on the poller instead
+    broadcaster.publish(
+        [(event.id, event.payload) for event in created if event.id is not None]
+    )
@@ -0,0 +1,38 @@
+"""Append-only audit log of rota changes"""
+
+from django.utils import timezone
+
+from ..models import RotaChange
+
+
+def rota_change(day, op, staff_id=None):
+    """Build an unsaved RotaChange row for log_rota_changes()"""
+    return RotaChange(day=day.toordinal(), op=op, staff_id=staff_id)
+
+
+def log_rota_changes(actor, changes):
+    """
+    Write rota change rows with one INSERT.
+
+    Call inside the transaction making the changes, so the log commits or
+    rolls back with them.
+
+    Args:
+        actor: User making the changes (None for scripts and commands)
+        changes: RotaChange rows from rota_change()
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    actor_id = actor.pk if actor is not None and actor.is_authenticated else None
+    now = timezone.now()
+    for change in changes:
+        change.actor_id = actor_id
+        change.at = now
+    RotaChange.objects.bulk_create(changes)
+
+
+def shift_type_change(day, shift_type):
+    """Change row for a day switched to the given shift type"""
+    op = RotaChange.SET_NHSP if shift_type == "nhsp" else RotaChange.SET_NORMAL
+    return rota_change(day, op)
@@ -0,0 +1,174 @@
+"""
+Import rota shifts from a CSV spreadsheet export.
+
+Every row is validated in memory against staff and existing shifts loaded
+up front (one query each), so a file either imports completely, with
+bulk inserts in one transaction, or not at all with an error per bad row.
+"""
+
+import csv
+from datetime import datetime
+
+from django.db import transaction
+
+from ..models import OnCallStaff, RotaEntry, RotaShift
+from .rota_batch import bulk_create_shifts
+from .rota_events import rota_event
+from .rota_version import rota_changed
+
+REQUIRED_COLUMNS = ("date", "assignment_id", "seniority")
+
+SHIFT_TYPES = {choice for choice, _ in RotaEntry.SHIFT_TYPE_CHOICES}
+
+# Accept both the stored values and the labels used in the calendar
+SENIORITY_VALUES = {
+    **{label.lower(): value for value, label in RotaShift.SENIORITY_CHOICES},
+    **{value: value for value, _ in RotaShift.SENIORITY_CHOICES},
+}
+
+# Stop collecting errors after this many; the file needs fixing anyway
+MAX_REPORTED_ERRORS = 200
+
+
+def _parse_row(values, staff_by_code):
+    """Validate one row on its own; returns (date, staff_id, level, shift_type)"""
+    try:
+        day = datetime.strptime(values["date"], "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f'Invalid date "{values["date"]}", expected YYYY-MM-DD')
+    staff_id = staff_by_code.get(values["assignment_id"])
+    if staff_id is None:
+        raise ValueError(f'Unknown staff "{values["assignment_id"]}"')
+    level = SENIORITY_VALUES.get(values["seniority"].lower())
+    if level is None:
+        raise ValueError(f'Invalid seniority "{values["seniority"]}"')
+    # A blank shift type leaves the day's type to other rows (default normal)
+    shift_type = (values.get("shift_type") or "").lower() or None
+    if shift_type is not None and shift_type not in SHIFT_TYPES:
+        raise ValueError(f'Invalid shift type "{values["shift_type"]}"')
+    return day, staff_id, level, shift_type
+
+
+def _file_error(error):
+    return {
+        "success": False,
+        "rows": 0,
+        "shifts_created": 0,
+        "entries_created": 0,
+        "errors": [{"row": 1, "error": error}],
+        "error_count": 1,
+    }
+
+
+def import_rota_csv(csv_file, actor=None, dry_run=False):
+    """
+    Import shifts from CSV text with date, assignment_id, seniority and
+    optional shift_type columns.
+
+    Rows clash with each other or with the existing rota when they put the
+    same staff member on the same day twice, or give a day a different
+    shift type. A blank shift type takes the day's type from other rows or
+    the existing rota, or "normal" for a new day. Any error means nothing is
+    written.
+
+    Args:
+        csv_file: Iterable of CSV text lines (an open file or list of str)
+        actor: User recorded in the rota change log
+        dry_run (bool): Validate only
+
+    Returns:
+        dict: Summary with success flag, row/shift/entry counts and a list
+        of {"row", "error"} dicts for rows that failed validation
+    """
+    reader = csv.DictReader(csv_file)
+    columns = {(name or "").strip().lower() for name in reader.fieldnames or []}
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        return _file_error(f"Missing column(s): {', '.join(missing)}")
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+
+    staff_by_code = dict(OnCallStaff.objects.values_list("assignment_id", "id"))
+    errors = []
+    rows = []
+    row_count = 0
+    for row in reader:
+        values = {key: (value or "").strip() for key, value in row.items() if key}
+        if not any(values.values()):
+            continue
+        row_count += 1
+        try:
+            rows.append((reader.line_num, *_parse_row(values, staff_by_code)))
+        except ValueError as e:
+            errors.append({"row": reader.line_num, "error": str(e)})
+    if not row_count:
+        return _file_error("No rows to import")
+
+    # Existing shifts and shift types across the file's date span
+    taken = {}
+    day_types = {}
+    if rows:
+        start_date = min(day for _, day, _, _, _ in rows)
+        end_date = max(day for _, day, _, _, _ in rows)
+        for day, shift_type in RotaEntry.objects.filter(
+            date__gte=start_date, date__lte=end_date
+        ).values_list("date", "shift_type"):
+            day_types[day] = (shift_type, None)
+        for day, staff_id in (
+            RotaShift.objects.filter(
+                rota_entry__date__gte=start_date, rota_entry__date__lte=end_date
+            )
+            .order_by()
+            .values_list("rota_entry__date", "staff_id")
+        ):
+            taken[(day, staff_id)] = None
+
+    planned = []
+    shift_types = {}
+    for line, day, staff_id, level, shift_type in rows:
+        if (day, staff_id) in taken:
+            earlier = taken[(day, staff_id)]
+            where = f"row {earlier}" if earlier else "the rota"
+            errors.append({"row": line, "error": f"Staff already on {day} in {where}"})
+            continue
+        if shift_type is not None:
+            day_type, set_by = day_types.setdefault(day, (shift_type, line))
+            if day_type != shift_type:
+                where = f"row {set_by}" if set_by else "the rota"
+                errors.append(
+                    {"row": line, "error": f"{day} is already {day_type} in {where}"}
+                )
+                continue
+            shift_types[day] = shift_type
+        taken[(day, staff_id)] = line
+        planned.append((day, staff_id, level))
+
+    summary = {
+        "success": not errors,
+        "rows": row_count,
+        "shifts_created": 0,
+        "entries_created": 0,
+        "errors": sorted(errors, key=lambda error: error["row"])[:MAX_REPORTED_ERRORS],
+        "error_count": len(errors),
+    }
+    if errors or dry_run:
+        return summary
+
+    with transaction.atomic():
+        entries_created, shifts = bulk_create_shifts(
+            planned, actor=actor, shift_types=shift_types
+        )
+        start_date = min(day for day, _, _ in planned)
+        end_date = max(day for day, _, _ in planned)
+        rota_changed(
+            [
+                rota_event(
+                    "refresh",
+                    start_date=start_date.isoformat(),
+                    end_date=end_date.isoformat(),
+                )
+            ]
+        )
+
+    summary["shifts_created"] = len(shifts)
+    summary["entries_created"] = entries_created
+    return summary
@@ -0,0 +1,304 @@
+"""
+Array-backed in-memory index of every rota shift.
+
+All shifts are loaded with one query into parallel NumPy arrays sorted by
+day, so statistics, fairness checks and on-call lookups can slice and count
+them without going back to the ORM. Each process keeps one index. When the
+shared rota version moves, the days named by new RotaEvent rows are re-read
+and patched in; a change the event log cannot account for (an admin edit, a
+holiday sync, a gap in the log) rebuilds the index instead.
+"""
+
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from ..models import BankHoliday, RotaEvent, RotaShift
+from .rota_version import get_rota_version
+
+LEVELS = [choice for choice, _ in RotaShift.SENIORITY_CHOICES]
+SHIFT_TYPES = ["normal", "nhsp"]
+DAY_TYPES = ["Weekday", "Saturday", "Sunday", "BankHoliday"]
+
+# Value labels for each coded array
+CODES = {"level": LEVELS, "shift_type": SHIFT_TYPES, "day_type": DAY_TYPES}
+
+DTYPES = {
+    "shift_id": np.int64,
+    "day": np.int32,
+    "staff": np.int32,
+    "level": np.int8,
+    "shift_type": np.int8,
+    "day_type": np.int8,
+}
+
+# Patching more days than this re-reads every shift instead
+MAX_PATCH_DAYS = 366
+
+
+class RotaShifts:
+    """
+    Parallel arrays describing a set of shifts, sorted by day.
+
+    ``day`` holds date ordinals, ``staff`` OnCallStaff ids, and ``level``,
+    ``shift_type`` and ``day_type`` index into LEVELS, SHIFT_TYPES and
+    DAY_TYPES. Shift notes are kept separately, only for shifts that have any.
+    """
+
+    def __init__(self, arrays, notes):
+        self.arrays = arrays
+        self.notes = notes
+        for field, values in arrays.items():
+            setattr(self, field, values)
+
+    def __len__(self):
+        return len(self.day)
+
+    def take(self, selector):
+        """Subset by slice, boolean mask or index array"""
+        return RotaShifts(
+            {field: values[selector] for field, values in self.arrays.items()},
+            self.notes,
+        )
+
+    def filter(self, staff_ids=None, levels=None, shift_types=None, day_types=None):
+        """Subset matching every given collection of values"""
+        mask = np.ones(len(self), dtype=bool)
+        if staff_ids is not None:
+            mask &= np.isin(self.staff, list(staff_ids))
+        for field, values in (
+            ("level", levels),
+            ("shift_type", shift_types),
+            ("day_type", day_types),
+        ):
+            if values is not None:
+                codes = [CODES[field].index(value) for value in values]
+                mask &= np.isin(self.arrays[field], codes)
+        return self.take(mask)
+
+    def count_by(self, field):
+        """Number of shifts per value of level, shift_type or day_type"""
+        labels = CODES[field]
+        counts = np.bincount(self.arrays[field], minlength=len(labels))
+        return dict(zip(labels, counts.tolist()))
+
+    def count_by_staff(self, field=None):
+        """
+        Number of shifts per staff id.
+
+        With a field, each staff id maps to a dict of counts per value of
+        that field instead of a total.
+        """
+        staff_ids, inverse = np.unique(self.staff, return_inverse=True)
+        if field is None:
+            counts = np.bincount(inverse, minlength=len(staff_ids))
+            return dict(zip(staff_ids.tolist(), counts.tolist()))
+
+        labels = CODES[field]
+        width = len(labels)
+        matrix = np.bincount(
+            inverse * width + self.arrays[field], minlength=len(staff_ids) * width
+        ).reshape(-1, width)
+        return {
+            staff_id: dict(zip(labels, row))
+            for staff_id, row in zip(staff_ids.tolist(), matrix.tolist())
+        }
+
+    def days_covered(self):
+        """Number of distinct days with at least one shift"""
+        if not len(self):
+            return 0
+        return int(np.count_nonzero(np.diff(self.day)) + 1)
+
+
+def _empty_shifts():
+    return RotaShifts(
+        {field: np.empty(0, dtype=dtype) for field, dtype in DTYPES.items()}, {}
+    )
+
+
+def _day_types(days, holidays):
+    """Vectorised day type codes for an array of date ordinals"""
+    # date.fromordinal(1) is a Monday, so (ordinal + 6) % 7 == date.weekday()
+    weekday = (days + 6) % 7
+    day_type = np.zeros(len(days), dtype=np.int8)
+    day_type[weekday == 5] = DAY_TYPES.index("Saturday")
+    day_type[weekday == 6] = DAY_TYPES.index("Sunday")
+    day_type[np.isin(days, holidays)] = DAY_TYPES.index("BankHoliday")
+    return day_type
+
+
+def _load_shifts(queryset, holidays):
+    """Read shifts into a RotaShifts with a single query"""
+    rows = list(
+        queryset.order_by("rota_entry__date", "staff_id").values_list(
+            "id",
+            "rota_entry__date",
+            "staff_id",
+            "seniority_level",
+            "rota_entry__shift_type",
+            "notes",
+        )
+    )
+    if not rows:
+        return _empty_shifts()
+
+    level_codes = {level: code for code, level in enumerate(LEVELS)}
+    shift_ids, days, staff_ids, levels, shift_types, notes = zip(*rows)
+    day = np.fromiter((d.toordinal() for d in days), dtype=DTYPES["day"], count=len(rows))
+    arrays = {
+        "shift_id": np.array(shift_ids, dtype=DTYPES["shift_id"]),
+        "day": day,
+        "staff": np.array(staff_ids, dtype=DTYPES["staff"]),
+        "level": np.array([level_codes[level] for level in levels], dtype=DTYPES["level"]),
+        "shift_type": np.array(
+            [shift_type == "nhsp" for shift_type in shift_types], dtype=DTYPES["shift_type"]
+        ),
+        "day_type": _day_types(day, holidays),
+    }
+    return RotaShifts(
+        arrays,
+        {shift_id: note for shift_id, note in zip(shift_ids, notes) if note},
+    )
+
+
+def _touched_dates(events, after_id):
+    """
+    Days changed by a run of rota events, or None if the events cannot
+    account for the change (a gap in the ids or an unbounded refresh).
+    """
+    if not events:
+        return None
+    dates = set()
+    expected_id = after_id + 1
+    for event_id, payload in events:
+        if event_id != expected_id:
+            return None
+        expected_id += 1
+        if payload.get("date"):
+            dates.add(date.fromisoformat(payload["date"]))
+        elif payload.get("start_date") and payload.get("end_date"):
+            current = date.fromisoformat(payload["start_date"])
+            end_date = date.fromisoformat(payload["end_date"])
+            if (end_date - current).days >= MAX_PATCH_DAYS:
+                return None
+            while current <= end_date:
+                dates.add(current)
+                current += timedelta(days=1)
+        else:
+            return None
+        if len(dates) > MAX_PATCH_DAYS:
+            return None
+    return dates
+
+
+class RotaIndex:
+    """Per-process RotaShifts for the whole rota, kept in step with the database"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._event_id = 0
+        self._shifts = _empty_shifts()
+        self._holidays = np.empty(0, dtype=DTYPES["day"])
+
+    def shifts(self, start_date=None, end_date=None):
+        """Shifts between two dates (inclusive) from an up to date index"""
+        self._sync()
+        shifts = self._shifts
+        start = (
+            0
+            if start_date is None
+            else np.searchsorted(shifts.day, start_date.toordinal(), side="left")
+        )
+        end = (
+            len(shifts)
+            if end_date is None
+            else np.searchsorted(shifts.day, end_date.toordinal(), side="right")
+        )
+        return shifts.take(slice(start, end))
+
+    def holiday_dates(self):
+        """Bank holiday dates the index classified days with"""
+        self._sync()
+        return {date.fromordinal(int(day)) for day in self._holidays}
+
+    def day_types(self, start_date, end_date):
+        """Day type codes for every day between two dates (inclusive)"""
+        self._sync()
+        days = np.arange(
+            start_date.toordinal(), end_date.toordinal() + 1, dtype=DTYPES["day"]
+        )
+        return _day_types(days, self._holidays)
+
+    def rebuild(self):
+        """Reload every shift from the database"""
+        with self._lock:
+            self._rebuild(get_rota_version())
+
+    def _sync(self):
+        version = get_rota_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is None:
+                self._rebuild(version)
+                return
+
+            events = list(
+                RotaEvent.objects.filter(id__gt=self._event_id)
+                .order_by("id")
+                .values_list("id", "payload")
+            )
+            dates = _touched_dates(events, self._event_id)
+            if dates is None:
+                self._rebuild(version)
+                return
+            self._patch(dates)
+            self._event_id = events[-1][0]
+            self._version = version
+
+    def _rebuild(self, version):
+        # Read the event cursor first; anything committed later is replayed
+        # by the next sync (patching the same day twice is harmless)
+        latest = RotaEvent.objects.order_by("-id").values_list("id", flat=True).first()
+        holidays = np.array(
+            sorted(day.toordinal() for day in BankHoliday.objects.values_list("date", flat=True)),
+            dtype=DTYPES["day"],
+        )
+        self._shifts = _load_shifts(RotaShift.objects.all(), holidays)
+        self._holidays = holidays
+        self._event_id = latest or 0
+        self._version = version
+
+    def _patch(self, dates):
+        """Replace the shifts of the given days with a fresh read of them"""
+        fresh = _load_shifts(
+            RotaShift.objects.filter(rota_entry__date__in=dates), self._holidays
+        )
+        current = self._shifts
+        ordinals = np.array([day.toordinal() for day in dates], dtype=DTYPES["day"])
+        replaced = np.isin(current.day, ordinals)
+        kept = current.take(~replaced)
+
+        arrays = {
+            field: np.concatenate([kept.arrays[field], fresh.arrays[field]])
+            for field in DTYPES
+        }
+        order = np.lexsort((arrays["staff"], arrays["day"]))
+        replaced_ids = set(current.shift_id[replaced].tolist())
+        notes = {
+            shift_id: note
+            for shift_id, note in current.notes.items()
+            if shift_id not in replaced_ids
+        }
+        notes.update(fresh.notes)
+        self._shifts = RotaShifts(
+            {field: values[order] for field, values in arrays.items()}, notes
+        )
+
+
+rota_index = RotaIndex()
@@ -0,0 +1,124 @@
+"""
+Compact month grids for the year and quarter rota views.
+
+Each month is rendered to an HTML fragment and cached under the rota
+version. Months missing from the cache are built together from one shift
+query and one holiday lookup, using plain per-day payloads of staff codes
+and colours instead of model instances.
+"""
+
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from ..models import BankHoliday, RotaShift
+from .date_helpers import get_month_date_range
+from .rota_index import LEVELS
+from .rota_version import get_rota_version
+
+# Fragments are keyed by rota version, so this only bounds memory use
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _month_fragment_key(version, year, month, today):
+    key = f"records:rota_month_grid:{version}:{year}-{month:02d}"
+    # The current month highlights today, so it changes at midnight too
+    if (year, month) == (today.year, today.month):
+        key += f":{today.day}"
+    return key
+
+
+def _load_days(start_date, end_date):
+    """Per-day payloads for a date range (one shift query)"""
+    days = defaultdict(lambda: {"nhsp": False, "shifts": []})
+    level_order = {level: index for index, level in enumerate(LEVELS)}
+    rows = (
+        RotaShift.objects.filter(
+            rota_entry__date__gte=start_date, rota_entry__date__lte=end_date
+        )
+        .order_by("rota_entry__date", "staff__assignment_id")
+        .values_list(
+            "rota_entry__date",
+            "rota_entry__shift_type",
+            "seniority_level",
+            "staff__assignment_id",
+            "staff__color",
+        )
+    )
+    for day, shift_type, level, assignment_id, color in rows:
+        day_data = days[day]
+        day_data["nhsp"] = shift_type == "nhsp"
+        day_data["shifts"].append(
+            {"code": assignment_id, "color": color, "level": level}
+        )
+    for day_data in days.values():
+        day_data["shifts"].sort(key=lambda shift: level_order.get(shift["level"], 0))
+    return days
+
+
+def _render_month(year, month, days, holidays, today):
+    weeks = []
+    for week in calendar.monthcalendar(year, month):
+        week_data = []
+        for day_num in week:
+            if day_num == 0:
+                week_data.append(None)
+                continue
+            day_date = date(year, month, day_num)
+            day_data = days.get(day_date, {"nhsp": False, "shifts": []})
+            week_data.append(
+                {
+                    "day_num": day_num,
+                    "is_today": day_date == today,
+                    "is_weekend": day_date.weekday() >= 5,
+                    "is_bank_holiday": day_date in holidays,
+                    **day_data,
+                }
+            )
+        weeks.append(week_data)
+
+    return render_to_string(
+        "records/partials/rota_month_grid.html",
+        {
+            "year": year,
+            "month": month,
+            "month_name": calendar.month_name[month],
+            "weeks": weeks,
+        },
+    )
+
+
+def get_month_grids(months):
+    """
+    Return rendered month grids for a list of (year, month) pairs, in order.
+
+    Cached fragments cost one cache read for the whole list; the rest are
+    built from a single shift query and holiday lookup spanning them.
+    """
+    version = get_rota_version()
+    today = date.today()
+    keys = {
+        (year, month): _month_fragment_key(version, year, month, today)
+        for year, month in months
+    }
+    cached = cache.get_many(keys.values())
+    missing = [ym for ym in months if keys[ym] not in cached]
+
+    if missing:
+        start_date, _ = get_month_date_range(*min(missing))
+        _, end_date = get_month_date_range(*max(missing))
+        end_date -= timedelta(days=1)
+        days = _load_days(start_date, end_date)
+        holidays = BankHoliday.get_holiday_dates(start_date, end_date)
+
+        rendered = {
+            keys[(year, month)]: _render_month(year, month, days, holidays, today)
+            for year, month in missing
+        }
+        cache.set_many(rendered, FRAGMENT_CACHE_TIMEOUT)
+        cached.update(rendered)
+
+    return [cached[keys[ym]] for ym in months]
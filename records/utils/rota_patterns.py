@@ -0,0 +1,191 @@
+"""Expand repeating rota patterns into RotaEntry/RotaShift rows"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, prefetch_related_objects
+from django.utils import timezone
+
+from ..models import BankHoliday, RotaChange, RotaEntry, RotaShift
+from .rota_batch import bulk_create_shifts
+from .rota_events import rota_event
+from .rota_history import log_rota_changes, rota_change
+from .rota_version import rota_changed
+
+
+def _date_range(start_date, end_date):
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
+
+
+def _pattern_staff_by_position(pattern):
+    """Split a pattern's slots into cycle positions and bank holiday turns"""
+    cycle = defaultdict(list)
+    bank_holiday_turns = defaultdict(list)
+    for slot in pattern.slots.all():
+        target = bank_holiday_turns if slot.bank_holiday else cycle
+        target[slot.position].append(slot.staff_id)
+    return cycle, [bank_holiday_turns[turn] for turn in sorted(bank_holiday_turns)]
+
+
+def generate_rota_from_patterns(
+    patterns, start_date=None, end_date=None, replace=False, actor=None
+):
+    """
+    Generate rota shifts for one or more patterns in a single transaction.
+
+    Each pattern is expanded over its own date range, clipped to start_date /
+    end_date when given. Days where the pattern's seniority level already has
+    shifts are left alone unless replace is True, in which case each
+    pattern's existing shifts at its own level within its own range are
+    removed first.
+
+    Args:
+        patterns: Iterable or queryset of RotaPattern
+        start_date (date): Optional lower bound for generation
+        end_date (date): Optional upper bound for generation
+        replace (bool): Replace existing shifts for the patterns' levels
+        actor: User recorded in the rota change log
+
+    Returns:
+        dict: Summary with success flag and created/skipped/conflict counts
+    """
+    patterns = list(patterns)
+    if not patterns:
+        return {"success": False, "error": "No rota patterns selected"}
+
+    # Work out the date range each pattern actually covers
+    ranges = {}
+    for pattern in patterns:
+        pattern_start = max(pattern.start_date, start_date or pattern.start_date)
+        pattern_end = min(pattern.end_date, end_date or pattern.end_date)
+        if pattern_start <= pattern_end:
+            ranges[pattern.pk] = (pattern_start, pattern_end)
+
+    if not ranges:
+        return {"success": False, "error": "Date range does not overlap the selected patterns"}
+
+    range_start = min(start for start, _ in ranges.values())
+    range_end = max(end for _, end in ranges.values())
+
+    # Preload slots and the holiday calendar up front; holidays are loaded
+    # from the earliest pattern start so bank holiday turns can be counted
+    prefetch_related_objects(patterns, "slots")
+    slots_by_pattern = {}
+    for pattern in patterns:
+        slots_by_pattern[pattern.pk] = _pattern_staff_by_position(pattern)
+    holiday_dates = BankHoliday.get_holiday_dates(
+        min(pattern.start_date for pattern in patterns if pattern.pk in ranges), range_end
+    )
+
+    summary = {
+        "success": True,
+        "entries_created": 0,
+        "shifts_created": 0,
+        "shifts_replaced": 0,
+        "days_skipped": 0,
+        "conflicts": 0,
+        "start_date": range_start,
+        "end_date": range_end,
+    }
+
+    replaced_entry_ids = set()
+    with transaction.atomic():
+        if replace:
+            # Each pattern only replaces its own level within its own range
+            replaced_shifts = Q()
+            for pattern in patterns:
+                if pattern.pk in ranges:
+                    pattern_start, pattern_end = ranges[pattern.pk]
+                    replaced_shifts |= Q(
+                        rota_entry__date__gte=pattern_start,
+                        rota_entry__date__lte=pattern_end,
+                        seniority_level=pattern.seniority_level,
+                    )
+            replaced = list(
+                RotaShift.objects.filter(replaced_shifts).values_list(
+                    "id", "rota_entry_id", "rota_entry__date", "staff_id"
+                )
+            )
+            replaced_entry_ids = {entry_id for _, entry_id, _, _ in replaced}
+            summary["shifts_replaced"], _ = RotaShift.objects.filter(
+                id__in=[shift_id for shift_id, _, _, _ in replaced]
+            ).delete()
+            log_rota_changes(
+                actor,
+                [
+                    rota_change(day, RotaChange.REMOVE_STAFF, staff_id)
+                    for _, _, day, staff_id in replaced
+                ],
+            )
+            RotaEntry.objects.filter(id__in=replaced_entry_ids).update(
+                version=F("version") + 1, last_modified=timezone.now()
+            )
+
+        # Existing (date, level) and (date, staff) pairs in the range
+        filled_levels = set()
+        taken_staff = set()
+        for day, staff_id, level in RotaShift.objects.filter(
+            rota_entry__date__gte=range_start, rota_entry__date__lte=range_end
+        ).values_list("rota_entry__date", "staff_id", "seniority_level"):
+            filled_levels.add((day, level))
+            taken_staff.add((day, staff_id))
+
+        planned = []
+        for pattern in patterns:
+            if pattern.pk not in ranges:
+                continue
+            cycle, bank_holiday_turns = slots_by_pattern[pattern.pk]
+            pattern_start, pattern_end = ranges[pattern.pk]
+            level = pattern.seniority_level
+
+            # Bank holiday turns continue from the pattern's own start date
+            bank_holiday_turn = sum(
+                1 for day in holiday_dates if pattern.start_date <= day < pattern_start
+            )
+
+            for day in _date_range(pattern_start, pattern_end):
+                if day in holiday_dates and pattern.bank_holiday_policy != "include":
+                    if pattern.bank_holiday_policy == "skip" or not bank_holiday_turns:
+                        continue
+                    staff_ids = bank_holiday_turns[bank_holiday_turn % len(bank_holiday_turns)]
+                    bank_holiday_turn += 1
+                else:
+                    position = (day - pattern.anchor_date).days % pattern.cycle_length
+                    staff_ids = cycle.get(position)
+
+                if not staff_ids:
+                    continue
+                if (day, level) in filled_levels:
+                    summary["days_skipped"] += 1
+                    continue
+
+                for staff_id in staff_ids:
+                    if (day, staff_id) in taken_staff:
+                        summary["conflicts"] += 1
+                        continue
+                    taken_staff.add((day, staff_id))
+                    planned.append((day, staff_id, level))
+
+        entries_created, _ = bulk_create_shifts(planned, actor=actor)
+
+        if replaced_entry_ids:
+            # Days emptied by the replacement and not refilled
+            RotaEntry.objects.filter(id__in=replaced_entry_ids, shifts__isnull=True).delete()
+
+        rota_changed(
+            [
+                rota_event(
+                    "refresh",
+                    start_date=range_start.isoformat(),
+                    end_date=range_end.isoformat(),
+                )
+            ]
+        )
+
+    summary["entries_created"] = entries_created
+    summary["shifts_created"] = len(planned)
+    return summary
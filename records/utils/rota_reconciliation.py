@@ -0,0 +1,103 @@
+"""
+Reconcile the rota against recorded time.
+
+Rota shifts and time blocks are each read as one query ordered by
+(date, staff), streamed in chunks and merge-joined, so a period of any
+length is diffed in a single pass without holding either side in memory.
+"""
+
+import csv
+
+from django.utils import timezone
+
+from ..models import RotaShift, TimeBlock
+
+NO_TIMEBLOCK = "no_timeblock"
+NO_ROTA_SHIFT = "no_rota_shift"
+
+MISMATCH_LABELS = {
+    NO_TIMEBLOCK: "Rota'd, no time recorded",
+    NO_ROTA_SHIFT: "Time recorded, not on rota",
+}
+
+CSV_HEADER = ["Date", "Assignment ID", "Name", "Mismatch"]
+
+CHUNK_SIZE = 2000
+
+_END = object()
+
+
+def _distinct_keys(rows):
+    """Collapse consecutive rows sharing a (date, staff_id) key"""
+    previous = None
+    for row in rows:
+        if row[:2] != previous:
+            previous = row[:2]
+            yield row
+
+
+def _stream(queryset, date_field):
+    return _distinct_keys(
+        queryset.order_by(date_field, "staff_id")
+        .values_list(
+            date_field,
+            "staff_id",
+            "staff__assignment_id",
+            "staff__user__first_name",
+            "staff__user__last_name",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def reconcile_rota(start_date, end_date):
+    """
+    Yield rota/time-record mismatches between two dates (inclusive).
+
+    Days after today are not reconciled, since time cannot be recorded in
+    advance.
+
+    Yields:
+        tuple: (date, staff_id, assignment_id, name, mismatch) in date then
+        staff order, where mismatch is NO_TIMEBLOCK or NO_ROTA_SHIFT
+    """
+    end_date = min(end_date, timezone.now().date())
+    shifts = _stream(
+        RotaShift.objects.filter(
+            rota_entry__date__gte=start_date, rota_entry__date__lte=end_date
+        ),
+        "rota_entry__date",
+    )
+    blocks = _stream(
+        TimeBlock.objects.filter(date__gte=start_date, date__lte=end_date), "date"
+    )
+
+    shift = next(shifts, _END)
+    block = next(blocks, _END)
+    while shift is not _END or block is not _END:
+        if block is _END or (shift is not _END and shift[:2] < block[:2]):
+            row, mismatch = shift, NO_TIMEBLOCK
+            shift = next(shifts, _END)
+        elif shift is _END or block[:2] < shift[:2]:
+            row, mismatch = block, NO_ROTA_SHIFT
+            block = next(blocks, _END)
+        else:
+            shift = next(shifts, _END)
+            block = next(blocks, _END)
+            continue
+
+        day, staff_id, assignment_id, first_name, last_name = row
+        yield day, staff_id, assignment_id, f"{last_name}, {first_name}", mismatch
+
+
+def write_reconciliation_csv(output, mismatches):
+    """Write mismatches from reconcile_rota as CSV; returns the row count"""
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    count = 0
+    for day, _, assignment_id, name, mismatch in mismatches:
+        writer.writerow(
+            [day.isoformat(), assignment_id, name, MISMATCH_LABELS[mismatch]]
+        )
+        count += 1
+    return count
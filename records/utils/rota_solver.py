@@ -0,0 +1,523 @@
+"""Fairness-aware automatic rota solver"""
+
+import time
+from array import array
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from ..models import OnCallStaff, RotaShift
+from .rota_batch import bulk_create_shifts
+from .rota_events import rota_event
+from .rota_index import rota_index
+from .rota_version import rota_changed
+
+SENIORITY_LEVELS = [choice for choice, _ in RotaShift.SENIORITY_CHOICES]
+
+DEFAULT_COVERAGE = {"trainee": 1, "oncall": 1, "senior": 1}
+
+# Day kinds, matching the day types used by rota_statistics
+WEEKDAY, WEEKEND, BANK_HOLIDAY = 0, 1, 2
+
+# Objective weights: bank holidays are the scarcest and most contested days
+WEEKEND_WEIGHT = 1.0
+BANK_HOLIDAY_WEIGHT = 3.0
+WORKLOAD_WEIGHT = 0.5
+
+# Days either side of the period loaded so rest/week rules see neighbouring shifts
+MARGIN_DAYS = 6
+
+
+class RotaSolver:
+    """
+    Fill empty rota slots for a period while balancing weekend and bank
+    holiday duty.
+
+    Each staff member has a row in a day-indexed busy matrix plus running
+    weekend / bank holiday counts seeded from the five-year history. Slots
+    are filled greedily (bank holidays first, then weekends, then weekdays)
+    with the staff member whose counts grow the least, then improved by local
+    search: reassigning a slot to another staff member and swapping staff
+    between a weekday and a weekend/bank holiday slot.
+
+    The objective is the weighted sum, per seniority level, of the variance of
+    weekend counts, bank holiday counts and period workload, plus a penalty
+    for every slot left unfilled.
+    """
+
+    UNFILLED_PENALTY = 1000.0
+
+    def __init__(
+        self,
+        start_date,
+        end_date,
+        coverage=None,
+        max_shifts_per_week=2,
+        min_rest_days=1,
+        time_limit=5.0,
+    ):
+        if end_date < start_date:
+            raise ValueError("End date cannot be before start date")
+        if not 0 <= min_rest_days <= MARGIN_DAYS:
+            raise ValueError(f"Minimum rest days must be between 0 and {MARGIN_DAYS}")
+        if max_shifts_per_week < 1:
+            raise ValueError("Maximum shifts per week must be at least 1")
+
+        self.start_date = start_date
+        self.end_date = end_date
+        self.coverage = {**DEFAULT_COVERAGE, **(coverage or {})}
+        self.max_shifts_per_week = max_shifts_per_week
+        self.min_rest_days = min_rest_days
+        self.time_limit = time_limit
+        self.history_start = date(start_date.year - 4, 1, 1)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def day_index(self, day):
+        return (day - self.start_date).days + MARGIN_DAYS
+
+    def index_date(self, index):
+        return self.start_date + timedelta(days=index - MARGIN_DAYS)
+
+    def load(self):
+        """
+        Load active staff and the shifts around the period with two queries.
+
+        Holidays and the fairness history come from the rota index; the
+        shifts the new ones must fit around are read from the database, so
+        an applied run never plans around a stale copy.
+        """
+        n_days = (self.end_date - self.start_date).days + 1
+        self.n_days = n_days
+        width = n_days + 2 * MARGIN_DAYS
+
+        staff_rows = list(
+            OnCallStaff.objects.filter(user__is_active=True)
+            .order_by("assignment_id")
+            .values_list("id", "seniority_level")
+        )
+        self.staff_ids = array("i", [staff_id for staff_id, _ in staff_rows])
+        self.staff_index = {staff_id: i for i, (staff_id, _) in enumerate(staff_rows)}
+        self.staff_by_level = {level: [] for level in SENIORITY_LEVELS}
+        for i, (_, level) in enumerate(staff_rows):
+            if level in self.staff_by_level:
+                self.staff_by_level[level].append(i)
+
+        n_staff = len(staff_rows)
+        self.busy = [bytearray(width) for _ in range(n_staff)]
+        self.weekend = array("i", [0] * n_staff)
+        self.bank_holiday = array("i", [0] * n_staff)
+        self.workload = array("i", [0] * n_staff)
+
+        holidays = rota_index.holiday_dates()
+
+        self.day_kind = bytearray(width)
+        for index in range(width):
+            self.day_kind[index] = self._kind(self.index_date(index), holidays)
+
+        # Weekend / bank holiday history, counted over the shared rota index
+        history = rota_index.shifts(self.history_start, self.end_date).filter(
+            staff_ids=self.staff_index
+        )
+        for counts, kind in (
+            (self.weekend, history.filter(day_types=["Saturday", "Sunday"])),
+            (self.bank_holiday, history.filter(day_types=["BankHoliday"])),
+        ):
+            for staff_id, count in kind.count_by_staff().items():
+                counts[self.staff_index[staff_id]] = count
+
+        # Busy days around the period and existing cover per (day, level) in it
+        filled = {}
+        nearby = RotaShift.objects.filter(
+            rota_entry__date__gte=self.index_date(0),
+            rota_entry__date__lte=self.index_date(width - 1),
+            staff_id__in=self.staff_index,
+        ).values_list("rota_entry__date", "staff_id", "seniority_level")
+        period = range(MARGIN_DAYS, MARGIN_DAYS + n_days)
+        for day, staff_id, level in nearby:
+            s = self.staff_index[staff_id]
+            index = self.day_index(day)
+            self.busy[s][index] = 1
+            if index in period:
+                self.workload[s] += 1
+                filled[(index, level)] = filled.get((index, level), 0) + 1
+
+        # Slots still to fill: (day index, level) repeated per missing person
+        slots = []
+        for index in range(MARGIN_DAYS, MARGIN_DAYS + n_days):
+            for level in SENIORITY_LEVELS:
+                missing = self.coverage.get(level, 0) - filled.get((index, level), 0)
+                slots.extend([(index, level)] * max(missing, 0))
+
+        # Hardest days first: bank holidays, weekends, then weekdays
+        slots.sort(key=lambda slot: (-self.day_kind[slot[0]], slot[0]))
+        self.slot_day = array("i", [index for index, _ in slots])
+        self.slot_level = [level for _, level in slots]
+        self.assignment = array("i", [-1] * len(slots))
+
+    @staticmethod
+    def _kind(day, holidays):
+        if day in holidays:
+            return BANK_HOLIDAY
+        if day.weekday() >= 5:
+            return WEEKEND
+        return WEEKDAY
+
+    # ------------------------------------------------------------------
+    # Constraints and costs
+    # ------------------------------------------------------------------
+
+    def can_work(self, s, index):
+        """Check one-shift-per-day, rest and max-per-week rules for staff s"""
+        row = self.busy[s]
+        if row[index]:
+            return False
+
+        rest = self.min_rest_days
+        if rest and (any(row[index - rest:index]) or any(row[index + 1:index + rest + 1])):
+            return False
+
+        # Every 7-day window containing this day must stay within the limit
+        window = row[max(index - 6, 0):index + 7]
+        offset = index - max(index - 6, 0)
+        running = sum(window[:7])
+        limit = self.max_shifts_per_week - 1
+        for start in range(0, len(window) - 6):
+            if start > 0:
+                running += window[start + 6] - window[start - 1]
+            if start <= offset < start + 7 and running > limit:
+                return False
+        return True
+
+    def staff_cost(self, s):
+        return (
+            WEEKEND_WEIGHT * self.weekend[s] ** 2
+            + BANK_HOLIDAY_WEIGHT * self.bank_holiday[s] ** 2
+            + WORKLOAD_WEIGHT * self.workload[s] ** 2
+        )
+
+    def _count(self, s, kind, delta):
+        self.workload[s] += delta
+        if kind == WEEKEND:
+            self.weekend[s] += delta
+        elif kind == BANK_HOLIDAY:
+            self.bank_holiday[s] += delta
+
+    def assign(self, slot, s):
+        index = self.slot_day[slot]
+        self.assignment[slot] = s
+        self.busy[s][index] = 1
+        self._count(s, self.day_kind[index], 1)
+
+    def unassign(self, slot):
+        s = self.assignment[slot]
+        index = self.slot_day[slot]
+        self.assignment[slot] = -1
+        self.busy[s][index] = 0
+        self._count(s, self.day_kind[index], -1)
+        return s
+
+    def objective(self):
+        """Weighted per-level variance of duty counts plus unfilled penalty"""
+        total = 0.0
+        for members in self.staff_by_level.values():
+            if not members:
+                continue
+            n = len(members)
+            for counts, weight in (
+                (self.weekend, WEEKEND_WEIGHT),
+                (self.bank_holiday, BANK_HOLIDAY_WEIGHT),
+                (self.workload, WORKLOAD_WEIGHT),
+            ):
+                values = [counts[s] for s in members]
+                mean = sum(values) / n
+                total += weight * sum((v - mean) ** 2 for v in values) / n
+        unfilled = sum(1 for s in self.assignment if s < 0)
+        return total + self.UNFILLED_PENALTY * unfilled
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def greedy(self):
+        for slot in range(len(self.assignment)):
+            if self.assignment[slot] < 0:
+                self._fill(slot)
+
+    def _fill(self, slot):
+        index = self.slot_day[slot]
+        kind = self.day_kind[index]
+        best, best_cost = -1, None
+        for s in self.staff_by_level[self.slot_level[slot]]:
+            if not self.can_work(s, index):
+                continue
+            before = self.staff_cost(s)
+            self._count(s, kind, 1)
+            cost = self.staff_cost(s) - before
+            self._count(s, kind, -1)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = s, cost
+        if best >= 0:
+            self.assign(slot, best)
+        return best >= 0
+
+    def _try_reassign(self, slot):
+        """Move a slot to the staff member that lowers the objective most"""
+        current = self.assignment[slot]
+        index = self.slot_day[slot]
+        kind = self.day_kind[index]
+        base = self.staff_cost(current)
+        self.unassign(slot)
+        removed_gain = base - self.staff_cost(current)
+
+        best, best_delta = current, 0.0
+        for s in self.staff_by_level[self.slot_level[slot]]:
+            if s == current or not self.can_work(s, index):
+                continue
+            before = self.staff_cost(s)
+            self._count(s, kind, 1)
+            delta = self.staff_cost(s) - before - removed_gain
+            self._count(s, kind, -1)
+            if delta < best_delta - 1e-9:
+                best, best_delta = s, delta
+        self.assign(slot, best)
+        return best != current
+
+    def _try_swap(self, a_slot, b_slot):
+        """Swap the staff on two slots of the same level if that helps"""
+        a, b = self.assignment[a_slot], self.assignment[b_slot]
+        if a == b or a < 0 or b < 0:
+            return False
+        a_index, b_index = self.slot_day[a_slot], self.slot_day[b_slot]
+
+        before = self.staff_cost(a) + self.staff_cost(b)
+        self.unassign(a_slot)
+        self.unassign(b_slot)
+        if self.can_work(a, b_index) and self.can_work(b, a_index):
+            self.assign(a_slot, b)
+            self.assign(b_slot, a)
+            if self.staff_cost(a) + self.staff_cost(b) < before - 1e-9:
+                return True
+            self.unassign(a_slot)
+            self.unassign(b_slot)
+        self.assign(a_slot, a)
+        self.assign(b_slot, b)
+        return False
+
+    def local_search(self, deadline):
+        passes = 0
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            passes += 1
+
+            for slot in range(len(self.assignment)):
+                if self.assignment[slot] < 0:
+                    improved |= self._fill(slot)
+                elif self._try_reassign(slot):
+                    improved = True
+
+            # Swaps only change counts when the two days are of a different kind
+            for level in SENIORITY_LEVELS:
+                special = [
+                    slot
+                    for slot in range(len(self.assignment))
+                    if self.slot_level[slot] == level
+                    and self.day_kind[self.slot_day[slot]] != WEEKDAY
+                ]
+                others = [
+                    slot
+                    for slot in range(len(self.assignment))
+                    if self.slot_level[slot] == level
+                ]
+                for a_slot in special:
+                    if time.perf_counter() >= deadline:
+                        break
+                    a_kind = self.day_kind[self.slot_day[a_slot]]
+                    for b_slot in others:
+                        if self.day_kind[self.slot_day[b_slot]] != a_kind and self._try_swap(
+                            a_slot, b_slot
+                        ):
+                            improved = True
+        return passes
+
+    def solve(self):
+        """
+        Run the solver.
+
+        Returns:
+            dict: assignments as (date, staff_id, seniority_level) tuples plus
+            solve time, objective before/after local search and unfilled slots
+        """
+        started = time.perf_counter()
+        self.load()
+        self.greedy()
+        initial_objective = self.objective()
+        passes = self.local_search(started + self.time_limit)
+
+        assignments = []
+        unfilled = []
+        for slot, s in enumerate(self.assignment):
+            day = self.index_date(self.slot_day[slot])
+            if s < 0:
+                unfilled.append((day, self.slot_level[slot]))
+            else:
+                assignments.append((day, self.staff_ids[s], self.slot_level[slot]))
+        assignments.sort()
+        unfilled.sort()
+
+        return {
+            "success": True,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "assignments": assignments,
+            "slots": len(self.assignment),
+            "unfilled": unfilled,
+            "initial_objective": round(initial_objective, 4),
+            "objective": round(self.objective(), 4),
+            "passes": passes,
+            "solve_time": round(time.perf_counter() - started, 3),
+            "staff_summary": self.staff_summary(),
+        }
+
+    def conflicts(self, assignments):
+        """
+        Check previewed assignments against the rota as it is now.
+
+        Each one must fill an open slot of its level in the period, for an
+        active staff member of that level who can still work that day given
+        the shifts already in the database and the other assignments.
+
+        Returns:
+            list: The (date, staff_id, seniority_level) tuples that no longer fit
+        """
+        self.load()
+        open_slots = Counter(zip(self.slot_day, self.slot_level))
+        period = range(MARGIN_DAYS, MARGIN_DAYS + self.n_days)
+        conflicts = []
+        for day, staff_id, level in sorted(assignments):
+            s = self.staff_index.get(staff_id)
+            index = self.day_index(day)
+            if (
+                s is None
+                or s not in self.staff_by_level.get(level, ())
+                or index not in period
+                or not open_slots[(index, level)]
+                or not self.can_work(s, index)
+            ):
+                conflicts.append((day, staff_id, level))
+                continue
+            open_slots[(index, level)] -= 1
+            self.busy[s][index] = 1
+        return conflicts
+
+    def staff_summary(self):
+        """Per-staff five-year weekend/BH counts and period workload after solving"""
+        rows = []
+        for level, members in self.staff_by_level.items():
+            for s in members:
+                rows.append(
+                    {
+                        "staff_id": self.staff_ids[s],
+                        "seniority_level": level,
+                        "weekend_shifts": self.weekend[s],
+                        "bank_holiday_shifts": self.bank_holiday[s],
+                        "period_shifts": self.workload[s],
+                    }
+                )
+        return rows
+
+
+def solve_rota(start_date, end_date, apply=False, actor=None, **options):
+    """
+    Solve the rota for a period and optionally write the result.
+
+    Args:
+        start_date (date): First day to fill
+        end_date (date): Last day to fill
+        apply (bool): Write the assignments with bulk_create
+        actor: User recorded in the rota change log
+        **options: Passed to RotaSolver (coverage, max_shifts_per_week,
+            min_rest_days, time_limit)
+
+    Returns:
+        dict: Solver result, with entries_created/shifts_created when applied
+    """
+    try:
+        solver = RotaSolver(start_date, end_date, **options)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    if not apply:
+        return solver.solve()
+
+    with transaction.atomic():
+        result = solver.solve()
+        entries_created, shifts = bulk_create_shifts(result["assignments"], actor=actor)
+        rota_changed(
+            [
+                rota_event(
+                    "refresh",
+                    start_date=start_date.isoformat(),
+                    end_date=end_date.isoformat(),
+                )
+            ]
+        )
+    result["entries_created"] = entries_created
+    result["shifts_created"] = len(shifts)
+    return result
+
+
+def apply_rota_assignments(start_date, end_date, assignments, actor=None, **options):
+    """
+    Write previewed solver assignments, unless the rota has moved under them.
+
+    The assignments are checked and written in one transaction, so what is
+    saved is exactly what was previewed, or nothing.
+
+    Args:
+        start_date (date): First day of the solved period
+        end_date (date): Last day of the solved period
+        assignments (list): (date, staff_id, seniority_level) tuples
+        actor: User recorded in the rota change log
+        **options: Passed to RotaSolver (coverage, max_shifts_per_week,
+            min_rest_days)
+
+    Returns:
+        dict: entries_created/shifts_created, or the conflicting assignments
+    """
+    try:
+        solver = RotaSolver(start_date, end_date, **options)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    with transaction.atomic():
+        conflicts = solver.conflicts(assignments)
+        if conflicts:
+            return {
+                "success": False,
+                "error": (
+                    f"{len(conflicts)} of the proposed shifts no longer fit the rota. "
+                    "Preview again to get a fresh proposal."
+                ),
+                "conflicts": conflicts,
+            }
+        entries_created, shifts = bulk_create_shifts(assignments, actor=actor)
+        rota_changed(
+            [
+                rota_event(
+                    "refresh",
+                    start_date=start_date.isoformat(),
+                    end_date=end_date.isoformat(),
+                )
+            ]
+        )
+    return {
+        "success": True,
+        "assignments": sorted(assignments),
+        "entries_created": entries_created,
+        "shifts_created": len(shifts),
+    }
@@ -0,0 +1,62 @@
+"""
+Shared rota version counter.
+
+Read-heavy rota endpoints keep derived data (lookup indexes, rendered feeds)
+in memory and compare it against this counter instead of querying the
+database on every request. Every code path that writes RotaEntry or
+RotaShift rows must call rota_changed() so those copies are rebuilt;
+OnCallStaff does so itself when a staff code or name shown on the rota
+changes.
+
+The counter lives in the default cache, which production settings point at
+a store shared by every worker process (the database cache by default).
+"""
+
+import secrets
+
+from django.core.cache import cache
+from django.db import transaction
+
+ROTA_VERSION_CACHE_KEY = "records:rota_version"
+
+
+def _new_version():
+    # Versions are only compared for equality. A random value never repeats
+    # one seen before a cache flush, and unlike incr(), which is a read then
+    # a write on the database cache, two concurrent bumps cannot both land
+    # on the same number and leave data cached in between looking current.
+    return secrets.randbits(63)
+
+
+def get_rota_version():
+    """Return the current rota version, seeding it if the cache was cleared"""
+    version = cache.get(ROTA_VERSION_CACHE_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(ROTA_VERSION_CACHE_KEY, version, timeout=None):
+            version = cache.get(ROTA_VERSION_CACHE_KEY, version)
+    return version
+
+
+def bump_rota_version():
+    """Move the rota version on so cached rota data is considered stale"""
+    version = _new_version()
+    cache.set(ROTA_VERSION_CACHE_KEY, version, timeout=None)
+    return version
+
+
+def rota_changed(events=()):
+    """
+    Record a rota write.
+
+    Once the transaction commits any change payloads (see
+    rota_events.rota_event) are published to open calendars and the version is
+    bumped. Events are stored first so that whoever sees the new version can
+    also read the events that explain it.
+    """
+    events = list(events)
+    if events:
+        from .rota_events import publish_rota_events
+
+        transaction.on_commit(lambda: publish_rota_events(events), robust=True)
+    transaction.on_commit(bump_rota_version)
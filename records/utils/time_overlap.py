@@ -0,0 +1,45 @@
+"""
+Overlap checks for time entries on a minute axis.
+
+Entry times are clock times within a block: an entry whose end is not after
+its start runs past midnight. Intervals are compared on a 24-hour clock, so
+23:00-01:00 and 00:30-02:00 overlap even though their raw times do not.
+"""
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def minute_interval(time_started, time_ended):
+    """Return (start, end) minutes, with end past MINUTES_PER_DAY after midnight"""
+    start = time_started.hour * 60 + time_started.minute
+    end = time_ended.hour * 60 + time_ended.minute
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def find_overlaps(intervals):
+    """
+    Find overlapping pairs among (key, start, end) minute intervals.
+
+    Each interval is also placed one day later so that intervals crossing
+    midnight meet the early-morning ones, then a single sort-and-sweep keeps
+    only the intervals still open at each start.
+
+    Returns:
+        list: Sorted (key, other_key) pairs, key < other_key
+    """
+    points = sorted(
+        (start + offset, end + offset, key)
+        for key, start, end in intervals
+        for offset in (0, MINUTES_PER_DAY)
+    )
+    overlaps = set()
+    active = []  # (end, key) of intervals open at the current start
+    for start, end, key in points:
+        active = [(open_end, other) for open_end, other in active if open_end > start]
+        for _, other in active:
+            if other != key:
+                overlaps.add((min(key, other), max(key, other)))
+        active.append((end, key))
+    return sorted(overlaps)
@@ -0,0 +1,202 @@
+"""
+Create a time block with its assignments and time entries in one go.
+
+The whole submission is validated in memory first (task types and work
+modes are loaded once, entry overlaps are checked on a minute axis), then
+written in one transaction with bulk inserts.
+"""
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import (
+    Assignment,
+    BankHoliday,
+    DayType,
+    MonthlySignOff,
+    TaskType,
+    TimeBlock,
+    TimeEntry,
+    WorkMode,
+)
+from .assignment_sync import ensure_entities, new_assignment
+from .time_overlap import find_overlaps, minute_interval
+
+ENTITY_TYPES = {choice for choice, _ in Assignment.ENTITY_TYPES}
+ONCALL_TYPES = {choice for choice, _ in TimeBlock.ONCALL_TYPE_CHOICES}
+
+DAY_TYPE_COLORS = {
+    "Weekday": "success",
+    "Saturday": "warning",
+    "Sunday": "danger",
+    "BankHoliday": "info",
+}
+
+MAX_TIME_ENTRIES = 50
+
+
+def _parse_time(value):
+    return datetime.strptime(value or "", "%H:%M").time()
+
+
+def _day_type_name(day):
+    if BankHoliday.is_bank_holiday(day):
+        return "BankHoliday"
+    if day.weekday() == 5:
+        return "Saturday"
+    if day.weekday() == 6:
+        return "Sunday"
+    return "Weekday"
+
+
+def _clean_block(data, staff, errors):
+    try:
+        day = datetime.strptime(data.get("date") or "", "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        errors["date"] = ["Enter a valid date (YYYY-MM-DD)."]
+        return None
+    if day > timezone.now().date():
+        errors["date"] = ["Block date cannot be in the future."]
+        return None
+    if MonthlySignOff.is_month_signed_off(staff, day.year, day.month):
+        errors["date"] = [f"{day:%B %Y} has been signed off and cannot be modified."]
+        return None
+
+    oncall_type = data.get("oncall_type") or "normal"
+    if oncall_type not in ONCALL_TYPES:
+        errors["oncall_type"] = [f'Invalid on-call type "{oncall_type}".']
+
+    claim = data.get("claim")
+    if claim not in (None, ""):
+        try:
+            claim = Decimal(str(claim))
+            if claim.as_tuple().exponent < -2 or abs(claim) >= 1000:
+                raise InvalidOperation
+        except InvalidOperation:
+            errors["claim"] = ["Enter a claim with at most 3 digits and 2 decimal places."]
+    else:
+        claim = None
+
+    return TimeBlock(staff=staff, date=day, oncall_type=oncall_type, claim=claim)
+
+
+def _clean_assignments(items, errors):
+    assignments = []
+    seen = set()
+    for index, item in enumerate(items):
+        field = f"assignments.{index}"
+        if not isinstance(item, dict):
+            errors[field] = ["Assignment must be an object."]
+            continue
+        entity_type = item.get("type")
+        entity_id = str(item.get("entity_id") or "").strip()
+        if entity_type not in ENTITY_TYPES:
+            errors[field] = [f'Invalid assignment type "{entity_type}".']
+        elif not entity_id or len(entity_id) > 50:
+            errors[field] = ["Entity ID is required (max 50 characters)."]
+        elif (entity_type, entity_id) not in seen:
+            seen.add((entity_type, entity_id))
+            assignments.append((entity_type, entity_id, str(item.get("notes") or "")))
+    return assignments
+
+
+def _clean_time_entries(items, errors):
+    tasks = TaskType.objects.in_bulk()
+    work_modes = WorkMode.objects.in_bulk()
+    entries = []
+    intervals = []
+    for index, item in enumerate(items):
+        field = f"time_entries.{index}"
+        if not isinstance(item, dict):
+            errors[field] = ["Time entry must be an object."]
+            continue
+        try:
+            time_started = _parse_time(item.get("time_started"))
+            time_ended = _parse_time(item.get("time_ended"))
+        except (TypeError, ValueError):
+            errors[field] = ["Enter start and end times as HH:MM."]
+            continue
+        if time_started == time_ended:
+            errors[field] = ["Start time and end time cannot be the same."]
+            continue
+        try:
+            task = tasks[int(item.get("task"))]
+            work_mode = work_modes[int(item.get("work_mode"))]
+        except (KeyError, TypeError, ValueError):
+            errors[field] = ["Select a valid task and work mode."]
+            continue
+        entries.append(
+            TimeEntry(
+                time_started=time_started,
+                time_ended=time_ended,
+                task=task,
+                work_mode=work_mode,
+                details=str(item.get("details") or ""),
+            )
+        )
+        intervals.append((index, *minute_interval(time_started, time_ended)))
+
+    for index, other in find_overlaps(intervals):
+        errors.setdefault(f"time_entries.{other}", []).append(
+            f"Overlaps time entry {index + 1}."
+        )
+    return entries
+
+
+def submit_timeblock(staff, data):
+    """
+    Validate and save a block, its assignments and its time entries.
+
+    Args:
+        staff (OnCallStaff): Owner of the new block
+        data (dict): ``date``, ``oncall_type`` and ``claim`` for the block,
+            plus ``assignments`` (dicts with ``type``, ``entity_id`` and
+            ``notes``) and ``time_entries`` (dicts with ``time_started``,
+            ``time_ended`` as HH:MM, ``task`` and ``work_mode`` ids and
+            ``details``)
+
+    Returns:
+        tuple: (block, errors) where block is the saved TimeBlock, or None
+        with errors mapping field paths such as ``time_entries.2`` to
+        lists of messages
+    """
+    errors = {}
+    assignment_items = data.get("assignments") or []
+    entry_items = data.get("time_entries") or []
+    if not isinstance(assignment_items, list):
+        errors["assignments"] = ["Assignments must be a list."]
+        assignment_items = []
+    if not isinstance(entry_items, list) or len(entry_items) > MAX_TIME_ENTRIES:
+        errors["time_entries"] = [f"Time entries must be a list of at most {MAX_TIME_ENTRIES}."]
+        entry_items = []
+
+    block = _clean_block(data, staff, errors)
+    assignments = _clean_assignments(assignment_items, errors)
+    entries = _clean_time_entries(entry_items, errors)
+    if errors:
+        return None, errors
+
+    day_type_name = _day_type_name(block.date)
+    with transaction.atomic():
+        block.day_type, _ = DayType.objects.get_or_create(
+            name=day_type_name, defaults={"color": DAY_TYPE_COLORS[day_type_name]}
+        )
+        block.refresh_claim([(entry.time_started, entry.time_ended) for entry in entries])
+        block.save()
+
+        # Entities referenced for the first time are created alongside
+        pks = ensure_entities((entity_type, entity_id) for entity_type, entity_id, _ in assignments)
+        Assignment.objects.bulk_create(
+            [
+                new_assignment(block, entity_type, entity_id, pks[(entity_type, entity_id)], notes)
+                for entity_type, entity_id, notes in assignments
+            ]
+        )
+        for entry in entries:
+            entry.timeblock = block
+        TimeEntry.objects.bulk_create(entries)
+
+    return block, {}
@@ -1,8 +1,22 @@
 # Import all view functions to maintain compatibility with existing urls.py
 from .dashboard_views import dashboard, admin_user_dashboard
-from .timeblock_views import add_timeblock, edit_timeblock, delete_timeblock
+from .timeblock_views import (
+    add_timeblock,
+    submit_timeblock,
+    timeblock_detail,
+    timeblock_details,
+    edit_timeblock,
+    delete_timeblock,
+)
+from .entity_views import entity_search, entity_activity
 from .timeentry_views import add_time_entry, edit_time_entry, delete_time_entry
-from .report_views import monthly_report, export_monthly_csv
+from .report_views import (
+    monthly_report,
+    export_monthly_csv,
+    rota_reconciliation,
+    export_rota_reconciliation_csv,
+    recompute_claims,
+)
 from .signoff_views import (
     signoff_management,
     signoff_month,
@@ -12,11 +26,25 @@ from .signoff_views import (
 )
 from .rota_views import (
     rota_calendar,
+    rota_year,
     add_staff_to_rota,
     toggle_shift_type,
     clear_day_staff,
     create_rota_entry,
     remove_staff_from_rota,
+    rota_batch,
+    copy_rota_month_view,
+    shift_staff_rota_view,
+    oncall_now,
+    coverage_gaps,
+    rota_solver,
+    rota_history,
     rota_statistics,
     bank_holiday_detail,
-)
\ No newline at end of file
+)
+from .calendar_feed_views import (
+    staff_calendar_feed,
+    team_calendar_feed,
+    reset_calendar_feed_token,
+)
+from .rota_event_views import rota_events
@@ -0,0 +1,58 @@
+"""iCalendar feed views for subscribing to the rota from calendar apps"""
+
+from django.contrib import messages
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET, require_POST
+
+from ..utils.calendar_feed import get_calendar_feed
+from ..utils.decorators import require_oncall_staff
+
+# Calendar clients poll frequently; let them reuse a copy for a few minutes
+FEED_MAX_AGE = 300
+
+
+def _serve_feed(request, token, scope, filename):
+    feed = get_calendar_feed(token, scope)
+    if feed is None:
+        raise Http404("Unknown calendar feed")
+    etag, body = feed
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if "*" in etags or etag in etags or f"W/{etag}" in etags:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+    response = HttpResponse(body, content_type="text/calendar; charset=utf-8")
+    response["ETag"] = etag
+    response["Cache-Control"] = f"private, max-age={FEED_MAX_AGE}"
+    response["Content-Disposition"] = f'inline; filename="{filename}"'
+    return response
+
+
+@require_GET
+def staff_calendar_feed(request, token):
+    """Token-authenticated .ics feed of one staff member's rota shifts"""
+    return _serve_feed(request, token, "personal", "oncall.ics")
+
+
+@require_GET
+def team_calendar_feed(request, token):
+    """Token-authenticated .ics feed of the whole team's rota"""
+    return _serve_feed(request, token, "team", "oncall-team.ics")
+
+
+@require_POST
+@require_oncall_staff
+def reset_calendar_feed_token(request):
+    """Issue a new feed token for the current user, revoking old subscriptions"""
+    request.staff.reset_calendar_token()
+    messages.success(
+        request,
+        "Your calendar links have been reset. Re-subscribe using the new links.",
+    )
+    return redirect("rota_calendar")
@@ -1,15 +1,18 @@
 """Dashboard views for managing on-call records"""
 
+from datetime import date
+
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 
-from ..models import MonthlySignOff, OnCallStaff, TimeBlock
-from ..utils.date_helpers import (
-    build_month_context,
-    get_month_date_range,
-    get_safe_month_year_from_request,
-)
+from ..models import MonthlySignOff, OnCallStaff
+from ..utils.block_summary import month_block_summary
+from ..utils.date_helpers import build_month_context, get_safe_month_year_from_request
 from ..utils.decorators import require_oncall_staff, require_staff_permission
+from ..utils.rota_coverage import default_scan_range, get_coverage_gaps
+
+# Coverage gaps listed in the dashboard widget; the JSON endpoint has them all
+DASHBOARD_GAP_LIMIT = 10
 
 
 def get_dashboard_url_with_date(date_obj):
@@ -25,28 +28,8 @@ def dashboard(request):
     # Get month/year from GET parameters with validation
     month, year = get_safe_month_year_from_request(request)
 
-    # Calculate date range for selected month
-    current_month_start, next_month_start = get_month_date_range(year, month)
-
-    time_blocks = (
-        TimeBlock.objects.filter(
-            staff=staff, date__gte=current_month_start, date__lt=next_month_start
-        )
-        .prefetch_related(
-            "time_entries__task", "time_entries__work_mode", "assignments"
-        )
-        .order_by("-date")
-    )
-
-    # Add calculated totals to each block
-    for tb in time_blocks:
-        tb.calculated_hours = sum(entry.hours for entry in tb.time_entries.all())
-
-    # Calculate totals
-    total_hours = sum(
-        sum(entry.hours for entry in tb.time_entries.all()) for tb in time_blocks
-    )
-    total_claims = sum(tb.claim for tb in time_blocks if tb.claim)
+    # Blocks with their hours and time span, and the month's totals
+    summary = month_block_summary(staff, year, month)
 
     # Build month context using utility function
     month_context = build_month_context(month, year)
@@ -54,12 +37,23 @@ def dashboard(request):
     # Check if the current month is signed off
     month_signoff = MonthlySignOff.get_signoff_for_month(staff, year, month)
 
+    # Upcoming rota gaps, for staff who manage the rota
+    coverage = None
+    if request.user.is_staff:
+        coverage = get_coverage_gaps(*default_scan_range())
+        coverage = {
+            **coverage,
+            "gaps": [
+                {**gap, "date": date.fromisoformat(gap["date"])}
+                for gap in coverage["gaps"][:DASHBOARD_GAP_LIMIT]
+            ],
+        }
+
     # Combine with view-specific context
     context = {
         "staff": staff,
-        "time_blocks": time_blocks,
-        "total_hours": total_hours,
-        "total_claims": total_claims,
+        "coverage": coverage,
+        **summary,
         "month_signoff": month_signoff,
         "is_month_signed_off": month_signoff is not None,
         **month_context,  # Merge month navigation context
@@ -76,35 +70,15 @@ def admin_user_dashboard(request, user_id):
     # Get month/year from GET parameters with validation
     month, year = get_safe_month_year_from_request(request)
 
-    # Calculate date range for selected month
-    current_month_start, next_month_start = get_month_date_range(year, month)
-
-    time_blocks = (
-        TimeBlock.objects.filter(
-            staff=staff, date__gte=current_month_start, date__lt=next_month_start
-        )
-        .prefetch_related("time_entries__task", "time_entries__work_mode")
-        .order_by("-date")
-    )
-
-    # Add calculated totals to each block
-    for tb in time_blocks:
-        tb.calculated_hours = sum(entry.hours for entry in tb.time_entries.all())
-
-    # Calculate totals
-    total_hours = sum(
-        sum(entry.hours for entry in tb.time_entries.all()) for tb in time_blocks
-    )
-    total_claims = sum(tb.claim for tb in time_blocks if tb.claim)
+    # Blocks with their hours and time span, and the month's totals
+    summary = month_block_summary(staff, year, month)
 
     # Build month context using utility function
     month_context = build_month_context(month, year)
 
     context = {
         "staff": staff,
-        "time_blocks": time_blocks,
-        "total_hours": total_hours,
-        "total_claims": total_claims,
+        **summary,
         "is_admin_view": True,
         **month_context,  # Merge month navigation context
     }
@@ -0,0 +1,95 @@
+"""Donor, recipient and lab task lookup views"""
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.views.decorators.http import require_GET
+
+from ..models import Assignment
+from ..utils.decorators import require_oncall_staff, require_staff_permission
+from ..utils.entity_activity import entity_activity as get_entity_activity, parse_cursor
+from ..utils.entity_search import ENTITY_MODELS, MAX_QUERY_LENGTH, search_entities
+
+
+@require_GET
+@require_oncall_staff
+def entity_search(request):
+    """AJAX endpoint for assignment autocomplete: ?type=donor&q=<prefix>"""
+    entity_type = request.GET.get("type", "")
+    prefix = request.GET.get("q", "").strip()
+
+    if entity_type not in ENTITY_MODELS:
+        return JsonResponse({"error": "Invalid entity type"}, status=400)
+    if not prefix or len(prefix) > MAX_QUERY_LENGTH:
+        return JsonResponse({"results": []})
+
+    return JsonResponse({"results": search_entities(entity_type, prefix)})
+
+
+@require_GET
+@require_staff_permission
+def entity_activity(request, entity_type, entity_id):
+    """
+    Every block a donor, recipient or lab task was assigned to, newest
+    first, with the block's time entries. Older pages follow ?before=<cursor>;
+    returns JSON with ?format=json.
+    """
+    if entity_type not in ENTITY_MODELS:
+        raise Http404("Unknown entity type")
+    model, id_field, label_field = ENTITY_MODELS[entity_type]
+    entity = get_object_or_404(model, **{id_field: entity_id})
+    as_json = request.GET.get("format") == "json"
+
+    before = None
+    if request.GET.get("before"):
+        try:
+            before = parse_cursor(request.GET["before"])
+        except ValueError:
+            if as_json:
+                return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    activity = get_entity_activity(entity_type, entity_id, before=before)
+
+    if as_json:
+        return JsonResponse(
+            {
+                "entity": {
+                    "type": entity_type,
+                    "id": entity_id,
+                    "label": getattr(entity, label_field),
+                },
+                "blocks": [
+                    {
+                        "id": block.id,
+                        "date": block.date.isoformat(),
+                        "staff": block.staff.assignment_id,
+                        "day_type": block.day_type.name if block.day_type else None,
+                        "oncall_type": block.oncall_type,
+                        "notes": block.assignment.notes,
+                        "time_entries": [
+                            {
+                                "id": entry.id,
+                                "time_started": entry.time_started.strftime("%H:%M"),
+                                "time_ended": entry.time_ended.strftime("%H:%M"),
+                                "hours": entry.hours,
+                                "task": entry.task.name,
+                                "work_mode": entry.work_mode.name,
+                                "details": entry.details,
+                            }
+                            for entry in block.entries
+                        ],
+                    }
+                    for block in activity["blocks"]
+                ],
+                "next_cursor": activity["next_cursor"],
+            }
+        )
+
+    context = {
+        "entity": entity,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "entity_type_label": dict(Assignment.ENTITY_TYPES)[entity_type],
+        "is_first_page": before is None,
+        **activity,
+    }
+    return render(request, "records/entity_activity.html", context)
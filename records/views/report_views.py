@@ -1,18 +1,29 @@
 """Monthly report views for on-call records"""
 
 import csv
+from datetime import timedelta
 
+from django.contrib import messages
 from django.http import HttpResponse
-from django.shortcuts import render
+from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.utils import timezone
 
-from ..models import OnCallStaff, TimeBlock
+from ..models import MonthlyReportSignOff, OnCallStaff, TimeBlock
+from ..utils.claim_recompute import recompute_month_claims
 from ..utils.date_helpers import (
     build_month_context,
     get_month_date_range,
     get_safe_month_year_from_request,
 )
 from ..utils.decorators import require_staff_permission
+from ..utils.rota_reconciliation import (
+    MISMATCH_LABELS,
+    NO_ROTA_SHIFT,
+    NO_TIMEBLOCK,
+    reconcile_rota,
+    write_reconciliation_csv,
+)
 
 
 @require_staff_permission
@@ -226,4 +237,72 @@ def export_monthly_csv(request):
             ]
         )
 
-    return response
\ No newline at end of file
+    return response
+
+
+@require_staff_permission
+def rota_reconciliation(request):
+    """List rota'd staff with no time recorded, and time recorded off the rota"""
+    month, year = get_safe_month_year_from_request(request)
+    month_start, next_month_start = get_month_date_range(year, month)
+
+    mismatches = [
+        {
+            "date": day,
+            "assignment_id": assignment_id,
+            "name": name,
+            "mismatch": mismatch,
+            "label": MISMATCH_LABELS[mismatch],
+        }
+        for day, _, assignment_id, name, mismatch in reconcile_rota(
+            month_start, next_month_start - timedelta(days=1)
+        )
+    ]
+
+    context = {
+        "mismatches": mismatches,
+        "no_timeblock_count": sum(1 for m in mismatches if m["mismatch"] == NO_TIMEBLOCK),
+        "no_rota_shift_count": sum(1 for m in mismatches if m["mismatch"] == NO_ROTA_SHIFT),
+        **build_month_context(month, year),
+    }
+    return render(request, "records/rota_reconciliation.html", context)
+
+
+@require_staff_permission
+def export_rota_reconciliation_csv(request):
+    """Export the rota reconciliation for a month as CSV"""
+    month, year = get_safe_month_year_from_request(request)
+    month_start, next_month_start = get_month_date_range(year, month)
+
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = (
+        f'attachment; filename="rota_reconciliation_{month_start.strftime("%Y_%m")}.csv"'
+    )
+    write_reconciliation_csv(
+        response, reconcile_rota(month_start, next_month_start - timedelta(days=1))
+    )
+    return response
+
+
+@require_staff_permission
+def recompute_claims(request):
+    """Show block claims that differ from the claim rules, and apply them on POST"""
+    month, year = get_safe_month_year_from_request(request)
+    if MonthlyReportSignOff.is_report_signed_off(year, month):
+        messages.error(request, f"The report for {month}/{year} is signed off.")
+        return redirect(f"{reverse('monthly_report')}?month={month}&year={year}")
+
+    if request.method == "POST":
+        result = recompute_month_claims(year, month, apply=True)
+        messages.success(
+            request, f"Recalculated {len(result['changes'])} block claim(s)."
+        )
+        return redirect(f"{reverse('monthly_report')}?month={month}&year={year}")
+
+    result = recompute_month_claims(year, month)
+    context = {
+        "changes": result["changes"],
+        "blocks_checked": result["blocks_checked"],
+        **build_month_context(month, year),
+    }
+    return render(request, "records/recompute_claims.html", context)
@@ -0,0 +1,78 @@
+"""Server-sent event stream of rota changes for open calendar pages"""
+
+import asyncio
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from ..models import OnCallStaff
+from ..utils.rota_events import broadcaster, events_after, latest_event_id
+
+# Comment lines keep idle connections open through proxies
+KEEPALIVE_INTERVAL = 15
+
+# Milliseconds the browser waits before reconnecting a dropped stream
+RECONNECT_DELAY = 3000
+
+
+def _format_event(event_id, payload):
+    return f"id: {event_id}\nevent: rota\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _event_stream(last_event_id):
+    queue = broadcaster.subscribe()
+    try:
+        yield f"retry: {RECONNECT_DELAY}\n\n"
+
+        # Catch up on changes made since the page was rendered or the stream dropped
+        replayed = set()
+        for event_id, payload in await events_after(last_event_id):
+            replayed.add(event_id)
+            yield _format_event(event_id, payload)
+
+        while True:
+            try:
+                events = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            for event_id, payload in events:
+                if event_id > last_event_id and event_id not in replayed:
+                    yield _format_event(event_id, payload)
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+@require_GET
+async def rota_events(request):
+    """
+    Stream rota change events (text/event-stream) to the rota calendar.
+
+    Needs an ASGI server; under WSGI an open stream would tie up a worker,
+    so the endpoint answers 204 and the browser stops retrying.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    if not await OnCallStaff.objects.filter(user=user).aexists():
+        return JsonResponse({"error": "Not registered as on-call staff"}, status=403)
+
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get(
+        "last_event_id"
+    )
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = await latest_event_id()
+
+    response = StreamingHttpResponse(
+        _event_stream(last_event_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
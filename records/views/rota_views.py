@@ -5,23 +5,67 @@ import json
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 
-from django.db.models import Count, Q
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, render
-from django.views.decorators.http import require_POST
-
-from ..models import BankHoliday, OnCallStaff, RotaEntry, RotaShift
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, Max, Q, Value, When
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET, require_POST
+
+from ..models import (
+    BankHoliday,
+    OnCallStaff,
+    RotaChange,
+    RotaEntry,
+    RotaEvent,
+    RotaShift,
+)
 from ..utils.date_helpers import (
     build_rota_month_context,
     get_month_date_range,
     get_safe_month_year_from_request,
 )
-from ..utils.decorators import require_oncall_staff, require_staff_permission
+from ..utils.decorators import (
+    require_oncall_staff,
+    require_rota_api_access,
+    require_staff_permission,
+)
+from ..utils.oncall_now import oncall_response_body
+from ..utils.rota_coverage import (
+    MAX_SCAN_DAYS,
+    default_scan_range,
+    get_coverage_gaps,
+)
+from ..utils.rota_batch import MAX_BATCH_OPERATIONS, apply_rota_operations
+from ..utils.rota_bulk import copy_rota_month, shift_staff_rota
+from ..utils.rota_concurrency import (
+    CONFLICT_ERROR,
+    claim_rota_entry,
+    parse_expected_version,
+    rota_day_states,
+)
+from ..utils.rota_events import rota_event
+from ..utils.rota_history import log_rota_changes, rota_change, shift_type_change
+from ..utils.rota_index import rota_index
+from ..utils.rota_overview import get_month_grids
+from ..utils.rota_solver import (
+    DEFAULT_COVERAGE,
+    SENIORITY_LEVELS,
+    apply_rota_assignments,
+    solve_rota,
+)
+from ..utils.rota_version import rota_changed
 
 
 @require_oncall_staff
 def rota_calendar(request):
     """Display monthly rota calendar"""
+    # Live updates replay everything after this id, so read it before the rota
+    last_rota_event_id = RotaEvent.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+
     # Get month/year from GET parameters with validation
     month, year = get_safe_month_year_from_request(request)
 
@@ -95,20 +139,73 @@ def rota_calendar(request):
         if staff.seniority_level in staff_by_seniority:
             staff_by_seniority[staff.seniority_level].append(staff)
 
+    # Subscription links for the user's calendar app
+    calendar_token = request.staff.get_calendar_token()
+    calendar_feed_urls = {
+        "personal": request.build_absolute_uri(
+            reverse("staff_calendar_feed", args=[calendar_token])
+        ),
+        "team": request.build_absolute_uri(
+            reverse("team_calendar_feed", args=[calendar_token])
+        ),
+    }
+
     context = {
         "calendar_weeks": calendar_weeks,
         "all_staff": all_staff,
         "staff_by_seniority": staff_by_seniority,
+        "calendar_feed_urls": calendar_feed_urls,
+        "last_rota_event_id": last_rota_event_id,
         **month_context,
     }
 
     return render(request, "records/rota_calendar.html", context)
 
 
+@require_oncall_staff
+def rota_year(request):
+    """Display a year, or one quarter of it, as compact month grids"""
+    today = timezone.now().date()
+    try:
+        year = int(request.GET.get("year", today.year))
+        quarter = int(request.GET.get("quarter", 0))
+    except ValueError:
+        year, quarter = today.year, 0
+    if not 2000 <= year <= 2100:
+        year = today.year
+    if not 0 <= quarter <= 4:
+        quarter = 0
+
+    months = range(quarter * 3 - 2, quarter * 3 + 1) if quarter else range(1, 13)
+    context = {
+        "year": year,
+        "quarter": quarter,
+        "quarters": range(1, 5),
+        "prev_year": year - 1,
+        "next_year": year + 1,
+        "month_grids": get_month_grids([(year, month) for month in months]),
+    }
+    return render(request, "records/rota_year.html", context)
+
+
+def _conflict_response(day):
+    """409 carrying the day's current state so the client can redraw it"""
+    body = {"success": False, "error": CONFLICT_ERROR, "conflict": True}
+    if day is not None:
+        body["current"] = rota_day_states([day])[day]
+    return JsonResponse(body, status=409)
+
+
 @require_POST
 @require_oncall_staff
 def add_staff_to_rota(request):
-    """AJAX endpoint to add staff to a specific rota day and seniority level"""
+    """
+    AJAX endpoint to add staff to a specific rota day and seniority level.
+
+    Clients send the day's ``version`` (0 for a day without an entry) and
+    ``rota_entry_id``; if the day changed since then nothing is written and
+    the response is a 409 with the current state.
+    """
     try:
         data = json.loads(request.body)
         date_str = data.get("date")
@@ -120,48 +217,78 @@ def add_staff_to_rota(request):
 
         # Parse date
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+        version, rota_entry_id = parse_expected_version(data)
+
+        # Get staff object (user is needed for the response)
+        staff = OnCallStaff.objects.select_related("user").filter(id=staff_id).first()
+        if staff is None:
+            return JsonResponse({"error": "Staff not found"}, status=404)
+
+        with transaction.atomic():
+            entries = RotaEntry.objects.filter(date=date_obj)
+            if rota_entry_id:
+                entries = entries.filter(id=rota_entry_id)
+
+            # Check and bump the day's version in one statement
+            if claim_rota_entry(entries, version):
+                # Read back the bumped version and the shift type for the response
+                rota_entry = entries.only("id", "shift_type", "version").get()
+            elif version:
+                return _conflict_response(date_obj)
+            else:
+                # Fails on the unique date if someone else created the day first
+                rota_entry = RotaEntry.objects.create(date=date_obj, shift_type="normal")
 
-        # Get staff object
-        staff = get_object_or_404(OnCallStaff, id=staff_id)
-
-        # Get or create rota entry for this date
-        rota_entry, created = RotaEntry.objects.get_or_create(
-            date=date_obj, defaults={"shift_type": "normal"}
-        )
-
-        # Check if staff already has a shift for this date and seniority level
-        existing_shift = RotaShift.objects.filter(
-            rota_entry=rota_entry, staff=staff, seniority_level=seniority_level
-        ).first()
-
-        if existing_shift:
-            return JsonResponse(
-                {"error": "Staff already assigned to this level on this date"},
-                status=400,
+            # The (rota_entry, staff) unique constraint rejects duplicates
+            try:
+                with transaction.atomic():
+                    shift = RotaShift.objects.create(
+                        rota_entry=rota_entry,
+                        staff=staff,
+                        seniority_level=seniority_level,
+                    )
+            except IntegrityError:
+                transaction.set_rollback(True)
+                return JsonResponse(
+                    {"error": "Staff already assigned on this date"}, status=400
+                )
+
+            # Return updated data for DOM update
+            shift_data = {
+                "id": shift.id,
+                "staff_id": staff.assignment_id,
+                "staff_name": staff.user.get_full_name(),
+                "staff_color": staff.color,
+                "seniority_level": seniority_level,
+                "notes": shift.notes or "",
+            }
+            log_rota_changes(
+                request.user, [rota_change(date_obj, RotaChange.ADD_STAFF, staff.id)]
+            )
+            rota_changed(
+                [
+                    rota_event(
+                        "add_staff",
+                        date_obj,
+                        shift=shift_data,
+                        shift_type=rota_entry.shift_type,
+                        version=rota_entry.version,
+                    )
+                ]
             )
 
-        # Create new shift
-        shift = RotaShift.objects.create(
-            rota_entry=rota_entry, staff=staff, seniority_level=seniority_level
-        )
-
-        # Return updated data for DOM update
         return JsonResponse(
             {
                 "success": True,
-                "shift": {
-                    "id": shift.id,
-                    "staff_id": staff.assignment_id,
-                    "staff_name": staff.user.get_full_name(),
-                    "staff_color": staff.color,
-                    "seniority_level": seniority_level,
-                    "notes": shift.notes or "",
-                },
+                "shift": shift_data,
                 "rota_entry_id": rota_entry.id,
                 "shift_type": rota_entry.shift_type,
+                "version": rota_entry.version,
             }
         )
 
+    except IntegrityError:
+        return _conflict_response(date_obj)
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON data"}, status=400)
     except Exception as e:
@@ -171,7 +298,12 @@ def add_staff_to_rota(request):
 @require_POST
 @require_oncall_staff
 def toggle_shift_type(request):
-    """AJAX endpoint to toggle shift type between normal and NHSP"""
+    """
+    AJAX endpoint to toggle shift type between normal and NHSP.
+
+    A versioned request also sends the ``shift_type`` it is toggling from, so
+    the new value is set by a single conditional UPDATE with no read back.
+    """
     try:
         data = json.loads(request.body)
         date_str = data.get("date")
@@ -181,28 +313,75 @@ def toggle_shift_type(request):
 
         # Parse date
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-        # Get or create rota entry for this date
-        rota_entry, created = RotaEntry.objects.get_or_create(
-            date=date_obj, defaults={"shift_type": "normal"}
-        )
-
-        # Toggle shift type (handle NULL values by treating them as 'normal')
-        current_type = rota_entry.shift_type or "normal"
-        if current_type == "normal":
-            rota_entry.shift_type = "nhsp"
-        else:
-            rota_entry.shift_type = "normal"
-        rota_entry.save()
+        version, rota_entry_id = parse_expected_version(data)
+        current_type = data.get("shift_type")
+
+        with transaction.atomic():
+            entries = RotaEntry.objects.filter(date=date_obj)
+            if rota_entry_id:
+                entries = entries.filter(id=rota_entry_id)
+
+            if version and current_type in ("normal", "nhsp"):
+                new_type = "normal" if current_type == "nhsp" else "nhsp"
+                if not claim_rota_entry(entries, version, shift_type=new_type):
+                    return _conflict_response(date_obj)
+                rota_entry = RotaEntry(
+                    id=rota_entry_id, date=date_obj, shift_type=new_type, version=version + 1
+                )
+            elif version:
+                # Flip whatever is stored, as long as the day is unchanged
+                if not claim_rota_entry(
+                    entries,
+                    version,
+                    shift_type=Case(
+                        When(shift_type="nhsp", then=Value("normal")),
+                        default=Value("nhsp"),
+                    ),
+                ):
+                    return _conflict_response(date_obj)
+                rota_entry = RotaEntry.objects.only("id", "shift_type", "version").get(
+                    date=date_obj
+                )
+            # Flip the type in the database (NULL values are treated as 'normal')
+            elif version is None and claim_rota_entry(
+                entries,
+                shift_type=Case(
+                    When(shift_type="nhsp", then=Value("normal")),
+                    default=Value("nhsp"),
+                ),
+            ):
+                rota_entry = RotaEntry.objects.only("id", "shift_type", "version").get(
+                    date=date_obj
+                )
+            else:
+                # No rota entry yet - a new day toggles from 'normal' to NHSP
+                rota_entry = RotaEntry.objects.create(date=date_obj, shift_type="nhsp")
+            log_rota_changes(
+                request.user, [shift_type_change(date_obj, rota_entry.shift_type)]
+            )
+            rota_changed(
+                [
+                    rota_event(
+                        "toggle_shift_type",
+                        date_obj,
+                        shift_type=rota_entry.shift_type,
+                        version=rota_entry.version,
+                    )
+                ]
+            )
 
         return JsonResponse(
             {
                 "success": True,
                 "shift_type": rota_entry.shift_type,
                 "rota_entry_id": rota_entry.id,
+                "version": rota_entry.version,
             }
         )
 
+    except IntegrityError:
+        # The day was created by someone else in the meantime
+        return _conflict_response(date_obj)
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON data"}, status=400)
     except Exception as e:
@@ -225,37 +404,73 @@ def clear_day_staff(request):
 
         # Parse date
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-        # Get rota entry for this date
-        try:
-            rota_entry = RotaEntry.objects.get(date=date_obj)
-        except RotaEntry.DoesNotExist:
-            return JsonResponse(
-                {"error": "No rota entry found for this date"}, status=404
+        version, rota_entry_id = parse_expected_version(data)
+
+        with transaction.atomic():
+            entries = RotaEntry.objects.filter(date=date_obj)
+            if rota_entry_id:
+                entries = entries.filter(id=rota_entry_id)
+
+            # Bumping the version first stops concurrent edits to the day
+            if not claim_rota_entry(entries, version):
+                if version:
+                    return _conflict_response(date_obj)
+                return JsonResponse(
+                    {"error": "No rota entry found for this date"}, status=404
+                )
+
+            day_rows = list(
+                RotaEntry.objects.filter(date=date_obj).values_list(
+                    "id",
+                    "version",
+                    "shifts__id",
+                    "shifts__seniority_level",
+                    "shifts__staff_id",
+                )
+            )
+            rota_entry_id, new_version = day_rows[0][:2]
+            shift_ids = [row[2] for row in day_rows if row[2]]
+            cleared = [
+                (shift_id, staff_id)
+                for _, _, shift_id, level, staff_id in day_rows
+                if shift_id and (not seniority_level or level == seniority_level)
+            ]
+            cleared_ids = [shift_id for shift_id, _ in cleared]
+
+            if len(cleared_ids) == len(shift_ids):
+                # Nothing left on this day, so remove the rota entry as well
+                _, deleted_by_model = RotaEntry(id=rota_entry_id).delete()
+                deleted_count = deleted_by_model.get(RotaShift._meta.label, 0)
+                rota_entry_id = None
+                new_version = 0
+            else:
+                deleted_count, _ = RotaShift.objects.filter(
+                    id__in=cleared_ids
+                ).delete()
+            log_rota_changes(
+                request.user,
+                [
+                    rota_change(date_obj, RotaChange.REMOVE_STAFF, staff_id)
+                    for _, staff_id in cleared
+                ],
+            )
+            rota_changed(
+                [
+                    rota_event(
+                        "clear_day",
+                        date_obj,
+                        seniority_level=seniority_level,
+                        version=new_version,
+                    )
+                ]
             )
-
-        # Delete shifts
-        shifts_query = RotaShift.objects.filter(rota_entry=rota_entry)
-
-        # If specific seniority level provided, filter by it
-        if seniority_level:
-            shifts_query = shifts_query.filter(seniority_level=seniority_level)
-
-        deleted_count = shifts_query.count()
-        shifts_query.delete()
-
-        # If all shifts are deleted, optionally delete the rota entry
-        if not rota_entry.shifts.exists():
-            rota_entry.delete()
-            rota_entry_id = None
-        else:
-            rota_entry_id = rota_entry.id
 
         return JsonResponse(
             {
                 "success": True,
                 "deleted_count": deleted_count,
                 "rota_entry_id": rota_entry_id,
+                "version": new_version,
             }
         )
 
@@ -283,6 +498,20 @@ def create_rota_entry(request):
         rota_entry, created = RotaEntry.objects.get_or_create(
             date=date_obj, defaults={"shift_type": "normal"}
         )
+        if created:
+            log_rota_changes(
+                request.user, [rota_change(date_obj, RotaChange.CREATE_ENTRY)]
+            )
+            rota_changed(
+                [
+                    rota_event(
+                        "create_entry",
+                        date_obj,
+                        shift_type=rota_entry.shift_type,
+                        version=rota_entry.version,
+                    )
+                ]
+            )
 
         return JsonResponse(
             {
@@ -290,6 +519,7 @@ def create_rota_entry(request):
                 "shift_type": rota_entry.shift_type,
                 "rota_entry_id": rota_entry.id,
                 "created": created,
+                "version": rota_entry.version,
             }
         )
 
@@ -310,26 +540,95 @@ def remove_staff_from_rota(request):
         if not shift_id:
             return JsonResponse({"error": "Shift ID is required"}, status=400)
 
-        # Get the shift
-        shift = get_object_or_404(RotaShift, id=shift_id)
-        rota_entry = shift.rota_entry
+        version, rota_entry_id = parse_expected_version(data)
+        date_str = data.get("date")
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else None
+
+        with transaction.atomic():
+            # Bump the version of the day holding the shift (and check it)
+            entries = RotaEntry.objects.filter(shifts__id=shift_id)
+            if rota_entry_id:
+                entries = entries.filter(id=rota_entry_id)
+            if not claim_rota_entry(entries, version):
+                if version:
+                    return _conflict_response(date_obj)
+                return JsonResponse({"error": "Shift not found"}, status=404)
+
+            # The shift and its siblings on the same day in one query
+            day_shifts = list(
+                RotaShift.objects.filter(rota_entry__shifts__id=shift_id).values_list(
+                    "id",
+                    "rota_entry_id",
+                    "rota_entry__date",
+                    "rota_entry__version",
+                    "staff_id",
+                )
+            )
+            _, rota_entry_id, rota_date, new_version, _ = day_shifts[0]
+            staff_id = next(row[4] for row in day_shifts if row[0] == int(shift_id))
+            remaining_shifts = len(day_shifts) - 1
+
+            if remaining_shifts == 0:
+                # Last shift for this day - deleting the entry cascades to it
+                RotaEntry(id=rota_entry_id).delete()
+                new_version = 0
+            else:
+                RotaShift.objects.filter(id=shift_id).delete()
+            log_rota_changes(
+                request.user, [rota_change(rota_date, RotaChange.REMOVE_STAFF, staff_id)]
+            )
+            rota_changed(
+                [
+                    rota_event(
+                        "remove_staff",
+                        rota_date,
+                        shift_id=int(shift_id),
+                        version=new_version,
+                    )
+                ]
+            )
 
-        # Delete the shift
-        shift.delete()
+        return JsonResponse(
+            {
+                "success": True,
+                "remaining_shifts": remaining_shifts,
+                "rota_entry_deleted": remaining_shifts == 0,
+                "version": new_version,
+            }
+        )
 
-        # Check if this was the last shift for this rota entry
-        remaining_shifts = RotaShift.objects.filter(rota_entry=rota_entry).count()
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
 
-        response_data = {"success": True, "remaining_shifts": remaining_shifts}
 
-        # If no shifts remain, optionally delete the rota entry
-        if remaining_shifts == 0:
-            rota_entry.delete()
-            response_data["rota_entry_deleted"] = True
-        else:
-            response_data["rota_entry_deleted"] = False
+@require_POST
+@require_oncall_staff
+def rota_batch(request):
+    """AJAX endpoint to apply a queue of rota edits in one transaction"""
+    try:
+        data = json.loads(request.body)
+        operations = data.get("operations")
+
+        if not isinstance(operations, list) or not operations:
+            return JsonResponse({"error": "Operations are required"}, status=400)
+
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return JsonResponse(
+                {"error": f"Too many operations (max {MAX_BATCH_OPERATIONS})"},
+                status=400,
+            )
 
-        return JsonResponse(response_data)
+        success, results = apply_rota_operations(operations, actor=request.user)
+
+        if success:
+            status = 200
+        elif any(result.get("conflict") for result in results):
+            status = 409
+        else:
+            status = 400
+        return JsonResponse({"success": success, "results": results}, status=status)
 
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON data"}, status=400)
@@ -337,6 +636,151 @@ def remove_staff_from_rota(request):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+def _bulk_response(result):
+    """200 for a bulk rota operation, 409 when it hit rota conflicts, else 400"""
+    if result["success"]:
+        status = 200
+    elif result.get("conflicts"):
+        status = 409
+    else:
+        status = 400
+    return JsonResponse(result, status=status)
+
+
+@require_POST
+@require_staff_permission
+def copy_rota_month_view(request):
+    """
+    API endpoint to copy a month's rota onto another month, aligned by weekday.
+
+    Expects JSON with ``source_month`` and ``target_month`` (YYYY-MM) and an
+    optional ``replace`` flag to clear the target month first.
+    """
+    try:
+        data = json.loads(request.body)
+        source_month = datetime.strptime(data.get("source_month") or "", "%Y-%m").date()
+        target_month = datetime.strptime(data.get("target_month") or "", "%Y-%m").date()
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except ValueError:
+        return JsonResponse({"error": "Invalid month format, expected YYYY-MM"}, status=400)
+
+    return _bulk_response(
+        copy_rota_month(
+            source_month,
+            target_month,
+            replace=bool(data.get("replace")),
+            actor=request.user,
+        )
+    )
+
+
+@require_POST
+@require_staff_permission
+def shift_staff_rota_view(request):
+    """
+    API endpoint to move a staff member's shifts by a number of days.
+
+    Expects JSON with ``staff_id`` (assignment id), ``days`` and
+    ``start_date``, plus an optional ``end_date`` (YYYY-MM-DD).
+    """
+    try:
+        data = json.loads(request.body)
+        days = int(data.get("days") or 0)
+        start_date = datetime.strptime(data.get("start_date") or "", "%Y-%m-%d").date()
+        end_date = (
+            datetime.strptime(data["end_date"], "%Y-%m-%d").date()
+            if data.get("end_date")
+            else None
+        )
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except (ValueError, TypeError):
+        return JsonResponse(
+            {"error": "Expected whole days and dates as YYYY-MM-DD"}, status=400
+        )
+
+    staff = OnCallStaff.objects.filter(assignment_id=data.get("staff_id")).first()
+    if staff is None:
+        return JsonResponse({"success": False, "error": "Staff not found"}, status=404)
+
+    return _bulk_response(
+        shift_staff_rota(staff, days, start_date, end_date, actor=request.user)
+    )
+
+
+def _parse_timestamp(value):
+    """Parse an ISO 8601 or Unix timestamp into an aware datetime (or None)"""
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.get_current_timezone())
+    except (ValueError, OverflowError, OSError):
+        pass
+    try:
+        # An unencoded '+' in the UTC offset arrives as a space
+        moment = parse_datetime(value) or parse_datetime(
+            value[:11] + value[11:].replace(" ", "+")
+        )
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@require_GET
+@require_rota_api_access
+def oncall_now(request):
+    """
+    API endpoint returning who is on call now, or at ?at=<ISO 8601 timestamp>.
+
+    Served from the in-memory on-call index, so warm requests do not query
+    the database.
+    """
+    at_str = request.GET.get("at")
+    if at_str:
+        moment = _parse_timestamp(at_str)
+        if moment is None:
+            return JsonResponse(
+                {"error": "Invalid timestamp, expected ISO 8601 or Unix time"},
+                status=400,
+            )
+    else:
+        moment = timezone.now()
+
+    version, body = oncall_response_body(moment)
+    response = HttpResponse(body, content_type="application/json")
+    response["X-Rota-Version"] = str(version)
+    return response
+
+
+@require_GET
+@require_rota_api_access
+def coverage_gaps(request):
+    """
+    API endpoint listing rota days short of the coverage rules.
+
+    Scans the rest of this month and the next six unless ?start= and ?end=
+    (YYYY-MM-DD) are given.
+    """
+    start_date, end_date = default_scan_range()
+    try:
+        if request.GET.get("start"):
+            start_date = datetime.strptime(request.GET["start"], "%Y-%m-%d").date()
+        if request.GET.get("end"):
+            end_date = datetime.strptime(request.GET["end"], "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({"error": "Invalid date format, expected YYYY-MM-DD"}, status=400)
+
+    if end_date < start_date:
+        return JsonResponse({"error": "End date must be on or after start date"}, status=400)
+    if (end_date - start_date).days >= MAX_SCAN_DAYS:
+        return JsonResponse(
+            {"error": f"Date range cannot exceed {MAX_SCAN_DAYS} days"}, status=400
+        )
+
+    return JsonResponse(get_coverage_gaps(start_date, end_date))
+
+
 @require_staff_permission
 def rota_statistics(request):
     """Display comprehensive rota statistics by period and day type"""
@@ -346,128 +790,70 @@ def rota_statistics(request):
     quarter = request.GET.get('quarter', '1')
     month = request.GET.get('month', '1')
     
-    # Build date filter based on period
-    date_filters = {}
+    # Build the date range for the period
     period_label = ""
     
     if period_type == 'monthly':
         month = int(month)
-        date_filters['rota_entry__date__year'] = year
-        date_filters['rota_entry__date__month'] = month
+        start_date, next_start = get_month_date_range(year, month)
         period_label = f"{calendar.month_name[month]} {year}"
         
     elif period_type == 'quarterly':
         quarter = int(quarter)
-        quarter_months = {
-            1: [1, 2, 3],
-            2: [4, 5, 6], 
-            3: [7, 8, 9],
-            4: [10, 11, 12]
-        }
-        date_filters['rota_entry__date__year'] = year
-        date_filters['rota_entry__date__month__in'] = quarter_months[quarter]
+        start_date = date(year, 3 * quarter - 2, 1)
+        _, next_start = get_month_date_range(year, 3 * quarter)
         period_label = f"Q{quarter} {year}"
         
     else:  # yearly
-        date_filters['rota_entry__date__year'] = year
+        start_date, next_start = date(year, 1, 1), date(year + 1, 1, 1)
         period_label = f"Year {year}"
 
-    # Get all rota shifts for the period with related data
-    shifts = (
-        RotaShift.objects
-        .filter(**date_filters)
-        .select_related('staff__user', 'rota_entry')
-        .order_by('rota_entry__date')
+    # Shifts for the period from the in-memory rota index
+    shifts = rota_index.shifts(start_date, next_start - timedelta(days=1))
+    day_types_by_staff = shifts.count_by_staff('day_type')
+    shift_types_by_staff = shifts.count_by_staff('shift_type')
+    levels_by_staff = shifts.count_by_staff('level')
+    staff_by_id = OnCallStaff.objects.select_related('user').in_bulk(
+        list(day_types_by_staff)
     )
-    
-    # Get all unique staff who worked during this period
-    staff_stats = defaultdict(lambda: {
-        'staff': None,
-        'total_shifts': 0,
-        'weekday_shifts': 0,
-        'saturday_shifts': 0,
-        'sunday_shifts': 0,
-        'bank_holiday_shifts': 0,
-        'normal_shifts': 0,
-        'nhsp_shifts': 0,
-        'seniority_breakdown': {'trainee': 0, 'oncall': 0, 'senior': 0}
-    })
-    
+
+    staff_stats = {}
+    for staff_id, day_types in day_types_by_staff.items():
+        shift_types = shift_types_by_staff[staff_id]
+        staff_stats[staff_id] = {
+            'staff': staff_by_id.get(staff_id),
+            'total_shifts': sum(day_types.values()),
+            'weekday_shifts': day_types['Weekday'],
+            'saturday_shifts': day_types['Saturday'],
+            'sunday_shifts': day_types['Sunday'],
+            'bank_holiday_shifts': day_types['BankHoliday'],
+            'normal_shifts': shift_types['normal'],
+            'nhsp_shifts': shift_types['nhsp'],
+            'seniority_breakdown': levels_by_staff[staff_id],
+        }
+
+    # Day type breakdown
+    day_type_stats = shifts.count_by('day_type')
+    shift_type_stats = shifts.count_by('shift_type')
+    seniority_stats = shifts.count_by('level')
+
     # Overall statistics
     overall_stats = {
-        'total_shifts': 0,
-        'total_days_covered': 0,
-        'weekday_shifts': 0,
-        'saturday_shifts': 0,
-        'sunday_shifts': 0,
-        'bank_holiday_shifts': 0,
-        'normal_shifts': 0,
-        'nhsp_shifts': 0,
-        'staff_count': 0
+        'total_shifts': len(shifts),
+        'total_days_covered': shifts.days_covered(),
+        'weekday_shifts': day_type_stats['Weekday'],
+        'saturday_shifts': day_type_stats['Saturday'],
+        'sunday_shifts': day_type_stats['Sunday'],
+        'bank_holiday_shifts': day_type_stats['BankHoliday'],
+        'normal_shifts': shift_type_stats['normal'],
+        'nhsp_shifts': shift_type_stats['nhsp'],
+        'staff_count': len(staff_stats)
     }
     
-    # Day type breakdown
-    day_type_stats = defaultdict(int)
-    shift_type_stats = defaultdict(int)
-    seniority_stats = defaultdict(int)
-    
-    # Track unique dates to count days covered
-    unique_dates = set()
-    
-    # Process each shift
-    for shift in shifts:
-        staff_id = shift.staff.id
-        rota_entry = shift.rota_entry
-        
-        # Initialize staff record if first time seeing them
-        if staff_stats[staff_id]['staff'] is None:
-            staff_stats[staff_id]['staff'] = shift.staff
-        
-        # Track unique dates
-        unique_dates.add(rota_entry.date)
-        
-        # Determine day type
-        day_type = rota_entry.day_type  # Uses the property from model
-        
-        # Update staff statistics
-        staff_stats[staff_id]['total_shifts'] += 1
-        staff_stats[staff_id]['seniority_breakdown'][shift.seniority_level] += 1
-        
-        if day_type == 'Weekday':
-            staff_stats[staff_id]['weekday_shifts'] += 1
-        elif day_type == 'Saturday':
-            staff_stats[staff_id]['saturday_shifts'] += 1
-        elif day_type == 'Sunday':
-            staff_stats[staff_id]['sunday_shifts'] += 1
-        elif day_type == 'BankHoliday':
-            staff_stats[staff_id]['bank_holiday_shifts'] += 1
-            
-        if rota_entry.shift_type == 'nhsp':
-            staff_stats[staff_id]['nhsp_shifts'] += 1
-        else:
-            staff_stats[staff_id]['normal_shifts'] += 1
-            
-        # Update overall statistics
-        overall_stats['total_shifts'] += 1
-        day_type_stats[day_type] += 1
-        shift_type_stats[rota_entry.shift_type] += 1
-        seniority_stats[shift.seniority_level] += 1
-
-    # Finalize overall stats
-    overall_stats['total_days_covered'] = len(unique_dates)
-    overall_stats['weekday_shifts'] = day_type_stats['Weekday']
-    overall_stats['saturday_shifts'] = day_type_stats['Saturday']
-    overall_stats['sunday_shifts'] = day_type_stats['Sunday']
-    overall_stats['bank_holiday_shifts'] = day_type_stats['BankHoliday']
-    overall_stats['normal_shifts'] = shift_type_stats.get('normal', 0)
-    overall_stats['nhsp_shifts'] = shift_type_stats.get('nhsp', 0)
-    overall_stats['staff_count'] = len(staff_stats)
-    
-    # Convert staff_stats to sorted list
+    # Convert staff_stats to sorted list (staff deleted since are left out)
     staff_list = sorted(
-        staff_stats.values(), 
-        key=lambda x: x['total_shifts'], 
-        reverse=True
+        (stats for stats in staff_stats.values() if stats['staff'] is not None),
+        key=lambda x: (-x['total_shifts'], x['staff'].assignment_id),
     )
     
     # Create separate lists for each seniority level (only if they have data)
@@ -775,4 +1161,126 @@ def bank_holiday_detail(request):
         'summary_important_types': sorted_important_types,
     }
     
-    return render(request, 'records/bank_holiday_detail.html', context)
\ No newline at end of file
+    return render(request, 'records/bank_holiday_detail.html', context)
+
+
+@require_oncall_staff
+def rota_history(request):
+    """Display the audit log of rota changes for a month"""
+    month, year = get_safe_month_year_from_request(request)
+    month_start, next_month_start = get_month_date_range(year, month)
+
+    # Rows store the day as an ordinal, so a month is a plain integer range
+    changes = (
+        RotaChange.objects.filter(
+            day__gte=month_start.toordinal(), day__lt=next_month_start.toordinal()
+        )
+        .select_related("staff__user", "actor")
+        .order_by("-id")
+    )
+
+    context = {
+        "changes": changes,
+        **build_rota_month_context(month, year),
+    }
+    return render(request, "records/rota_history.html", context)
+
+
+@require_staff_permission
+def rota_solver(request):
+    """Fill empty rota days for a period, balancing weekend and bank holiday duty"""
+    today = date.today()
+    next_month_start, _ = get_month_date_range(
+        today.year + (today.month == 12), today.month % 12 + 1
+    )
+    _, following_month_start = get_month_date_range(
+        next_month_start.year, next_month_start.month
+    )
+
+    params = request.POST if request.method == "POST" else request.GET
+    form_values = {
+        "start_date": params.get("start_date", next_month_start.isoformat()),
+        "end_date": params.get(
+            "end_date", (following_month_start - timedelta(days=1)).isoformat()
+        ),
+        "max_shifts_per_week": params.get("max_shifts_per_week", "2"),
+        "min_rest_days": params.get("min_rest_days", "1"),
+        "coverage": {
+            level: params.get(f"coverage_{level}", str(DEFAULT_COVERAGE[level]))
+            for level in SENIORITY_LEVELS
+        },
+    }
+
+    result = None
+    applied = False
+
+    if request.method == "POST":
+        try:
+            start_date = datetime.strptime(form_values["start_date"], "%Y-%m-%d").date()
+            end_date = datetime.strptime(form_values["end_date"], "%Y-%m-%d").date()
+            options = {
+                "max_shifts_per_week": int(form_values["max_shifts_per_week"]),
+                "min_rest_days": int(form_values["min_rest_days"]),
+                "coverage": {
+                    level: int(value) for level, value in form_values["coverage"].items()
+                },
+            }
+        except ValueError:
+            messages.error(request, "Please enter valid dates and numbers.")
+        else:
+            if (end_date - start_date).days > 366:
+                messages.error(request, "The solver can fill at most one year at a time.")
+            else:
+                applied = request.POST.get("action") == "apply"
+                if applied:
+                    # Save exactly what was previewed rather than solving again
+                    try:
+                        assignments = [
+                            (
+                                datetime.strptime(day, "%Y-%m-%d").date(),
+                                int(staff_id),
+                                level,
+                            )
+                            for day, staff_id, level in (
+                                value.split(":") for value in request.POST.getlist("assignment")
+                            )
+                        ]
+                    except ValueError:
+                        result = {"success": False, "error": "Invalid proposed shifts."}
+                    else:
+                        result = apply_rota_assignments(
+                            start_date, end_date, assignments, actor=request.user, **options
+                        )
+                else:
+                    result = solve_rota(start_date, end_date, **options)
+                if not result["success"]:
+                    messages.error(request, result["error"])
+                    result = None
+                    applied = False
+                elif applied:
+                    messages.success(
+                        request,
+                        f"Added {result['shifts_created']} shifts to the rota "
+                        f"({result['entries_created']} new days).",
+                    )
+
+    context = {"form_values": form_values, "result": result, "applied": applied}
+
+    if result:
+        staff_lookup = OnCallStaff.objects.select_related("user").in_bulk(
+            [row["staff_id"] for row in result.get("staff_summary", [])]
+            + [staff_id for _, staff_id, _ in result["assignments"]]
+        )
+        for row in result.get("staff_summary", []):
+            row["staff"] = staff_lookup.get(row["staff_id"])
+
+        # One row per day with the proposed staff for each level
+        days = defaultdict(lambda: {level: [] for level in SENIORITY_LEVELS})
+        for day, staff_id, level in result["assignments"]:
+            days[day][level].append(staff_lookup.get(staff_id))
+        context["proposed_days"] = [
+            {"date": day, "levels": [days[day][level] for level in SENIORITY_LEVELS]}
+            for day in sorted(days)
+        ]
+
+    return render(request, "records/rota_solver.html", context)
@@ -17,6 +17,7 @@ from ..utils.date_helpers import (
     get_safe_month_year_from_request,
 )
 from ..utils.decorators import require_staff_permission
+from ..utils.overlap_scan import scan_month_overlaps
 
 
 @require_staff_permission
@@ -29,6 +30,9 @@ def signoff_management(request):
     # Calculate date range for selected month
     current_month_start, next_month_start = get_month_date_range(year, month)
 
+    # Overlapping entries for everyone this month, found in one query
+    overlaps = scan_month_overlaps(year, month)
+
     # Get all staff and their sign-off status for the selected month
     staff_signoff_status = []
 
@@ -57,6 +61,7 @@ def signoff_management(request):
                     "total_claims": total_claims,
                     "is_signed_off": signoff is not None,
                     "signoff": signoff,
+                    "overlaps": overlaps.get(staff.id, []),
                 }
             )
 
@@ -65,6 +70,7 @@ def signoff_management(request):
 
     context = {
         "staff_signoff_status": staff_signoff_status,
+        "overlap_count": sum(len(found) for found in overlaps.values()),
         "selected_month": current_month_start,
         **month_context,
     }
@@ -142,6 +148,7 @@ def signoff_month(request, staff_id, year, month):
         "time_blocks_count": time_blocks.count(),
         "total_hours": total_hours,
         "total_claims": total_claims,
+        "overlaps": scan_month_overlaps(year, month, staff=staff).get(staff.id, []),
     }
     return render(request, "records/signoff_confirm.html", context)
 
@@ -1,17 +1,28 @@
 """TimeBlock management views"""
 
+import json
+
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Prefetch
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET, require_POST
 
 from ..forms import TimeBlockEditForm, TimeBlockForm
-from ..models import TimeBlock
+from ..models import TaskType, TimeBlock, TimeEntry, WorkMode
 from ..utils.decorators import (
     check_month_not_signed_off,
     check_timeblock_not_signed_off,
     require_oncall_staff,
 )
+from ..utils.timeblock_submission import submit_timeblock as save_submission
 from .dashboard_views import get_dashboard_url_with_date
 
+# Most blocks whose details can be fetched in one request
+MAX_DETAIL_BLOCKS = 100
+
 
 @require_oncall_staff
 @check_timeblock_not_signed_off
@@ -32,7 +43,150 @@ def add_timeblock(request):
     else:
         form = TimeBlockForm()
 
-    return render(request, "records/add_timeblock.html", {"form": form})
+    return render(
+        request,
+        "records/add_timeblock.html",
+        {
+            "form": form,
+            "tasks": TaskType.objects.order_by("name"),
+            "work_modes": WorkMode.objects.order_by("name"),
+        },
+    )
+
+
+@require_POST
+@require_oncall_staff
+def submit_timeblock(request):
+    """AJAX endpoint to create a block with its assignments and time entries"""
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid JSON data"}, status=400)
+
+        time_block, errors = save_submission(request.staff, data)
+        if errors:
+            return JsonResponse({"success": False, "errors": errors}, status=400)
+
+        return JsonResponse(
+            {
+                "success": True,
+                "block_id": time_block.id,
+                "date": time_block.date.isoformat(),
+                "time_entries": len(data.get("time_entries") or []),
+                "redirect_url": get_dashboard_url_with_date(time_block.date),
+            },
+            status=201,
+        )
+
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
+def _visible_blocks(user):
+    """Staff users can see any block; others only their own"""
+    blocks = TimeBlock.objects.select_related("staff")
+    if not user.is_staff:
+        blocks = blocks.filter(staff__user=user)
+    return blocks
+
+
+def _detail_context(request, time_block, entries):
+    return {
+        "tblock": time_block,
+        "entries": entries,
+        "is_admin_view": time_block.staff.user_id != request.user.id,
+    }
+
+
+@require_GET
+@login_required
+def timeblock_detail(request, block_id):
+    """
+    Time entries and assignments of one block, fetched when it is expanded
+    on a dashboard. Returns an HTML fragment, or JSON with ?format=json.
+    """
+    time_block = get_object_or_404(_visible_blocks(request.user), id=block_id)
+    entries = list(
+        TimeEntry.objects.filter(timeblock=time_block)
+        .select_related("task", "work_mode")
+        .order_by("id")
+    )
+    for entry in entries:
+        entry.timeblock = time_block
+
+    if request.GET.get("format") == "json":
+        return JsonResponse(
+            {
+                "block_id": time_block.id,
+                "time_entries": [
+                    {
+                        "id": entry.id,
+                        "time_started": entry.time_started.strftime("%H:%M"),
+                        "time_ended": entry.time_ended.strftime("%H:%M"),
+                        "hours": entry.hours,
+                        "task": entry.task.name,
+                        "work_mode": entry.work_mode.name,
+                        "details": entry.details,
+                    }
+                    for entry in entries
+                ],
+                "assignments": [
+                    {
+                        "type": assignment.entity_type,
+                        "entity_id": assignment.entity_id,
+                        "notes": assignment.notes,
+                    }
+                    for assignment in time_block.assignments.all()
+                ],
+            }
+        )
+
+    return render(
+        request,
+        "records/partials/timeblock_entries.html",
+        _detail_context(request, time_block, entries),
+    )
+
+
+@require_GET
+@login_required
+def timeblock_details(request):
+    """
+    Time entry fragments for several blocks at once (``?ids=1,2,3``), used by
+    "Expand all" on a dashboard. Returns JSON mapping block id to the same
+    HTML the single block endpoint renders; blocks the user cannot see are
+    left out.
+    """
+    try:
+        block_ids = {int(block_id) for block_id in request.GET.get("ids", "").split(",") if block_id}
+    except ValueError:
+        return JsonResponse({"error": "Invalid block IDs"}, status=400)
+    if not block_ids or len(block_ids) > MAX_DETAIL_BLOCKS:
+        return JsonResponse(
+            {"error": f"Between 1 and {MAX_DETAIL_BLOCKS} block IDs are required"},
+            status=400,
+        )
+
+    blocks = _visible_blocks(request.user).filter(id__in=block_ids).prefetch_related(
+        Prefetch(
+            "time_entries",
+            queryset=TimeEntry.objects.select_related("task", "work_mode").order_by("id"),
+        )
+    )
+    return JsonResponse(
+        {
+            "blocks": {
+                time_block.id: render_to_string(
+                    "records/partials/timeblock_entries.html",
+                    _detail_context(request, time_block, time_block.time_entries.all()),
+                    request=request,
+                )
+                for time_block in blocks
+            }
+        }
+    )
 
 
 @require_oncall_staff
@@ -17,7 +17,8 @@ def add_time_entry(request, block_id):
     time_block = get_object_or_404(TimeBlock, id=block_id, staff=staff)
 
     if request.method == "POST":
-        form = TimeEntryForm(request.POST)
+        # Bind the block up front so validation can check its other entries
+        form = TimeEntryForm(request.POST, instance=TimeEntry(timeblock=time_block))
         if form.is_valid():
             time_entry = form.save(commit=False)
             time_entry.timeblock = time_block
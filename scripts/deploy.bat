@@ -111,6 +111,12 @@ if %errorlevel% neq 0 (
     pause
     exit /b 1
 )
+uv run python manage.py createcachetable --settings=config.settings.prod
+if %errorlevel% neq 0 (
+    echo ❌ Failed to create the cache table
+    pause
+    exit /b 1
+)
 
 REM Create superuser (optional)
 echo.
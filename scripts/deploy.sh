@@ -24,6 +24,7 @@ uv run python manage.py collectstatic --noinput --settings=config.settings.prod
 # Run migrations
 echo "💾 Running database migrations..."
 uv run python manage.py migrate --settings=config.settings.prod
+uv run python manage.py createcachetable --settings=config.settings.prod
 
 # Create superuser (optional)
 echo "👤 Create superuser? (y/n)"
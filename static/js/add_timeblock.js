@@ -1,6 +1,8 @@
 /**
  * Add Time Block JavaScript
- * Uses AssignmentManager utility for assignment management functionality
+ * Uses AssignmentManager utility for assignment management functionality.
+ * The block, its assignments and its time entries are posted together to
+ * the block submission endpoint.
  */
 
 // Global assignment manager instance
@@ -8,17 +10,141 @@ let assignmentManager;
 
 document.addEventListener('DOMContentLoaded', function() {
     console.log('DOM ready - initializing assignment management');
-    
+
     // Initialize AssignmentManager
     assignmentManager = new AssignmentManager({
         enableLogging: false  // Disable debug logging
     });
-    
+
     // Make globally accessible for onclick handlers
     window.assignmentManager = assignmentManager;
-    
+
     // Initialize the manager
     assignmentManager.init();
-    
+
     console.log('Assignment management initialized');
+
+    initializeTimeEntries();
+    initializeSubmission();
 });
+
+/**
+ * Time entry rows
+ */
+function initializeTimeEntries() {
+    const addBtn = document.getElementById('add-time-entry-btn');
+    const list = document.getElementById('time-entries-list');
+    if (!addBtn || !list) return;
+
+    addBtn.addEventListener('click', addTimeEntryRow);
+    list.addEventListener('click', function(e) {
+        const removeBtn = e.target.closest('.remove-time-entry-btn');
+        if (removeBtn) {
+            removeBtn.closest('.time-entry-row').remove();
+            updateNoTimeEntries();
+        }
+    });
+}
+
+function addTimeEntryRow() {
+    const template = document.getElementById('time-entry-template');
+    const list = document.getElementById('time-entries-list');
+    list.appendChild(template.content.cloneNode(true));
+    updateNoTimeEntries();
+}
+
+function updateNoTimeEntries() {
+    const rows = document.querySelectorAll('#time-entries-list .time-entry-row');
+    document.getElementById('no-time-entries').style.display = rows.length ? 'none' : 'block';
+}
+
+function collectTimeEntries() {
+    return Array.from(document.querySelectorAll('#time-entries-list .time-entry-row')).map(row => {
+        const entry = {};
+        row.querySelectorAll('[data-field]').forEach(input => {
+            entry[input.dataset.field] = input.value;
+        });
+        return entry;
+    });
+}
+
+/**
+ * Submission
+ */
+function initializeSubmission() {
+    const form = document.getElementById('add-timeblock-form');
+    if (!form) return;
+
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+        clearErrors();
+
+        const checkedType = form.querySelector('input[name="oncall_type"]:checked');
+        const payload = {
+            date: form.querySelector('[name="date"]').value,
+            oncall_type: checkedType ? checkedType.value : 'normal',
+            assignments: assignmentManager.assignments.map(a => ({
+                type: a.type,
+                entity_id: a.entity_id,
+                notes: a.notes
+            })),
+            time_entries: collectTimeEntries()
+        };
+
+        const submitBtn = form.querySelector('button[type="submit"]');
+        submitBtn.disabled = true;
+        try {
+            const response = await fetch(form.dataset.submitUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': form.querySelector('[name="csrfmiddlewaretoken"]').value
+                },
+                body: JSON.stringify(payload)
+            });
+            const data = await response.json();
+
+            if (response.ok && data.success) {
+                window.location.href = data.redirect_url;
+                return;
+            }
+            showErrors(data.errors || {'': [data.error || 'Unknown server error']});
+        } catch (error) {
+            showErrors({'': ['Error saving block: ' + error.message]});
+        }
+        submitBtn.disabled = false;
+    });
+}
+
+function clearErrors() {
+    const summary = document.getElementById('submission-errors');
+    summary.style.display = 'none';
+    summary.textContent = '';
+    document.querySelectorAll('.time-entry-errors').forEach(el => el.textContent = '');
+}
+
+function showErrors(errors) {
+    // Time entry errors are shown on their row, everything else in the summary
+    const rows = document.querySelectorAll('#time-entries-list .time-entry-row');
+    const summary = document.getElementById('submission-errors');
+    const messages = [];
+
+    Object.entries(errors).forEach(([field, fieldErrors]) => {
+        const match = field.match(/^time_entries\.(\d+)$/);
+        if (match && rows[match[1]]) {
+            rows[match[1]].querySelector('.time-entry-errors').textContent = fieldErrors.join(' ');
+        } else {
+            const label = field ? field.replace('_', ' ').replace('.', ' ') + ': ' : '';
+            messages.push(label + fieldErrors.join(' '));
+        }
+    });
+
+    if (messages.length) {
+        messages.forEach(message => {
+            const line = document.createElement('div');
+            line.textContent = message;
+            summary.appendChild(line);
+        });
+        summary.style.display = 'block';
+    }
+}
@@ -4,7 +4,7 @@
  */
 
 class RotaCalendar {
-    constructor(availableStaff, csrfToken, staffBySeniority = null) {
+    constructor(availableStaff, csrfToken, staffBySeniority = null, lastEventId = 0) {
         this.availableStaff = availableStaff;
         this.staffBySeniority = staffBySeniority || this.groupStaffBySeniority(availableStaff);
         this.csrfToken = csrfToken;
@@ -13,6 +13,17 @@ class RotaCalendar {
         this.currentSeniorityName = null;
         this.dateContextMenu = document.getElementById('dateContextMenu');
         this.staffContextMenu = document.getElementById('staffContextMenu');
+
+        // Edits are queued and sent to the server together in one batch
+        this.pendingOperations = [];
+        this.flushTimer = null;
+        this.flushDelay = 300;
+        // Batches are sent one at a time so each carries the day versions the last one produced
+        this.inFlight = Promise.resolve();
+
+        // Live updates resume after the newest change included in the page
+        this.lastEventId = lastEventId;
+        this.eventSource = null;
         
         this.init();
     }
@@ -45,6 +56,89 @@ class RotaCalendar {
         
         // Attach delete functionality to existing staff entries
         this.attachStaffDeleteHandlers();
+
+        // Follow edits made by other users
+        this.connectLiveUpdates();
+    }
+
+    connectLiveUpdates() {
+        if (!window.EventSource) return;
+
+        // The browser reconnects by itself and resumes from the last event it saw
+        this.eventSource = new EventSource(`/rota/events/?last_event_id=${this.lastEventId}`);
+        this.eventSource.addEventListener('rota', (e) => {
+            try {
+                this.applyRemoteChange(JSON.parse(e.data));
+            } catch (error) {
+                console.error('Error applying rota change:', error);
+            }
+        });
+    }
+
+    applyRemoteChange(change) {
+        // Changes are applied idempotently, so our own edits echoed back are harmless
+        if (change.op === 'refresh') {
+            this.showRefreshNotice(change);
+            return;
+        }
+
+        const dayCell = document.querySelector(`.rota-day[data-date="${change.date}"]`);
+        if (!dayCell) return; // Not in the month on screen
+
+        switch (change.op) {
+            case 'add_staff':
+                this.createRotaStructure(dayCell);
+                this.updateDayDOM(dayCell, change);
+                break;
+            case 'remove_staff': {
+                const staffSpan = dayCell.querySelector(`.staff-entry[data-shift-id="${change.shift_id}"]`);
+                if (staffSpan) {
+                    this.removeStaffSpan(dayCell, staffSpan);
+                }
+                break;
+            }
+            case 'create_entry':
+            case 'toggle_shift_type':
+                dayCell.dataset.shiftType = change.shift_type;
+                this.createRotaStructure(dayCell);
+                this.updateNHSPBadge(dayCell, change.shift_type);
+                break;
+            case 'clear_day':
+                if (change.seniority_level) {
+                    dayCell.querySelectorAll(`.rota-row[data-seniority="${change.seniority_level}"] .staff-entry`)
+                        .forEach(staffSpan => this.removeStaffSpan(dayCell, staffSpan));
+                } else {
+                    this.clearDayDOM(dayCell);
+                }
+                break;
+        }
+
+        if (change.version !== undefined) {
+            dayCell.dataset.version = change.version;
+        }
+    }
+
+    showRefreshNotice(change) {
+        // Bulk changes (patterns, solver, admin) are not replayed; offer a reload instead
+        const dates = [...document.querySelectorAll('.rota-day[data-date]')]
+            .map(cell => cell.dataset.date)
+            .filter(Boolean)
+            .sort();
+        if (dates.length && change.start_date && change.end_date &&
+            (change.end_date < dates[0] || change.start_date > dates[dates.length - 1])) {
+            return;
+        }
+
+        if (document.getElementById('rotaRefreshNotice')) return;
+        const notice = document.createElement('div');
+        notice.id = 'rotaRefreshNotice';
+        notice.className = 'alert alert-info d-flex justify-content-between align-items-center';
+        notice.innerHTML = `
+            <span><i class="bi bi-arrow-repeat"></i> The rota has been updated elsewhere.</span>
+            <a href="" class="btn btn-sm btn-primary">Reload</a>
+        `;
+        const calendarCard = document.querySelector('.rota-day').closest('.card');
+        calendarCard.parentNode.insertBefore(notice, calendarCard);
     }
 
     initTooltips() {
@@ -169,6 +263,11 @@ class RotaCalendar {
                 this.staffContextMenu.style.display = 'none';
             }
         });
+
+        // Send any queued edits before the page goes away
+        window.addEventListener('pagehide', () => {
+            this.flushOperations(true);
+        });
     }
 
     attachStaffDeleteHandlers() {
@@ -308,60 +407,123 @@ class RotaCalendar {
             alert('Please select a seniority level first');
             return;
         }
-        
-        // Check if this is an empty day that needs a RotaEntry created first
-        const isEmpty = !this.currentDay.dataset.rotaEntryId || this.currentDay.dataset.rotaEntryId === '';
-        
-        if (isEmpty) {
-            // This should only happen if user directly clicked a staff member without going through seniority selection
-            console.log('Empty day detected in addStaffToDay, creating RotaEntry first');
-            try {
-                await this.createRotaEntry();
-                await this.performStaffAddition(staff);
-            } catch (error) {
-                console.error('Error in staff addition process:', error);
-                alert('An error occurred while adding staff');
-            }
-        } else {
-            console.log('RotaEntry already exists, adding staff directly');
-            await this.performStaffAddition(staff);
-        }
-        
+
+        // Keep a reference to the day - the user may move on before the batch is flushed
+        const dayCell = this.currentDay;
         this.staffContextMenu.style.display = 'none';
+
+        try {
+            // The server creates the RotaEntry for empty days as part of the same batch
+            const data = await this.queueOperation({
+                op: 'add_staff',
+                date: dayCell.dataset.date,
+                staff_id: staff.id,
+                seniority_level: this.currentSeniorityLevel
+            }, dayCell);
+
+            this.createRotaStructure(dayCell);
+            this.updateDayDOM(dayCell, data);
+        } catch (error) {
+            console.error('Error in staff addition process:', error);
+            alert('Error: ' + error.message);
+        }
     }
 
-    async createRotaEntry() {
-        const rotaCreationData = {
-            date: this.currentDay.dataset.date
-        };
+    queueOperation(operation, dayCell) {
+        // Queue a rota edit; edits made in quick succession are sent together in one batch
+        return new Promise((resolve, reject) => {
+            this.pendingOperations.push({ operation, dayCell, resolve, reject });
 
-        const response = await fetch('/rota/create-entry/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': this.csrfToken
-            },
-            body: JSON.stringify(rotaCreationData)
+            clearTimeout(this.flushTimer);
+            this.flushTimer = setTimeout(() => this.flushOperations(), this.flushDelay);
         });
+    }
 
-        const data = await response.json();
+    async flushOperations(keepalive = false) {
+        clearTimeout(this.flushTimer);
+        this.flushTimer = null;
 
-        if (data.success) {
-            console.log('RotaEntry created:', data.rota_entry_id);
-            // Update the day's attributes
-            this.currentDay.dataset.rotaEntryId = data.rota_entry_id;
-            this.currentDay.dataset.shiftType = data.shift_type;
-            
-            // Create DOM structure
-            this.createRotaStructure();
-        } else {
-            throw new Error('Error creating rota entry: ' + data.error);
+        const queued = this.pendingOperations;
+        this.pendingOperations = [];
+        if (queued.length === 0) return;
+
+        this.inFlight = this.inFlight.then(() => this.sendBatch(queued, keepalive));
+        return this.inFlight;
+    }
+
+    async sendBatch(queued, keepalive) {
+        // Each edit carries the version of its day as shown; the server rejects stale ones
+        queued.forEach(item => {
+            item.operation.version = parseInt(item.dayCell.dataset.version || '0', 10);
+            item.operation.rota_entry_id = item.dayCell.dataset.rotaEntryId || null;
+        });
+
+        try {
+            const response = await fetch('/rota/batch/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': this.csrfToken
+                },
+                body: JSON.stringify({
+                    operations: queued.map(item => item.operation)
+                }),
+                keepalive: keepalive
+            });
+
+            const data = await response.json();
+            const results = data.results || [];
+
+            // Resolve each queued edit with its own result
+            queued.forEach((item, index) => {
+                const result = results[index];
+                if (data.success && result && result.success) {
+                    this.updateDayVersion(item.dayCell, result);
+                    item.resolve(result);
+                } else if (result && result.conflict) {
+                    // Someone else changed the day - show what is there now
+                    if (result.current) {
+                        this.renderDayState(item.dayCell, result.current);
+                    }
+                    item.reject(new Error(result.error + '. The day has been refreshed, please try again.'));
+                } else {
+                    const message = (result && result.error) || data.error || 'Unknown server error';
+                    item.reject(new Error(message));
+                }
+            });
+        } catch (error) {
+            queued.forEach(item => item.reject(error));
         }
     }
 
-    createRotaStructure() {
+    updateDayVersion(dayCell, result) {
+        // Applied before the next batch is stamped, so queued edits are never stale
+        if (result.version !== undefined) {
+            dayCell.dataset.version = result.version;
+        }
+        if ('rota_entry_id' in result) {
+            dayCell.dataset.rotaEntryId = result.rota_entry_id || '';
+        } else if (result.rota_entry_deleted) {
+            dayCell.dataset.rotaEntryId = '';
+        }
+    }
+
+    renderDayState(dayCell, state) {
+        // Redraw a day from the server's current state
+        this.clearDayDOM(dayCell);
+        if (state.rota_entry_id) {
+            this.createRotaStructure(dayCell);
+            state.shifts.forEach(shift => this.updateDayDOM(dayCell, { shift, shift_type: state.shift_type }));
+            dayCell.dataset.rotaEntryId = state.rota_entry_id;
+            dayCell.dataset.shiftType = state.shift_type;
+            this.updateNHSPBadge(dayCell, state.shift_type);
+        }
+        dayCell.dataset.version = state.version;
+    }
+
+    createRotaStructure(dayCell = this.currentDay) {
         // Check if we already have a structured day with content area
-        const existingContentArea = this.currentDay.querySelector('.px-1.pb-1');
+        const existingContentArea = dayCell.querySelector('.px-1.pb-1');
         if (existingContentArea) {
             // Remove "No rota" indicator from the middle row
             const oncallRow = existingContentArea.querySelector('.rota-row[data-seniority="oncall"]');
@@ -378,15 +540,15 @@ class RotaCalendar {
         
         // If we don't have the expected structure, this might be a completely empty day
         // In that case, we need to create the full day structure including header
-        const hasHeader = this.currentDay.querySelector('.d-flex.justify-content-between');
+        const hasHeader = dayCell.querySelector('.d-flex.justify-content-between');
         if (!hasHeader) {
             // Create the complete day structure for empty days
-            this.currentDay.innerHTML = `
+            dayCell.innerHTML = `
                 <div class="position-relative h-100">
                     <!-- Date header with proper spacing for date and badges -->
                     <div class="d-flex justify-content-between align-items-start p-1">
                         <span class="fw-bold" style="font-size: 0.9rem;">
-                            ${this.currentDay.dataset.date.split('-')[2]}
+                            ${dayCell.dataset.date.split('-')[2]}
                         </span>
                         <div class="d-flex flex-wrap gap-1">
                         </div>
@@ -407,123 +569,46 @@ class RotaCalendar {
         }
     }
 
-    async performStaffAddition(staff) {
-        console.log('Performing staff addition for:', staff);
-        const formData = {
-            date: this.currentDay.dataset.date,
-            staff_id: staff.id,
-            seniority_level: this.currentSeniorityLevel
-        };
-
-        const response = await fetch('/rota/add-staff/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': this.csrfToken
-            },
-            body: JSON.stringify(formData)
-        });
-
-        const data = await response.json();
-
-        if (data.success) {
-            console.log('Staff addition response:', data);
-            // Update the DOM with the new staff member
-            this.updateDayDOM(data);
-            console.log('Staff added successfully and DOM updated');
-        } else {
-            throw new Error('Error: ' + data.error);
-        }
-    }
-
     async toggleShiftType() {
-        const formData = {
-            date: this.currentDay.dataset.date
-        };
+        const dayCell = this.currentDay;
+        this.dateContextMenu.style.display = 'none';
 
         try {
-            const response = await fetch('/rota/toggle-shift-type/', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.csrfToken
-                },
-                body: JSON.stringify(formData)
-            });
-
-            const data = await response.json();
-
-            if (data.success) {
-                // Update the day's shift type
-                this.currentDay.dataset.shiftType = data.shift_type;
-                this.currentDay.dataset.rotaEntryId = data.rota_entry_id;
-                
-                // If this was an empty day, create the rota structure
-                this.createRotaStructure();
-                
-                // Update NHSP badge visibility
-                this.updateNHSPBadge(this.currentDay, data.shift_type);
-                console.log('Shift type toggled successfully');
-            } else {
-                alert('Error: ' + data.error);
-            }
+            const data = await this.queueOperation({
+                op: 'toggle_shift_type',
+                date: dayCell.dataset.date
+            }, dayCell);
+
+            // Update the day's shift type
+            dayCell.dataset.shiftType = data.shift_type;
+            dayCell.dataset.rotaEntryId = data.rota_entry_id;
+            
+            // If this was an empty day, create the rota structure
+            this.createRotaStructure(dayCell);
+            
+            // Update NHSP badge visibility
+            this.updateNHSPBadge(dayCell, data.shift_type);
+            console.log('Shift type toggled successfully');
         } catch (error) {
             console.error('Error toggling shift type:', error);
-            alert('An error occurred while toggling shift type');
+            alert('Error: ' + error.message);
         }
-        
-        this.dateContextMenu.style.display = 'none';
     }
 
     async removeStaffFromRota(shiftId, staffSpan) {
         if (confirm('Are you sure you want to remove this staff member from the rota?')) {
-            try {
-                const response = await fetch('/rota/remove-staff/', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'X-CSRFToken': this.csrfToken
-                    },
-                    body: JSON.stringify({
-                        shift_id: shiftId
-                    })
-                });
-
-                if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
-                }
+            // Get the day cell up front - a live update may remove the span first
+            const dayCell = staffSpan.closest('.rota-day');
 
-                const data = await response.json();
-
-                if (data.success) {
-                    // Get the day cell before removing the staff span
-                    const dayCell = staffSpan.closest('.rota-day');
-                    
-                    // Remove the staff span from DOM
-                    staffSpan.remove();
-                    
-                    // Check if this was the last staff member in the day
-                    const remainingStaffSpans = dayCell.querySelectorAll('.staff-entry');
-                    
-                    if (remainingStaffSpans.length === 0) {
-                        // No staff left, show empty day indicator
-                        this.clearDayDOM(dayCell);
-                    } else {
-                        // There are still staff in other rows, just remove the background from on-call row if it's empty
-                        const oncallRow = dayCell.querySelector('.rota-row[data-seniority="oncall"]');
-                        if (oncallRow && oncallRow.children.length === 0) {
-                            // Remove centering classes and background styling since there are still other staff
-                            oncallRow.classList.remove('align-items-center', 'justify-content-center');
-                            oncallRow.style.backgroundColor = '';
-                            oncallRow.style.borderRadius = '';
-                        }
-                    }
-                    
-                    console.log('Staff removed successfully');
-                } else {
-                    console.error('Server error:', data.error);
-                    alert('Error: ' + (data.error || 'Unknown server error'));
-                }
+            try {
+                await this.queueOperation({
+                    op: 'remove_staff',
+                    shift_id: shiftId,
+                    date: dayCell.dataset.date
+                }, dayCell);
+
+                this.removeStaffSpan(dayCell, staffSpan);
+                console.log('Staff removed successfully');
             } catch (error) {
                 console.error('Error removing staff:', error);
                 alert('An error occurred while removing staff: ' + error.message);
@@ -531,55 +616,73 @@ class RotaCalendar {
         }
     }
 
+    removeStaffSpan(dayCell, staffSpan) {
+        // Remove the staff span from DOM
+        staffSpan.remove();
+        
+        // Check if this was the last staff member in the day
+        const remainingStaffSpans = dayCell.querySelectorAll('.staff-entry');
+        
+        if (remainingStaffSpans.length === 0) {
+            // No staff left, show empty day indicator
+            this.clearDayDOM(dayCell);
+        } else {
+            // There are still staff in other rows, just remove the background from on-call row if it's empty
+            const oncallRow = dayCell.querySelector('.rota-row[data-seniority="oncall"]');
+            if (oncallRow && oncallRow.children.length === 0) {
+                // Remove centering classes and background styling since there are still other staff
+                oncallRow.classList.remove('align-items-center', 'justify-content-center');
+                oncallRow.style.backgroundColor = '';
+                oncallRow.style.borderRadius = '';
+            }
+        }
+    }
+
     async clearDay() {
-        if (confirm('Are you sure you want to remove all staff from this day?')) {
-            const formData = {
-                date: this.currentDay.dataset.date
-            };
+        const dayCell = this.currentDay;
+        this.dateContextMenu.style.display = 'none';
 
+        if (confirm('Are you sure you want to remove all staff from this day?')) {
             try {
-                const response = await fetch('/rota/clear-day/', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'X-CSRFToken': this.csrfToken
-                    },
-                    body: JSON.stringify(formData)
-                });
-
-                const data = await response.json();
-
-                if (data.success) {
-                    // Clear all staff from the day's DOM
-                    this.clearDayDOM(this.currentDay);
-                    console.log('Day cleared successfully, removed:', data.deleted_count, 'staff');
-                } else {
-                    alert('Error: ' + data.error);
-                }
+                const data = await this.queueOperation({
+                    op: 'clear_day',
+                    date: dayCell.dataset.date
+                }, dayCell);
+
+                // Clear all staff from the day's DOM
+                this.clearDayDOM(dayCell);
+                console.log('Day cleared successfully, removed:', data.deleted_count, 'staff');
             } catch (error) {
                 console.error('Error clearing day:', error);
-                alert('An error occurred while clearing the day');
+                alert('Error: ' + error.message);
             }
         }
-        this.dateContextMenu.style.display = 'none';
     }
 
-    updateDayDOM(data) {
+    updateDayDOM(dayCell, data) {
         console.log('updateDayDOM called with data:', data);
         const shift = data.shift;
         const seniorityLevel = shift.seniority_level;
         
         console.log('Updating day for seniority level:', seniorityLevel);
         
-        // Update day data attributes
-        this.currentDay.dataset.rotaEntryId = data.rota_entry_id;
-        this.currentDay.dataset.shiftType = data.shift_type;
+        // Update day data attributes (live updates do not carry the entry id,
+        // and a versioned single-day add does not read the shift type back)
+        if (data.rota_entry_id) {
+            dayCell.dataset.rotaEntryId = data.rota_entry_id;
+        }
+        if (data.shift_type) {
+            dayCell.dataset.shiftType = data.shift_type;
+        }
         
         // Find the correct seniority row
-        const rotaRow = this.currentDay.querySelector(`.rota-row[data-seniority="${seniorityLevel}"]`);
+        const rotaRow = dayCell.querySelector(`.rota-row[data-seniority="${seniorityLevel}"]`);
         console.log('Looking for rota row with seniority:', seniorityLevel, 'Found:', rotaRow);
         
-        if (rotaRow) {
+        if (shift.id && dayCell.querySelector(`.staff-entry[data-shift-id="${shift.id}"]`)) {
+            // Already shown - our own edit echoed back by a live update, or vice versa
+            console.log('Staff span already present');
+        } else if (rotaRow) {
             console.log('Adding staff span to row');
             // Create new staff span
             const staffSpan = this.createStaffSpan(shift);
@@ -593,7 +696,7 @@ class RotaCalendar {
         }
         
         // Update NHSP badge if needed
-        this.updateNHSPBadge(this.currentDay, data.shift_type);
+        this.updateNHSPBadge(dayCell, dayCell.dataset.shiftType);
     }
 
     createStaffSpan(shift) {
@@ -706,16 +809,16 @@ class RotaCalendar {
 // Initialize the RotaCalendar when the DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
     // This will be populated by the template
-    window.initRotaCalendar = function(availableStaff, csrfToken, staffBySeniority) {
-        window.rotaCalendar = new RotaCalendar(availableStaff, csrfToken, staffBySeniority);
+    window.initRotaCalendar = function(availableStaff, csrfToken, staffBySeniority, lastEventId) {
+        window.rotaCalendar = new RotaCalendar(availableStaff, csrfToken, staffBySeniority, lastEventId);
     };
 });
 
 // Global initialization function for template usage
-window.initializeRotaCalendar = function(availableStaff, staffBySeniority, csrfToken) {
+window.initializeRotaCalendar = function(availableStaff, staffBySeniority, csrfToken, lastEventId = 0) {
     document.addEventListener('DOMContentLoaded', function() {
         if (window.initRotaCalendar) {
-            window.initRotaCalendar(availableStaff, csrfToken, staffBySeniority);
+            window.initRotaCalendar(availableStaff, csrfToken, staffBySeniority, lastEventId);
         } else {
             console.error('RotaCalendar not found. Make sure rota_calendar.js is loaded first.');
         }
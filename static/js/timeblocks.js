@@ -1,6 +1,6 @@
 /**
  * Timeblocks Table JavaScript
- * Handles hover effects, tooltips, and expand/collapse functionality
+ * Handles hover effects, tooltips, expand/collapse and loading block details
  */
 
 DOMUtils.ready(function() {
@@ -50,6 +50,78 @@ DOMUtils.ready(function() {
         }
     }
 
+    function showDetail(detail, html) {
+        detail.innerHTML = html;
+        BootstrapUtils.initializeTooltips('#' + detail.id + ' [data-bs-toggle="tooltip"]');
+    }
+
+    function showDetailError(detail) {
+        delete detail.dataset.loaded;
+        detail.innerHTML = '<div class="p-3 text-center text-danger small">Could not load time entries.</div>';
+    }
+
+    // Load a block's time entries the first time it is expanded
+    document.querySelectorAll('.block-detail[data-detail-url]').forEach(function(detail) {
+        detail.addEventListener('show.bs.collapse', function() {
+            if (detail.dataset.loaded) return;
+            detail.dataset.loaded = 'true';
+            fetch(detail.dataset.detailUrl, { credentials: 'same-origin' })
+                .then(function(response) {
+                    if (!response.ok) throw new Error(response.statusText);
+                    return response.text();
+                })
+                .then(function(html) {
+                    showDetail(detail, html);
+                })
+                .catch(function() {
+                    showDetailError(detail);
+                });
+        });
+    });
+
+    // "Expand all" loads every block not yet loaded in batched requests.
+    // Registered before the toggle handler, so the blocks are marked loaded
+    // before their show events fire.
+    const toggleAllBtn = document.getElementById('toggleAllBlocks');
+    const BATCH_SIZE = 100;  // MAX_DETAIL_BLOCKS on the server
+    if (toggleAllBtn && toggleAllBtn.dataset.detailsUrl) {
+        toggleAllBtn.addEventListener('click', function() {
+            if (!this.querySelector('i.bi-caret-down')) return;  // Collapsing
+
+            const pending = Array.from(
+                document.querySelectorAll('.block-detail[data-detail-url]:not([data-loaded])')
+            );
+            pending.forEach(function(detail) {
+                detail.dataset.loaded = 'true';
+            });
+
+            for (let start = 0; start < pending.length; start += BATCH_SIZE) {
+                const batch = pending.slice(start, start + BATCH_SIZE);
+                const ids = batch.map(function(detail) {
+                    return detail.id.replace('block-', '');
+                });
+                fetch(toggleAllBtn.dataset.detailsUrl + '?ids=' + ids.join(','), { credentials: 'same-origin' })
+                    .then(function(response) {
+                        if (!response.ok) throw new Error(response.statusText);
+                        return response.json();
+                    })
+                    .then(function(data) {
+                        batch.forEach(function(detail, index) {
+                            const html = data.blocks[ids[index]];
+                            if (html === undefined) {
+                                showDetailError(detail);
+                            } else {
+                                showDetail(detail, html);
+                            }
+                        });
+                    })
+                    .catch(function() {
+                        batch.forEach(showDetailError);
+                    });
+            }
+        });
+    }
+
     // Handle chevron rotation on collapse toggle
     CollapseUtils.setupChevronRotation('[data-bs-toggle="collapse"]', '#toggleAllBlocks');
 
@@ -28,8 +28,12 @@ class AssignmentManager {
             hiddenField: options.hiddenFieldId || 'assignments-data',
             recentDonors: options.recentDonorsId || 'recent-donors',
             recentRecipients: options.recentRecipientsId || 'recent-recipients',
-            recentLabTasks: options.recentLabTasksId || 'recent-lab-tasks'
+            recentLabTasks: options.recentLabTasksId || 'recent-lab-tasks',
+            suggestions: options.suggestionsId || 'entity-suggestions'
         };
+        this.searchDelay = options.searchDelay || 250;
+        this.searchTimer = null;
+        this.searchController = null;
         
         this.onAssignmentChange = options.onAssignmentChange || (() => {});
         this.enableLogging = options.enableLogging || false;
@@ -56,6 +60,8 @@ class AssignmentManager {
             });
         }
         
+        this.setupAutocomplete();
+
         // Initial setup
         this.updateVisibleSections();
         this.renderAssignments();
@@ -132,6 +138,49 @@ class AssignmentManager {
         }
     }
 
+    /**
+     * Suggest existing IDs of the selected type as the user types.
+     * Requests are debounced, and a newer request cancels the previous one.
+     */
+    setupAutocomplete() {
+        const entityInput = document.getElementById(this.elements.entityId);
+        const suggestions = document.getElementById(this.elements.suggestions);
+        if (!entityInput || !suggestions || !suggestions.dataset.searchUrl) return;
+
+        entityInput.addEventListener('input', () => {
+            clearTimeout(this.searchTimer);
+            this.searchTimer = setTimeout(() => this.fetchSuggestions(entityInput, suggestions), this.searchDelay);
+        });
+    }
+
+    fetchSuggestions(entityInput, suggestions) {
+        const assignmentType = document.getElementById(this.elements.assignmentType);
+        const query = entityInput.value.trim();
+        if (!query || !assignmentType || !assignmentType.value) {
+            suggestions.innerHTML = '';
+            return;
+        }
+
+        if (this.searchController) this.searchController.abort();
+        this.searchController = new AbortController();
+
+        const params = new URLSearchParams({ type: assignmentType.value, q: query });
+        fetch(`${suggestions.dataset.searchUrl}?${params}`, { signal: this.searchController.signal })
+            .then(response => response.ok ? response.json() : { results: [] })
+            .then(data => {
+                suggestions.innerHTML = '';
+                data.results.forEach(result => {
+                    const option = document.createElement('option');
+                    option.value = result.id;
+                    option.label = result.label;
+                    suggestions.appendChild(option);
+                });
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') this.log('Entity search failed:', error);
+            });
+    }
+
     /**
      * Add assignment from form
      */